@@ -0,0 +1,81 @@
+from asgiref.sync import sync_to_async
+from django.db.models import Count, Max
+from django.http import Http404
+from django.utils.cache import get_conditional_response
+from django.views.generic import View
+from rest_framework.response import Response
+
+from .fastpath import fast_serializer
+
+
+class AsyncReadView(View):
+    """
+    Async ``list`` and ``retrieve`` for a DRF viewset, for ASGI deployments:
+
+        path('api/async/product/', AsyncReadView.as_view(viewset_class=ProductViewSet)),
+        path('api/async/product/<int:pk>/', AsyncReadView.as_view(viewset_class=ProductViewSet)),
+
+    Authentication, permissions, filtering, pagination, conditional GET
+    (``ConditionalGetMixin``) and serialization are the viewset's own, so the
+    responses match the sync endpoints. The reads go through the async ORM
+    (``aaggregate``, ``acount``, ``aiterator``, ``afirst``, ``aget``) instead
+    of holding a worker thread for the whole request; authentication, keyset
+    pages and serialization (which may fill the lookup caches) still run in
+    worker threads.
+    """
+    viewset_class = None
+    http_method_names = ['get', 'head', 'options']
+
+    async def get(self, request, *args, **kwargs):
+        action = 'retrieve' if kwargs else 'list'
+        viewset = self.viewset_class(action_map={'get': action}, action=action,
+                                     args=args, kwargs=kwargs, format_kwarg=None)
+        # bind the handler like ViewSetMixin.as_view does, so Allow lists the same methods
+        viewset.get = viewset.head = getattr(viewset, action)
+        request = viewset.request = viewset.initialize_request(request, *args, **kwargs)
+        viewset.headers = viewset.default_response_headers
+        try:
+            await sync_to_async(viewset.initial)(request, *args, **kwargs)
+            response = await getattr(self, action)(viewset, request, **kwargs)
+        except Exception as exc:
+            response = viewset.handle_exception(exc)
+        return viewset.finalize_response(request, response, *args, **kwargs)
+
+    async def list(self, viewset, request):
+        # filter backends may validate against the database (e.g. choice filters on foreign keys)
+        queryset = await sync_to_async(viewset.filter_queryset)(viewset.get_queryset())
+        stats = await queryset.aaggregate(last_modified=Max(viewset.last_modified_field), count=Count('pk'))
+        etag, timestamp = viewset.conditional_validators(request, stats['last_modified'], stats['count'], many=True)
+        response = get_conditional_response(request._request, etag=etag, last_modified=timestamp)
+        if response is None:
+            if getattr(viewset, 'fast_list', False):
+                # FastListMixin viewsets: page through .values() rows and render them without the serializer
+                fast = fast_serializer(viewset.get_serializer_class())
+                page = await viewset.paginator.apaginate_queryset(fast.rows(queryset), request, view=viewset)
+                data = await sync_to_async(fast.to_representation)(page)
+            else:
+                page = await viewset.paginator.apaginate_queryset(queryset, request, view=viewset)
+                data = await sync_to_async(lambda: viewset.get_serializer(page, many=True).data)()
+            response = viewset.get_paginated_response(data)
+        return viewset.add_validators(response, etag, timestamp)
+
+    async def retrieve(self, viewset, request, **kwargs):
+        queryset = await sync_to_async(viewset.filter_queryset)(viewset.get_queryset())
+        lookup = {viewset.lookup_field: kwargs[viewset.lookup_url_kwarg or viewset.lookup_field]}
+        last_modified = await (
+            queryset.prefetch_related(None).filter(**lookup)
+            .values_list(viewset.last_modified_field, flat=True).afirst()
+        )
+        if last_modified is None:
+            raise Http404
+        etag, timestamp = viewset.conditional_validators(request, last_modified, 1)
+        response = get_conditional_response(request._request, etag=etag, last_modified=timestamp)
+        if response is None:
+            try:
+                instance = await queryset.aget(**lookup)
+            except queryset.model.DoesNotExist:
+                raise Http404
+            viewset.check_object_permissions(request, instance)
+            data = await sync_to_async(lambda: viewset.get_serializer(instance).data)()
+            response = Response(data)
+        return viewset.add_validators(response, etag, timestamp)
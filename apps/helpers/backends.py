@@ -0,0 +1,15 @@
+from django.contrib.auth.backends import ModelBackend
+
+from .permissions import get_user_authz
+
+
+class CachedModelBackend(ModelBackend):
+    """
+    ModelBackend whose model permissions come from the authorization cache,
+    so checks such as DjangoModelPermissions do not query the database.
+    Object-level checks are delegated unchanged.
+    """
+    def get_all_permissions(self, user_obj, obj=None):
+        if not user_obj.is_active or user_obj.is_anonymous or obj is not None:
+            return super().get_all_permissions(user_obj, obj=obj)
+        return get_user_authz(user_obj)['permissions']
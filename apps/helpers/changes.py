@@ -0,0 +1,163 @@
+from django.db import connections
+from django.db.models import BigIntegerField, CharField, DateTimeField, F, Func, Q, Value
+from django.utils import timezone
+
+from .models import Change
+
+
+CHANGE_FEED_BATCH_SIZE = 500
+CHANGE_FEED_MAX_BATCH_SIZE = 5000
+
+
+class TransactionId(Func):
+    """The id of the current transaction (PostgreSQL), in the epoch-extended form of ``txid_current()``."""
+    function = 'txid_current'
+    output_field = BigIntegerField()
+
+
+def transaction_id(using='default'):
+    """Value of ``Change.txid`` for a write through ``using`` (see Change)."""
+    return TransactionId() if connections[using].vendor == 'postgresql' else Value(0)
+
+
+def finished_before(using='default'):
+    """
+    A transaction id below which every transaction has committed or rolled
+    back, so the changes they wrote are final; ``None`` where writers are
+    serialized and whatever is visible is final.
+    """
+    connection = connections[using]
+    if connection.vendor != 'postgresql':
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT txid_snapshot_xmin(txid_current_snapshot())')
+        return cursor.fetchone()[0]
+
+
+def parse_position(token):
+    """``(txid, seq)`` of a feed token; raises ValueError for a malformed one."""
+    txid, _, seq = token.rpartition('.')
+    position = int(txid or 0), int(seq)
+    if min(position) < 0:
+        raise ValueError(token)
+    return position
+
+
+def format_position(txid, seq):
+    return f'{txid}.{seq}' if txid else str(seq)
+
+
+class ChangeFeed:
+    """
+    Registry of the models published on the change feed, with the queryset
+    and serializer used to render each changed row.
+    """
+    def __init__(self):
+        self.models = {}
+
+    def register(self, model, serializer_class, queryset=None):
+        if queryset is None:
+            queryset = model._default_manager.all()
+        self.models[model._meta.label_lower] = (serializer_class, queryset)
+
+    def read(self, since=(0, 0), limit=CHANGE_FEED_BATCH_SIZE, context=None):
+        """
+        Changes after position ``since`` (a ``(txid, seq)`` pair, see
+        ``parse_position``), at most ``limit`` of them, as ``(changes,
+        next_position, has_more)``. Repeated changes to one object within the
+        batch are collapsed into its latest one, and every changed object is
+        rendered with one query and one serializer pass per model. Objects
+        that no longer exist are reported as deletions.
+
+        Changes are read in commit order and only from finished
+        transactions, so a write committed after a reader has moved on still
+        sorts after that reader's position, however long its transaction ran.
+        A long transaction holds back the changes committed after it started
+        until it ends.
+        """
+        txid, seq = since
+        changes = Change.objects.filter(Q(txid=txid, pk__gt=seq) | Q(txid__gt=txid))
+        bound = finished_before()
+        if bound is not None:
+            changes = changes.filter(txid__lt=bound)
+        rows = list(
+            changes.order_by('txid', 'pk').values_list('pk', 'model', 'object_id', 'action', 'txid')[:limit + 1]
+        )
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        if not rows:
+            return [], since, False
+
+        latest = {}
+        for seq, label, object_id, action, _ in rows:
+            latest.pop((label, object_id), None)
+            latest[(label, object_id)] = (seq, action)
+
+        data = {}
+        for label, (serializer_class, queryset) in self.models.items():
+            pks = [object_id for (model, object_id), (_, action) in latest.items()
+                   if model == label and action == Change.UPSERT]
+            if pks:
+                rendered = serializer_class(queryset.filter(pk__in=pks), many=True, context=context or {}).data
+                data.update({(label, row['id']): row for row in rendered})
+
+        changes = []
+        for (label, object_id), (seq, _) in latest.items():
+            row = data.get((label, object_id))
+            changes.append({
+                'seq': seq,
+                'model': label,
+                'id': object_id,
+                'action': Change.DELETE if row is None else Change.UPSERT,
+                'data': row,
+            })
+        return changes, (rows[-1][4], rows[-1][0]), has_more
+
+
+change_feed = ChangeFeed()
+
+
+def record_changes(model, pks, action=Change.UPSERT):
+    """Append one change per primary key in ``pks`` for ``model``, with a single INSERT."""
+    label = model._meta.label_lower
+    txid = transaction_id()
+    return Change.objects.bulk_create([
+        Change(model=label, object_id=pk, action=action, txid=txid) for pk in pks
+    ])
+
+
+def record_queryset_changes(queryset, action=Change.UPSERT):
+    """
+    Append one change per row of ``queryset`` with a single ``INSERT ...
+    SELECT``, so set-based writes are recorded without loading their keys.
+    Run it before an UPDATE that makes the rows leave ``queryset``. Returns
+    the number of changes recorded.
+    """
+    connection = connections[queryset.db]
+    columns = {
+        'model': Value(queryset.model._meta.label_lower, output_field=CharField()),
+        'object_id': F('pk'),
+        'action': Value(action, output_field=CharField()),
+        'changed_at': Value(timezone.now(), output_field=DateTimeField()),
+        'txid': transaction_id(queryset.db),
+    }
+    # annotations are selected in the order given here, which the column list follows
+    rows = queryset.order_by().annotate(**{f'_{name}': value for name, value in columns.items()})
+    sql, params = rows.values_list(*(f'_{name}' for name in columns)).query.sql_with_params()
+    quote = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {quote(Change._meta.db_table)} ({", ".join(quote(name) for name in columns)}) {sql}',
+            params,
+        )
+        return cursor.rowcount
+
+
+def record_change(instance, action=Change.UPSERT):
+    return record_changes(type(instance), [instance.pk], action)
+
+
+def prune_changes(older_than):
+    """Delete changes recorded before ``older_than``; readers behind that point must resync in full."""
+    deleted, _ = Change.objects.filter(changed_at__lt=older_than).delete()
+    return deleted
@@ -0,0 +1,72 @@
+import hashlib
+
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+
+
+class ConditionalGetMixin:
+    """
+    ETag and Last-Modified validators for a viewset's ``list`` and
+    ``retrieve``, computed from ``MAX(updated_at)`` and ``COUNT(*)`` of the
+    rows the request would return (one aggregate query, or one indexed
+    lookup for a detail). A matching ``If-None-Match`` / ``If-Modified-Since``
+    is answered with 304 before anything is loaded or serialized.
+
+    Lists only get an ETag: deleting a row other than the newest leaves
+    ``MAX(updated_at)`` where it was, and only the count in the ETag moves.
+
+    The validators follow the resource's own rows, so a change to a related
+    row the representation shows must also move the resource's
+    ``updated_at``: POs are touched when a supplier, product or user whose
+    name they show is renamed (see apps.purchase.signals).
+    """
+    last_modified_field = 'updated_at'
+
+    def list(self, request, *args, **kwargs):
+        stats = self.filter_queryset(self.get_queryset()).aggregate(
+            last_modified=Max(self.last_modified_field), count=Count('pk'),
+        )
+        return self.conditional_response(request, stats['last_modified'], stats['count'],
+                                         super().list, *args, many=True, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        last_modified = (
+            self.filter_queryset(self.get_queryset()).prefetch_related(None)
+            .filter(**{self.lookup_field: kwargs[lookup_url_kwarg]})
+            .values_list(self.last_modified_field, flat=True).first()
+        )
+        if last_modified is None:
+            # unknown object: let the regular path answer 404
+            return super().retrieve(request, *args, **kwargs)
+        return self.conditional_response(request, last_modified, 1, super().retrieve, *args, **kwargs)
+
+    def conditional_response(self, request, last_modified, count, view, *args, many=False, **kwargs):
+        etag, timestamp = self.conditional_validators(request, last_modified, count, many)
+        response = get_conditional_response(request._request, etag=etag, last_modified=timestamp)
+        if response is None:
+            response = view(request, *args, **kwargs)
+        return self.add_validators(response, etag, timestamp)
+
+    def conditional_validators(self, request, last_modified, count, many=False):
+        """
+        The ``(etag, last_modified timestamp)`` pair of a response built from
+        rows with these stats; no timestamp for a list (``many``).
+        """
+        # the representation also depends on the query string and the negotiated media type
+        fingerprint = f'{last_modified and last_modified.isoformat()}|{count}|{request.get_full_path()}|' \
+                      f'{request.accepted_media_type}'
+        etag = quote_etag(hashlib.md5(fingerprint.encode()).hexdigest())
+        if many or last_modified is None:
+            return etag, None
+        return etag, int(last_modified.timestamp())
+
+    def add_validators(self, response, etag, timestamp):
+        if 200 <= response.status_code < 300 or response.status_code == 304:
+            response['ETag'] = etag
+            if timestamp is not None:
+                response['Last-Modified'] = http_date(timestamp)
+            # clients may keep the body but must revalidate before reusing it
+            patch_cache_control(response, private=True, no_cache=True)
+        return response
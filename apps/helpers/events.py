@@ -0,0 +1,219 @@
+import asyncio
+import json
+import threading
+import time
+from contextlib import asynccontextmanager
+from urllib.parse import parse_qs
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils.module_loading import import_string
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTStatelessUserAuthentication
+
+
+# messages buffered per connection; a client further behind than this is disconnected and reconnects
+EVENT_QUEUE_SIZE = 100
+EVENT_KEEPALIVE_SECONDS = 15
+EVENT_RETRY_MILLISECONDS = 5000
+DEFAULT_EVENT_BROKER = 'apps.helpers.events.InProcessBroker'
+
+
+def format_event(event, data):
+    """One server-sent event frame, encoded once and shared by every subscriber."""
+    return f"event: {event}\ndata: {json.dumps(data, cls=DjangoJSONEncoder)}\n\n".encode()
+
+
+class InProcessBroker:
+    """
+    Default broker: events reach the subscribers connected to the publishing
+    process only.
+
+    A broker is built with the hub's ``deliver(channel, message)`` callback
+    and has a ``publish(channel, message)`` method. Cross-process brokers
+    (Redis pub/sub, Postgres LISTEN/NOTIFY, ...) send the message out from
+    ``publish`` and call ``deliver`` for every message they receive,
+    including their own; they are selected with the ``EVENT_BROKER`` setting.
+    """
+    def __init__(self, deliver):
+        self.deliver = deliver
+
+    def publish(self, channel, message):
+        self.deliver(channel, message)
+
+
+class EventHub:
+    """
+    Fan-out of events to the event streams connected to this process.
+
+    Each connection holds one bounded ``asyncio.Queue``; a delivery costs
+    one ``call_soon_threadsafe`` per event loop with subscribers, however
+    many connections are open, so publishing from sync request code is
+    cheap. Events are lost for clients that are not connected when they
+    are published.
+    """
+    def __init__(self, broker_class=None):
+        self.broker_class = broker_class
+        self._broker = None
+        self._lock = threading.Lock()
+        self._subscribers = {}
+
+    @property
+    def broker(self):
+        with self._lock:
+            if self._broker is None:
+                broker_class = self.broker_class or import_string(
+                    getattr(settings, 'EVENT_BROKER', DEFAULT_EVENT_BROKER)
+                )
+                self._broker = broker_class(self.deliver)
+        return self._broker
+
+    def publish(self, channel, event, data):
+        self.broker.publish(channel, format_event(event, data))
+
+    def deliver(self, channel, message):
+        with self._lock:
+            loops = [loop for loop, channels in self._subscribers.items() if channels.get(channel)]
+        for loop in loops:
+            try:
+                loop.call_soon_threadsafe(self._fan_out, loop, channel, message)
+            except RuntimeError:
+                # the loop has been closed; its subscriptions went with it
+                continue
+
+    def _fan_out(self, loop, channel, message):
+        for queue in list(self._subscribers.get(loop, {}).get(channel, ())):
+            try:
+                queue.put_nowait(message)
+            except asyncio.QueueFull:
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(None)
+
+    @asynccontextmanager
+    async def subscribe(self, channel):
+        """A queue of the messages published on ``channel``; ``None`` means the subscriber fell behind."""
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue(EVENT_QUEUE_SIZE)
+        with self._lock:
+            self._subscribers.setdefault(loop, {}).setdefault(channel, set()).add(queue)
+        try:
+            yield queue
+        finally:
+            with self._lock:
+                channels = self._subscribers[loop]
+                channels[channel].discard(queue)
+                if not channels[channel]:
+                    del channels[channel]
+                if not channels:
+                    del self._subscribers[loop]
+
+    def subscriber_count(self, channel):
+        with self._lock:
+            return sum(len(channels.get(channel, ())) for channels in self._subscribers.values())
+
+
+event_hub = EventHub()
+
+
+class EventStream:
+    """
+    ASGI application streaming one hub channel as server-sent events.
+
+    It is served next to Django rather than through it (see
+    ``route_event_streams``), so an idle connection costs a coroutine and a
+    queue instead of a request thread. Clients authenticate with a JWT
+    access token, as ``Authorization: Bearer <token>`` or, since
+    ``EventSource`` cannot set headers, ``?access_token=<token>``. The token
+    is checked without a database query and the stream ends when it expires.
+    """
+    def __init__(self, channel, hub=None, keepalive=EVENT_KEEPALIVE_SECONDS):
+        self.channel = channel
+        self.hub = hub or event_hub
+        self.keepalive = keepalive
+        self.authentication = JWTStatelessUserAuthentication()
+
+    async def __call__(self, scope, receive, send):
+        if scope['method'] not in ('GET', 'HEAD'):
+            return await self.reject(send, 405, 'Method not allowed.')
+        try:
+            token = self.authenticate(scope)
+        except AuthenticationFailed as exc:
+            detail = exc.detail.get('detail', exc.detail) if isinstance(exc.detail, dict) else exc.detail
+            return await self.reject(send, 401, str(detail))
+
+        await send({
+            'type': 'http.response.start',
+            'status': 200,
+            'headers': [
+                (b'content-type', b'text/event-stream'),
+                (b'cache-control', b'no-cache'),
+                # keep reverse proxies from buffering the stream
+                (b'x-accel-buffering', b'no'),
+            ],
+        })
+        if scope['method'] == 'HEAD':
+            return await send({'type': 'http.response.body'})
+
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + token['exp'] - time.time()
+        async with self.hub.subscribe(self.channel) as queue:
+            await send({'type': 'http.response.body', 'body': f"retry: {EVENT_RETRY_MILLISECONDS}\n\n".encode(),
+                        'more_body': True})
+            disconnected = asyncio.ensure_future(self.wait_for_disconnect(receive))
+            getter = None
+            try:
+                while True:
+                    remaining = deadline - loop.time()
+                    if remaining <= 0:
+                        break
+                    if getter is None:
+                        getter = asyncio.ensure_future(queue.get())
+                    done, _ = await asyncio.wait(
+                        (getter, disconnected), timeout=min(self.keepalive, remaining),
+                        return_when=asyncio.FIRST_COMPLETED,
+                    )
+                    if disconnected in done:
+                        return
+                    if getter in done:
+                        message, getter = getter.result(), None
+                        if message is None:
+                            break
+                    else:
+                        message = b": keepalive\n\n"
+                    await send({'type': 'http.response.body', 'body': message, 'more_body': True})
+                await send({'type': 'http.response.body'})
+            finally:
+                disconnected.cancel()
+                if getter is not None:
+                    getter.cancel()
+
+    def authenticate(self, scope):
+        header = dict(scope['headers']).get(b'authorization')
+        raw_token = self.authentication.get_raw_token(header) if header else None
+        if raw_token is None:
+            raw_token = parse_qs(scope.get('query_string', b'').decode()).get('access_token', [None])[0]
+        if raw_token is None:
+            raise AuthenticationFailed('Authentication credentials were not provided.')
+        return self.authentication.get_validated_token(raw_token)
+
+    @staticmethod
+    async def wait_for_disconnect(receive):
+        while (await receive())['type'] != 'http.disconnect':
+            pass
+
+    @staticmethod
+    async def reject(send, status, detail):
+        await send({'type': 'http.response.start', 'status': status,
+                    'headers': [(b'content-type', b'application/json')]})
+        await send({'type': 'http.response.body', 'body': json.dumps({'detail': detail}).encode()})
+
+
+def route_event_streams(application, streams):
+    """Wrap an ASGI ``application`` so the paths in ``streams`` are served by their ``EventStream``."""
+    async def router(scope, receive, send):
+        stream = streams.get(scope['path']) if scope['type'] == 'http' else None
+        if stream is None:
+            return await application(scope, receive, send)
+        return await stream(scope, receive, send)
+    return router
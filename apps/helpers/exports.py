@@ -0,0 +1,76 @@
+import csv
+import json
+from datetime import datetime, time
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from rest_framework.exceptions import ValidationError
+
+from .renderers import CSVRenderer, NDJSONRenderer
+
+
+EXPORT_RENDERER_CLASSES = [CSVRenderer, NDJSONRenderer]
+EXPORT_CHUNK_SIZE = 2000
+
+
+class _Echo:
+    """File-like object whose write() hands the line back, so csv.writer can feed a generator."""
+    def write(self, value):
+        return value
+
+
+def _parse_moment(value, param):
+    moment = parse_datetime(value)
+    if moment is None:
+        day = parse_date(value)
+        if day is None:
+            raise ValidationError({param: ["Expected an ISO 8601 date or datetime."]})
+        return timezone.make_aware(datetime.combine(day, time.min))
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+def filter_date_range(queryset, request, field):
+    """
+    Apply ``?<field>_after=`` (inclusive) and ``?<field>_before=`` (exclusive)
+    to ``queryset``. Both accept an ISO date or datetime.
+    """
+    after = request.query_params.get(f'{field}_after')
+    before = request.query_params.get(f'{field}_before')
+    if after:
+        queryset = queryset.filter(**{f'{field}__gte': _parse_moment(after, f'{field}_after')})
+    if before:
+        queryset = queryset.filter(**{f'{field}__lt': _parse_moment(before, f'{field}_before')})
+    return queryset
+
+
+def stream_export(queryset, columns, export_format, filename):
+    """
+    Stream ``queryset`` as CSV or NDJSON. ``columns`` maps output names to
+    ``values()`` lookups. Rows are read with ``iterator(chunk_size=...)`` (a
+    server-side cursor where the backend has one), so at most one chunk is in
+    memory however large the export is.
+    """
+    names = list(columns)
+    rows = queryset.values_list(*columns.values()).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+
+    if export_format == NDJSONRenderer.format:
+        body = (json.dumps(dict(zip(names, row)), cls=DjangoJSONEncoder) + '\n' for row in rows)
+        content_type = NDJSONRenderer.media_type
+    else:
+        writer = csv.writer(_Echo())
+        body = _csv_lines(writer, names, rows)
+        content_type = CSVRenderer.media_type
+
+    response = StreamingHttpResponse(body, content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="{filename}.{export_format}"'
+    return response
+
+
+def _csv_lines(writer, names, rows):
+    yield writer.writerow(names)
+    for row in rows:
+        yield writer.writerow(row)
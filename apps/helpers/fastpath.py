@@ -0,0 +1,181 @@
+from collections import defaultdict
+from functools import lru_cache
+
+from django.core.exceptions import FieldDoesNotExist, ImproperlyConfigured
+from rest_framework import serializers
+from rest_framework.fields import empty
+from rest_framework.response import Response
+
+from .lookups import CachedLookupField
+
+
+def _converter(field):
+    """
+    What ``field.to_representation`` does to a non-null database value:
+    ``None`` when it is passed through unchanged, a builtin where DRF calls
+    one, else the bound ``to_representation`` itself.
+    """
+    if isinstance(field, (serializers.BooleanField, serializers.ReadOnlyField)):
+        return None
+    if isinstance(field, serializers.PrimaryKeyRelatedField) and field.pk_field is None:
+        return None
+    if isinstance(field, serializers.IntegerField):
+        return int
+    if isinstance(field, serializers.CharField):
+        return str
+    return field.to_representation
+
+
+class FastSerializer:
+    """
+    Read-only output of a ``ModelSerializer`` built from ``.values()`` rows.
+
+    The serializer's fields are compiled once into ``(key, column,
+    converter)`` extractors, so rendering a row is a dict comprehension
+    rather than a pass through every field's ``get_attribute`` and
+    ``to_representation``. The result is identical to ``serializer.data``.
+
+    Supported fields: model columns, also across forward relations
+    (``source='created_by.username'``), primary key related fields,
+    ``CachedLookupField`` (one ``get_many`` per field and page) and nested
+    ``many=True`` model serializers over a reverse foreign key (one query
+    per page, in primary key order). Anything else raises
+    ``ImproperlyConfigured`` when the serializer is compiled.
+    """
+    def __init__(self, serializer_class):
+        serializer = serializer_class()
+        self.model = serializer.Meta.model
+        self.pk_column = self.model._meta.pk.attname
+        self.extractors = []
+        self.columns = {self.pk_column: None}
+        self.nested = []
+        for name, field in serializer.fields.items():
+            if field.write_only:
+                continue
+            if isinstance(field, serializers.ListSerializer):
+                self.nested.append((name, *self.compile_nested(name, field)))
+                self.extractors.append((name, None, None, (), None))
+                continue
+            if isinstance(field, (serializers.Serializer, serializers.ManyRelatedField,
+                                  serializers.SerializerMethodField, serializers.HiddenField)) or field.source == '*':
+                raise ImproperlyConfigured(f"{serializer_class.__name__}.{name} cannot be served from .values() rows.")
+            relation_value = isinstance(field, serializers.PrimaryKeyRelatedField)
+            column, guards = self.resolve(name, field.source_attrs, relation_value)
+            convert = field if isinstance(field, CachedLookupField) else _converter(field)
+            self.extractors.append((name, column, convert, guards, self.missing(name, field) if guards else None))
+            self.columns.update(dict.fromkeys([column, *guards]))
+
+    def resolve(self, name, source_attrs, relation_value):
+        """
+        The ``values()`` lookup of a dotted source, e.g. ``['created_by',
+        'username']`` -> ``created_by__username``, and the lookups of the
+        nullable relations it follows (``['created_by']``).
+        """
+        model = self.model
+        guards = []
+        for position, attr in enumerate(source_attrs):
+            try:
+                model_field = model._meta.get_field(attr)
+            except FieldDoesNotExist:
+                raise ImproperlyConfigured(f"{self.model.__name__}.{'.'.join(source_attrs)} (field {name!r}) is not a column.")
+            forward_relation = model_field.is_relation and model_field.concrete and not model_field.many_to_many
+            if position < len(source_attrs) - 1:
+                if not forward_relation:
+                    raise ImproperlyConfigured(f"Field {name!r} follows {attr!r}, which is not a forward relation.")
+                if model_field.null:
+                    guards.append('__'.join(source_attrs[:position + 1]))
+                model = model_field.related_model
+            elif model_field.is_relation and not (forward_relation and (relation_value or attr == model_field.attname)):
+                raise ImproperlyConfigured(f"Field {name!r} renders a related object, not a column.")
+        return '__'.join(source_attrs), guards
+
+    @staticmethod
+    def missing(name, field):
+        """
+        What DRF renders for ``field`` when a relation on its source is null:
+        its default, ``None`` with ``allow_null``, else the key is left out
+        (``empty``). Required fields would fail instead and are refused.
+        """
+        if field.default is not empty:
+            return field.get_default()
+        if field.allow_null:
+            return None
+        if not field.required:
+            return empty
+        raise ImproperlyConfigured(f"Field {name!r} is required but its source crosses a nullable relation.")
+
+    def compile_nested(self, name, field):
+        if len(field.source_attrs) != 1 or not isinstance(field.child, serializers.ModelSerializer):
+            raise ImproperlyConfigured(f"Nested field {name!r} must be a model serializer over a relation.")
+        try:
+            relation = self.model._meta.get_field(field.source_attrs[0])
+        except FieldDoesNotExist:
+            raise ImproperlyConfigured(f"Nested field {name!r} is not a relation of {self.model.__name__}.")
+        if not (relation.one_to_many and relation.auto_created):
+            raise ImproperlyConfigured(f"Nested field {name!r} must follow a reverse foreign key.")
+        return fast_serializer(type(field.child)), relation.field.attname
+
+    def rows(self, queryset):
+        return queryset.prefetch_related(None).values(*self.columns)
+
+    def to_representation(self, rows):
+        rows = rows if isinstance(rows, list) else list(rows)
+        resolved = {}
+        for name, column, field, _, _ in self.extractors:
+            if isinstance(field, CachedLookupField):
+                lookups = field.lookup.get_many({row[column] for row in rows})
+                resolved[name] = {pk: values[field.attr] for pk, values in lookups.items()}
+        for name, child, fk_column in self.nested:
+            resolved[name] = child.group_by(fk_column, [row[self.pk_column] for row in rows])
+
+        data = []
+        for row in rows:
+            item = {}
+            for name, column, convert, guards, missing in self.extractors:
+                if guards and any(row[guard] is None for guard in guards):
+                    if missing is not empty:
+                        item[name] = missing
+                    continue
+                if name in resolved:
+                    lookup = resolved[name]
+                    item[name] = lookup.get(row[self.pk_column], []) if column is None else lookup.get(row[column])
+                    continue
+                value = row[column]
+                item[name] = value if convert is None or value is None else convert(value)
+            data.append(item)
+        return data
+
+    def group_by(self, fk_column, parent_pks):
+        """``{parent pk: [rendered rows]}`` for the rows whose ``fk_column`` is in ``parent_pks``."""
+        if not parent_pks:
+            return {}
+        queryset = self.model._default_manager.filter(**{f'{fk_column}__in': parent_pks}).order_by('pk')
+        rows = list(queryset.values(*dict.fromkeys([*self.columns, fk_column])))
+        grouped = defaultdict(list)
+        for row, item in zip(rows, self.to_representation(rows)):
+            grouped[row[fk_column]].append(item)
+        return grouped
+
+
+@lru_cache(maxsize=None)
+def fast_serializer(serializer_class):
+    return FastSerializer(serializer_class)
+
+
+class FastListMixin:
+    """
+    Serves a viewset's ``list`` from ``.values()`` rows through a
+    ``FastSerializer`` of its serializer class; the response is the same.
+    Set ``fast_list = False`` on a viewset to go back to the serializer.
+    """
+    fast_list = True
+
+    def list(self, request, *args, **kwargs):
+        if not self.fast_list:
+            return super().list(request, *args, **kwargs)
+        fast = fast_serializer(self.get_serializer_class())
+        queryset = fast.rows(self.filter_queryset(self.get_queryset()))
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(fast.to_representation(page))
+        return Response(fast.to_representation(queryset))
@@ -0,0 +1,149 @@
+import functools
+import hashlib
+import json
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import DatabaseError, IntegrityError, transaction
+from django.utils import timezone
+from rest_framework.response import Response
+
+from .models import IdempotencyKey
+
+
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+IDEMPOTENCY_KEY_MAX_LENGTH = 255
+# a claim in progress for longer than this is probed: if its row lock is free, the request holding it
+# died, and as its writes and its stored response commit together it left no effect behind
+IDEMPOTENCY_LOCK_SECONDS = 60
+
+
+def key_ttl():
+    return timedelta(hours=getattr(settings, 'IDEMPOTENCY_KEY_TTL_HOURS', 24))
+
+
+def request_fingerprint(request):
+    """Hash of the method, path and parsed body of ``request``."""
+    data = request.data
+    if hasattr(data, 'lists'):
+        # form data: keep repeated fields
+        data = dict(data.lists())
+    payload = json.dumps(data, sort_keys=True, default=str)
+    return hashlib.sha256(f'{request.method} {request.path}\n{payload}'.encode()).hexdigest()
+
+
+def claim_key(user, key, fingerprint):
+    """
+    ``(record, True)`` when this request may process ``key``, provided it
+    can then ``lock_key`` it, or ``(record, False)`` with the row of an
+    earlier request (``None`` if it could not be read) when it must not.
+
+    A new claim is committed before the request runs, so a concurrent retry
+    finds it and is turned away instead of applying the request twice. A
+    claim left in progress for ``IDEMPOTENCY_LOCK_SECONDS`` is returned as a
+    candidate for a takeover. Expired rows are replaced.
+    """
+    now = timezone.now()
+    for _ in range(3):
+        record = IdempotencyKey.objects.filter(user=user, key=key).first()
+        if record is None:
+            try:
+                with transaction.atomic():
+                    return IdempotencyKey.objects.create(
+                        user=user, key=key, fingerprint=fingerprint, created_at=now, expires_at=now + key_ttl(),
+                    ), True
+            except IntegrityError:
+                # claimed concurrently: read that one
+                continue
+        if record.expires_at <= now:
+            IdempotencyKey.objects.filter(pk=record.pk, expires_at__lte=now).delete()
+            continue
+        stale = now - timedelta(seconds=IDEMPOTENCY_LOCK_SECONDS)
+        if record.status_code is None and record.created_at < stale and record.fingerprint == fingerprint:
+            return record, True
+        return record, False
+    return None, False
+
+
+def lock_key(record):
+    """
+    Lock the claim ``record`` until the end of the current transaction, in
+    which the request runs and its response is stored. False if another
+    request still holds it or it was settled (answered or released) meanwhile.
+    """
+    claim = IdempotencyKey.objects.filter(pk=record.pk, status_code__isnull=True)
+    try:
+        with transaction.atomic():
+            # NOWAIT fails at once on a live holder's row lock; where rows cannot be locked (SQLite)
+            # the UPDATE waits for the holder's write lock, and finds the claim settled by then
+            list(claim.select_for_update(nowait=True).values_list('pk'))
+            return bool(claim.update(created_at=timezone.now()))
+    except DatabaseError:
+        return False
+
+
+def replay(record, fingerprint):
+    """The answer to a request whose key is held by ``record``."""
+    if record is not None and record.fingerprint != fingerprint:
+        return Response({"detail": f"This {IDEMPOTENCY_HEADER} was already used for a different request."},
+                        status=422)
+    if record is None or record.status_code is None:
+        return Response({"detail": f"A request with this {IDEMPOTENCY_HEADER} is still being processed."},
+                        status=409)
+    return Response(record.response, status=record.status_code, headers={'Idempotent-Replayed': 'true'})
+
+
+def idempotent(handler):
+    """
+    Make a viewset action safe to retry with an ``Idempotency-Key`` header.
+
+    The first request with a key runs in a transaction that also stores its
+    response, keyed by user and key, for ``IDEMPOTENCY_KEY_TTL_HOURS``. A
+    retry with the same key, method, path and body gets that response back
+    (with ``Idempotent-Replayed: true``) from one indexed lookup, without
+    running the action again; one sent while the first is still running gets
+    409, and a different request reusing the key gets 422. The claim's row
+    stays locked while the action runs, so a request is never taken over
+    while it is alive, however slow it is. Only successful responses are
+    stored: after an error the key is released, so the request can be
+    retried once its cause is fixed. Requests without the header are not
+    affected.
+    """
+    @functools.wraps(handler)
+    def wrapper(self, request, *args, **kwargs):
+        key = request.headers.get(IDEMPOTENCY_HEADER)
+        if key is None or not request.user.is_authenticated:
+            return handler(self, request, *args, **kwargs)
+        if not 0 < len(key) <= IDEMPOTENCY_KEY_MAX_LENGTH:
+            return Response({"detail": f"{IDEMPOTENCY_HEADER} must be 1 to {IDEMPOTENCY_KEY_MAX_LENGTH} characters."},
+                            status=400)
+
+        fingerprint = request_fingerprint(request)
+        record, claimed = claim_key(request.user, key, fingerprint)
+        if not claimed:
+            return replay(record, fingerprint)
+
+        owned = stored = False
+        try:
+            with transaction.atomic():
+                owned = lock_key(record)
+                if owned:
+                    response = handler(self, request, *args, **kwargs)
+                    if 200 <= response.status_code < 300:
+                        stored = IdempotencyKey.objects.filter(pk=record.pk).update(
+                            status_code=response.status_code, response=response.data,
+                        )
+        finally:
+            if owned and not stored:
+                IdempotencyKey.objects.filter(pk=record.pk, status_code__isnull=True).delete()
+        if not owned:
+            return replay(IdempotencyKey.objects.filter(pk=record.pk).first(), fingerprint)
+        return response
+
+    return wrapper
+
+
+def prune_idempotency_keys(now=None):
+    """Delete the stored responses whose keys have expired."""
+    deleted, _ = IdempotencyKey.objects.filter(expires_at__lte=now or timezone.now()).delete()
+    return deleted
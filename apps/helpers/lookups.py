@@ -0,0 +1,183 @@
+import time
+from collections import Counter
+
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models.manager import BaseManager
+from rest_framework import serializers
+from rest_framework.fields import SkipField
+
+
+LOOKUP_CACHE_TIMEOUT = 60 * 60
+# entries may be served this long from a process-local copy after another process invalidated them
+LOOKUP_LOCAL_TIMEOUT = 5
+LOOKUP_SHARED_CACHE = 'default'
+LOOKUP_LOCAL_CACHE = 'local'
+
+
+class LookupCache:
+    """
+    Read-through cache of a few columns of a model, keyed by primary key.
+
+    Lookups go to a process-local cache first, then to the shared ``default``
+    cache, and only then to the database, with one batched request per tier.
+    Keys carry a per-model version held in the shared cache: ``invalidate``
+    drops single rows (call it when a row changes, e.g. from a post_save
+    receiver) and ``invalidate_all`` bumps the version after set-based writes;
+    inside a transaction both are repeated when it commits.
+    Versions start from the clock, so one evicted from the shared cache is
+    never reissued while copies keyed by it may still be around.
+    Local copies live for ``LOOKUP_LOCAL_TIMEOUT`` seconds, which bounds how
+    stale another process can be; the invalidating process is never stale.
+
+    ``stats`` counts local hits, shared hits and misses in this process.
+    """
+    registry = {}
+
+    def __init__(self, model, fields):
+        self.model = model
+        self.fields = list(fields)
+        self.label = model._meta.label_lower
+        self.version_key = f'lookup:{self.label}:version'
+        self.stats = Counter()
+        LookupCache.registry[self.label] = self
+
+    def __deepcopy__(self, memo):
+        # serializer fields are deep-copied per instance; the cache and its counters are shared
+        return self
+
+    @property
+    def shared(self):
+        return caches[LOOKUP_SHARED_CACHE]
+
+    @property
+    def local(self):
+        return caches[LOOKUP_LOCAL_CACHE]
+
+    def version(self):
+        version = self.local.get(self.version_key)
+        if version is None:
+            version = self.shared.get_or_set(self.version_key, time.time_ns, timeout=None)
+            self.local.set(self.version_key, version, LOOKUP_LOCAL_TIMEOUT)
+        return version
+
+    def key(self, version, pk):
+        return f'lookup:{self.label}:{version}:{pk}'
+
+    def get_many(self, pks):
+        """``{pk: {field: value}}`` for the ``pks`` that exist."""
+        version = self.version()
+        keys = {self.key(version, pk): pk for pk in set(pks) if pk is not None}
+        if not keys:
+            return {}
+
+        found = self.local.get_many(keys)
+        self.stats['local_hits'] += len(found)
+        missing = [key for key in keys if key not in found]
+        if missing:
+            shared = self.shared.get_many(missing)
+            self.stats['shared_hits'] += len(shared)
+            self.local.set_many(shared, LOOKUP_LOCAL_TIMEOUT)
+            found.update(shared)
+            missing = [keys[key] for key in missing if key not in shared]
+        if missing:
+            self.stats['misses'] += len(missing)
+            found.update({self.key(version, pk): row for pk, row in self._load(version, missing).items()})
+        return {keys[key]: row for key, row in found.items()}
+
+    def get(self, pk):
+        return self.get_many([pk]).get(pk)
+
+    def load(self, pks):
+        """
+        ``{pk: {field: value}}`` for the ``pks`` that exist, read from the
+        database rather than the caches (which may still hold deleted rows),
+        and cached for the lookups that follow.
+        """
+        return self._load(self.version(), {pk for pk in pks if pk is not None})
+
+    def _load(self, version, pks):
+        rows = {row.pop('pk'): row for row in self.model.objects.filter(pk__in=pks).values('pk', *self.fields)}
+        entries = {self.key(version, pk): row for pk, row in rows.items()}
+        self.shared.set_many(entries, LOOKUP_CACHE_TIMEOUT)
+        self.local.set_many(entries, LOOKUP_LOCAL_TIMEOUT)
+        return rows
+
+    def invalidate(self, *pks):
+        # again on commit: a read in between, outside the writing transaction, caches the old rows
+        self._invalidate(pks)
+        transaction.on_commit(lambda: self._invalidate(pks))
+
+    def _invalidate(self, pks):
+        keys = [self.key(self.version(), pk) for pk in pks]
+        self.shared.delete_many(keys)
+        self.local.delete_many(keys)
+
+    def invalidate_all(self):
+        self._invalidate_all()
+        transaction.on_commit(self._invalidate_all)
+
+    def _invalidate_all(self):
+        try:
+            self.shared.incr(self.version_key)
+        except ValueError:
+            self.shared.set(self.version_key, time.time_ns(), timeout=None)
+        self.local.delete(self.version_key)
+
+
+def lookup_stats():
+    """Hit/miss counters of every lookup cache in this process, by model label."""
+    return {label: dict(lookup.stats) for label, lookup in LookupCache.registry.items()}
+
+
+class CachedLookupField(serializers.ReadOnlyField):
+    """
+    Read-only field showing ``attr`` of the row whose id is at ``source``
+    (e.g. ``source='supplier_id'``), read from a ``LookupCache``.
+
+    Inside a ``LookupListSerializer`` the ids of the whole list are resolved
+    before the first row is rendered, with one ``get_many`` per field.
+    """
+    def __init__(self, lookup, attr, **kwargs):
+        self.lookup = lookup
+        self.attr = attr
+        self.resolved = {}
+        super().__init__(**kwargs)
+
+    def prime(self, instances):
+        pks = set()
+        for instance in instances:
+            try:
+                pks.add(self.get_attribute(instance))
+            except SkipField:
+                continue
+        pks -= self.resolved.keys()
+        if pks:
+            self.resolved.update(self.lookup.get_many(pks))
+
+    def to_representation(self, pk):
+        if pk not in self.resolved:
+            self.resolved.update(self.lookup.get_many([pk]))
+        row = self.resolved.get(pk)
+        return None if row is None else row[self.attr]
+
+
+def prime_lookups(serializer, instances):
+    """Resolve every ``CachedLookupField`` of ``serializer`` and of its nested list serializers for ``instances``."""
+    for field in serializer._readable_fields:
+        if isinstance(field, CachedLookupField):
+            field.prime(instances)
+        elif isinstance(field, serializers.ListSerializer) and isinstance(field.child, serializers.Serializer):
+            children = []
+            for instance in instances:
+                related = field.get_attribute(instance)
+                children.extend(related.all() if isinstance(related, BaseManager) else related)
+            prime_lookups(field.child, children)
+
+
+class LookupListSerializer(serializers.ListSerializer):
+    """List serializer that resolves cached lookups for all rows in one batch before rendering them."""
+    def to_representation(self, data):
+        rows = list(data.all() if isinstance(data, BaseManager) else data)
+        prime_lookups(self.child, rows)
+        return super().to_representation(rows)
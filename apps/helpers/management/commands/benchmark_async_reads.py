@@ -0,0 +1,129 @@
+import asyncio
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.test import RequestFactory
+from rest_framework_simplejwt.tokens import AccessToken
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare concurrent read throughput of the sync API served by a threaded WSGI stack with the async '
+        'list/retrieve endpoints (/api/async/...) served under ASGI, both driven in-process. '
+        'Seed the database first (seed_data).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=300, help='Requests per stack and concurrency level.')
+        parser.add_argument('--concurrency', default='1,16,64', help='Comma-separated numbers of concurrent clients.')
+        parser.add_argument('--threads', type=int, default=8, help='Worker threads of the WSGI server.')
+        parser.add_argument('--db-latency-ms', type=float, default=0,
+                            help='Add this much latency to every query, to model a database across the network.')
+        parser.add_argument('--resource', action='append', default=None,
+                            help='API prefix to read (repeatable; default: supplier, product and purchase).')
+
+    def handle(self, *args, **options):
+        user, _ = User.objects.get_or_create(username='benchmark')
+        self.authorization = f'Bearer {AccessToken.for_user(user)}'
+        self.host = next((host for host in settings.ALLOWED_HOSTS if host not in ('*',) and not host.startswith('.')),
+                         'localhost')
+        resources = options['resource'] or ['supplier', 'product', 'purchase']
+        if options['db_latency_ms']:
+            self.add_query_latency(options['db_latency_ms'] / 1000)
+
+        self.stdout.write(f"{'stack':<28} {'clients':>7} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'errors':>7}")
+        for concurrency in [int(value) for value in options['concurrency'].split(',')]:
+            paths = [f'/api/{resource}/' for resource in resources]
+            wsgi = self.run_wsgi(paths, options['requests'], concurrency, options['threads'])
+            self.report(f"WSGI sync ({options['threads']} threads)", concurrency, *wsgi)
+            paths = [f'/api/async/{resource}/' for resource in resources]
+            asgi = asyncio.run(self.run_asgi(paths, options['requests'], concurrency))
+            self.report('ASGI async views', concurrency, *asgi)
+
+    def add_query_latency(self, seconds):
+        def delay(execute, sql, params, many, context):
+            time.sleep(seconds)
+            return execute(sql, params, many, context)
+
+        def install(connection, **kwargs):
+            connection.execute_wrappers.append(delay)
+
+        # request threads open their own connections; every one of them gets the delay
+        connection_created.connect(install, weak=False)
+        for connection in connections.all(initialized_only=True):
+            install(connection)
+
+    def run_wsgi(self, paths, total, concurrency, threads):
+        handler = WSGIHandler()
+        factory = RequestFactory()
+        clients = threading.BoundedSemaphore(concurrency)
+
+        def request(index, started):
+            # latency is measured from the client's side, including the wait for a free server thread
+            try:
+                environ = factory._base_environ(PATH_INFO=paths[index % len(paths)], SERVER_NAME=self.host,
+                                                HTTP_HOST=self.host, HTTP_AUTHORIZATION=self.authorization)
+                status = []
+                b''.join(handler(environ, lambda code, headers: status.append(code)))
+                return time.perf_counter() - started, status[0].startswith('200')
+            finally:
+                clients.release()
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=threads) as server:
+            futures = []
+            for index in range(total):
+                clients.acquire()
+                futures.append(server.submit(request, index, time.perf_counter()))
+            results = [future.result() for future in futures]
+        return time.perf_counter() - started, results
+
+    async def run_asgi(self, paths, total, concurrency):
+        handler = ASGIHandler()
+        pending = iter(range(total))
+        results = []
+
+        async def client():
+            for index in pending:
+                scope = {
+                    'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET',
+                    'scheme': 'http', 'path': paths[index % len(paths)], 'raw_path': b'', 'query_string': b'',
+                    'root_path': '', 'server': (self.host, 80), 'client': ('127.0.0.1', 0),
+                    'headers': [(b'host', self.host.encode()), (b'authorization', self.authorization.encode())],
+                }
+                messages = []
+                inbound = asyncio.Queue()
+                inbound.put_nowait({'type': 'http.request', 'body': b'', 'more_body': False})
+                started = time.perf_counter()
+
+                async def receive():
+                    # after the body the handler waits for a disconnect, which never comes
+                    return await inbound.get()
+
+                async def send(message):
+                    messages.append(message)
+
+                await handler(scope, receive, send)
+                results.append((time.perf_counter() - started, messages[0]['status'] == 200))
+
+        started = time.perf_counter()
+        await asyncio.gather(*(client() for _ in range(concurrency)))
+        return time.perf_counter() - started, results
+
+    def report(self, label, concurrency, elapsed, results):
+        latencies = sorted(seconds for seconds, _ in results)
+        p95 = latencies[min(int(len(latencies) * 0.95), len(latencies) - 1)]
+        errors = sum(1 for _, ok in results if not ok)
+        self.stdout.write(
+            f'{label:<28} {concurrency:>7} {len(results) / elapsed:>9.1f} '
+            f'{statistics.median(latencies) * 1000:>9.1f} {p95 * 1000:>9.1f} {errors:>7}'
+        )
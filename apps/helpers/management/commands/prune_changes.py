@@ -0,0 +1,17 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from apps.helpers.changes import prune_changes
+
+
+class Command(BaseCommand):
+    help = 'Delete change feed entries older than --days. Clients that fall further behind must resync in full.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=30)
+
+    def handle(self, *args, **kwargs):
+        deleted = prune_changes(timezone.now() - timedelta(days=kwargs['days']))
+        self.stdout.write(self.style.SUCCESS(f"Pruned {deleted} change feed entries."))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from apps.helpers.idempotency import prune_idempotency_keys
+
+
+class Command(BaseCommand):
+    help = (
+        'Delete the stored responses of expired Idempotency-Key requests (IDEMPOTENCY_KEY_TTL_HOURS). '
+        'Retries sent after that are applied again.'
+    )
+
+    def handle(self, *args, **kwargs):
+        deleted = prune_idempotency_keys()
+        self.stdout.write(self.style.SUCCESS(f"Pruned {deleted} expired idempotency keys."))
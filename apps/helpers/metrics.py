@@ -0,0 +1,314 @@
+import bisect
+import contextvars
+import logging
+import random
+import threading
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from rest_framework.renderers import BaseRenderer
+
+from .lookups import lookup_stats
+
+
+logger = logging.getLogger(__name__)
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+KNOWN_METHODS = frozenset(('GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS'))
+# statements listed in a slow request's log entry, slowest first
+SLOW_REQUEST_STATEMENTS = 5
+
+_recorder = contextvars.ContextVar('request_metrics_recorder', default=None)
+
+
+class RequestRecorder:
+    """What one request spent in the database (and on rendering), filled in as it runs."""
+    __slots__ = ('queries', 'db_seconds', 'statements', 'render_started', 'render_finished')
+
+    def __init__(self, sample=False):
+        self.queries = 0
+        self.db_seconds = 0.0
+        # (seconds, sql) of every statement, only for sampled requests
+        self.statements = [] if sample else None
+        self.render_started = None
+        self.render_finished = None
+
+
+def record_query(execute, sql, params, many, context):
+    """
+    Connection execute wrapper (installed on every connection, see
+    ``signals.install_query_recorder``) crediting each query to the request
+    being recorded in this context, if any.
+    """
+    recorder = _recorder.get()
+    if recorder is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        elapsed = time.perf_counter() - started
+        recorder.queries += 1
+        recorder.db_seconds += elapsed
+        if recorder.statements is not None:
+            recorder.statements.append((elapsed, sql))
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(names, values, **extra):
+    pairs = [*zip(names, values), *extra.items()]
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+class Histogram:
+    """A Prometheus histogram with fixed buckets; the caller serializes updates."""
+    def __init__(self, name, documentation, labelnames, buckets):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = buckets
+        self.series = {}
+
+    def observe(self, labels, value):
+        # per-bucket counts, one more for +Inf, then the sum
+        series = self.series.get(labels)
+        if series is None:
+            series = self.series[labels] = [0] * (len(self.buckets) + 2)
+        series[bisect.bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def expose(self):
+        yield f'# HELP {self.name} {self.documentation}'
+        yield f'# TYPE {self.name} histogram'
+        for labels, series in sorted(self.series.items()):
+            cumulative = 0
+            for bound, count in zip((*self.buckets, '+Inf'), series):
+                cumulative += count
+                yield f'{self.name}_bucket{_labels(self.labelnames, labels, le=bound)} {cumulative}'
+            yield f'{self.name}_sum{_labels(self.labelnames, labels)} {series[-1]}'
+            yield f'{self.name}_count{_labels(self.labelnames, labels)} {cumulative}'
+
+
+class Counter:
+    def __init__(self, name, documentation, labelnames):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.series = {}
+
+    def inc(self, labels, amount=1):
+        self.series[labels] = self.series.get(labels, 0) + amount
+
+    def expose(self):
+        yield f'# HELP {self.name} {self.documentation}'
+        yield f'# TYPE {self.name} counter'
+        for labels, value in sorted(self.series.items()):
+            yield f'{self.name}{_labels(self.labelnames, labels)} {value}'
+
+
+class RequestMetrics:
+    """
+    Per-view request histograms of this process.
+
+    Series are labelled with the URL pattern's name (``purchaseorder-list``)
+    rather than the path, so their number is bounded by the URLconf. Each
+    worker process keeps its own; Prometheus sums them across the scraped
+    instances.
+    """
+    labelnames = ('view', 'method')
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.duration = Histogram('http_request_duration_seconds', 'Total request latency.',
+                                      self.labelnames, DURATION_BUCKETS)
+            self.queries = Histogram('http_request_queries', 'Database queries per request.',
+                                     self.labelnames, QUERY_BUCKETS)
+            self.db = Histogram('http_request_db_seconds', 'Time per request spent in database queries.',
+                                self.labelnames, DURATION_BUCKETS)
+            self.render = Histogram('http_request_render_seconds',
+                                    'Time per request spent rendering (serializing) the response body.',
+                                    self.labelnames, DURATION_BUCKETS)
+            self.responses = Counter('http_responses_total', 'Responses by status code.',
+                                     (*self.labelnames, 'status'))
+
+    def observe(self, view, method, status, duration, recorder, render):
+        labels = (view, method)
+        with self._lock:
+            self.duration.observe(labels, duration)
+            self.queries.observe(labels, recorder.queries)
+            self.db.observe(labels, recorder.db_seconds)
+            self.render.observe(labels, render)
+            self.responses.inc((view, method, str(status)))
+
+    def expose(self):
+        """The metrics in the Prometheus text exposition format."""
+        with self._lock:
+            lines = [
+                *self.duration.expose(), *self.queries.expose(), *self.db.expose(),
+                *self.render.expose(), *self.responses.expose(),
+            ]
+        lookups = Counter('lookup_cache_requests_total', 'Lookup cache reads by tier (apps.helpers.lookups).',
+                          ('model', 'result'))
+        for label, stats in lookup_stats().items():
+            for result, count in stats.items():
+                lookups.inc((label, result), count)
+        lines += lookups.expose()
+        return '\n'.join(lines) + '\n'
+
+
+request_metrics = RequestMetrics()
+
+
+class RequestMetricsMiddleware:
+    """
+    Records query count, database time, render time and total latency of
+    every request into ``request_metrics``; put it first in ``MIDDLEWARE``.
+
+    Requests slower than ``METRICS_SLOW_REQUEST_SECONDS`` are logged as a
+    warning. A ``METRICS_SQL_SAMPLE_RATE`` share of requests also keeps the
+    SQL of each statement (without parameters) so a slow one can be logged
+    with its slowest queries; unsampled requests only add two counters per
+    query. Works under WSGI and ASGI, including queries that async views run
+    through ``sync_to_async``. A streamed body (exports, dashboards) is built
+    as it is read, so its queries are recorded and the request finished when
+    the stream closes, with the streaming counted as rendering.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        started = time.perf_counter()
+        recorder = RequestRecorder(self.sample())
+        token = _recorder.set(recorder)
+        try:
+            response = self.get_response(request)
+        finally:
+            _recorder.reset(token)
+        return self.complete(request, response, recorder, started)
+
+    async def __acall__(self, request):
+        started = time.perf_counter()
+        recorder = RequestRecorder(self.sample())
+        token = _recorder.set(recorder)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _recorder.reset(token)
+        return self.complete(request, response, recorder, started)
+
+    def process_template_response(self, request, response):
+        # called right before DRF (template) responses are rendered; the callback runs right after,
+        # before the other middleware's response processing
+        recorder = _recorder.get()
+        if recorder is not None:
+            recorder.render_started = time.perf_counter()
+
+            def rendered(response):
+                recorder.render_finished = time.perf_counter()
+            response.add_post_render_callback(rendered)
+        return response
+
+    def complete(self, request, response, recorder, started):
+        if not response.streaming:
+            self.finish(request, response, recorder, started)
+        elif response.is_async:
+            response.streaming_content = self.arecord_stream(response.streaming_content, request, response, recorder,
+                                                             started)
+        else:
+            response.streaming_content = self.record_stream(response.streaming_content, request, response, recorder,
+                                                            started)
+        return response
+
+    def record_stream(self, content, request, response, recorder, started):
+        chunks = iter(content)
+        recorder.render_started = time.perf_counter()
+        try:
+            while True:
+                token = _recorder.set(recorder)
+                try:
+                    chunk = next(chunks)
+                except StopIteration:
+                    return
+                finally:
+                    _recorder.reset(token)
+                yield chunk
+        finally:
+            self.finish(request, response, recorder, started)
+
+    async def arecord_stream(self, content, request, response, recorder, started):
+        chunks = aiter(content)
+        recorder.render_started = time.perf_counter()
+        try:
+            while True:
+                token = _recorder.set(recorder)
+                try:
+                    chunk = await anext(chunks)
+                except StopAsyncIteration:
+                    return
+                finally:
+                    _recorder.reset(token)
+                yield chunk
+        finally:
+            self.finish(request, response, recorder, started)
+
+    @staticmethod
+    def sample():
+        rate = getattr(settings, 'METRICS_SQL_SAMPLE_RATE', 0)
+        return rate > 0 and random.random() < rate
+
+    def finish(self, request, response, recorder, started):
+        finished = time.perf_counter()
+        match = request.resolver_match
+        view = match.view_name if match is not None else '<unmatched>'
+        method = request.method if request.method in KNOWN_METHODS else 'other'
+        duration = finished - started
+        render = 0.0
+        if recorder.render_started is not None:
+            render = (recorder.render_finished or finished) - recorder.render_started
+        request_metrics.observe(view, method, response.status_code, duration, recorder, render)
+
+        threshold = getattr(settings, 'METRICS_SLOW_REQUEST_SECONDS', None)
+        if threshold is not None and duration >= threshold:
+            self.log_slow_request(request, response, view, duration, recorder, render)
+
+    @staticmethod
+    def log_slow_request(request, response, view, duration, recorder, render):
+        statements = ''
+        if recorder.statements:
+            slowest = sorted(recorder.statements, key=lambda statement: statement[0], reverse=True)
+            statements = ''.join(f'\n  {seconds * 1000:8.1f} ms  {sql}'
+                                 for seconds, sql in slowest[:SLOW_REQUEST_STATEMENTS])
+        logger.warning(
+            'Slow request %s %s (%s, %s): %.0f ms total, %d queries in %.0f ms, %.0f ms rendering%s',
+            request.method, request.path, view, response.status_code, duration * 1000,
+            recorder.queries, recorder.db_seconds * 1000, render * 1000, statements,
+        )
+
+
+class PrometheusRenderer(BaseRenderer):
+    media_type = 'text/plain'
+    format = 'prometheus'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if isinstance(data, str):
+            return data.encode(self.charset)
+        # errors (e.g. 403) are dicts
+        return '\n'.join(f'# {key}: {value}' for key, value in data.items()).encode(self.charset) + b'\n'
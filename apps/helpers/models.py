@@ -1,18 +1,117 @@
 from django.contrib.auth import get_user_model
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
+from django.utils import timezone
 
 User = get_user_model()
 
 
+class TimeStampQuerySet(models.QuerySet):
+    def update(self, **kwargs):
+        # set-based writes (including bulk_update) move updated_at like save() does
+        kwargs.setdefault('updated_at', timezone.now())
+        return super().update(**kwargs)
+
+
+class LoadedValuesMixin:
+    """
+    Remembers the column values a model instance was loaded with, so
+    ``post_save`` receivers can tell which fields a save changed.
+    """
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        self._loaded_values = {field.attname: getattr(self, field.attname) for field in self._meta.concrete_fields}
+
+    def has_changed(self, *field_names):
+        """Whether any of ``field_names`` differs from its loaded value (True for instances not loaded)."""
+        loaded = getattr(self, '_loaded_values', {})
+        return any(field not in loaded or loaded[field] != getattr(self, field) for field in field_names)
+
+
 class TimeStamp(models.Model):
     """
     An abstract base model that provides self-updating
     'created_at' and 'updated_at' fields along with user tracking.
+
+    'updated_at' moves on every save (also with update_fields) and on
+    queryset updates; bulk_create upserts must list it in update_fields.
     """
     created_at = models.DateTimeField(auto_now_add=True)
-    updated_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
     created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
     updated_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
 
+    objects = TimeStampQuerySet.as_manager()
+
     class Meta:
         abstract = True
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        if update_fields:
+            kwargs['update_fields'] = {*update_fields, 'updated_at'}
+        super().save(*args, **kwargs)
+
+
+class Change(models.Model):
+    """
+    One row per write to a tracked model (see apps.helpers.changes). The
+    change feed is ordered by ``(txid, id)``, the order in which the writes
+    commit: clients resume from the last position they have seen, which is
+    an indexed range scan however large the tracked tables are.
+
+    ``txid`` is the writing transaction's id on PostgreSQL, where
+    transactions may commit out of id order; it is 0 on SQLite, whose
+    writers are serialized so ids already follow commit order.
+    """
+    UPSERT = 'upsert'
+    DELETE = 'delete'
+    ACTION_CHOICES = [
+        (UPSERT, 'Created or updated'),
+        (DELETE, 'Deleted'),
+    ]
+    model = models.CharField(max_length=100)
+    object_id = models.BigIntegerField()
+    action = models.CharField(max_length=10, choices=ACTION_CHOICES, default=UPSERT)
+    changed_at = models.DateTimeField(auto_now_add=True)
+    txid = models.BigIntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            # pruning by age
+            models.Index(fields=['changed_at'], name='helpers_change_changed_at_idx'),
+            # feed position
+            models.Index(fields=['txid', 'id'], name='helpers_change_position_idx'),
+        ]
+
+
+class IdempotencyKey(models.Model):
+    """
+    The outcome of a request sent with an ``Idempotency-Key`` header (see
+    apps.helpers.idempotency), so a retry with the same key is answered with
+    the stored response instead of being applied again. A row without a
+    ``status_code`` is a request still in progress.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    key = models.CharField(max_length=255)
+    # method, path and body of the first request; a retry must match it
+    fingerprint = models.CharField(max_length=64)
+    status_code = models.PositiveSmallIntegerField(null=True, blank=True)
+    response = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder)
+    created_at = models.DateTimeField(default=timezone.now)
+    expires_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'key'], name='helpers_idempotency_user_key_uniq'),
+        ]
+        indexes = [
+            # eviction by age
+            models.Index(fields=['expires_at'], name='helpers_idem_expires_at_idx'),
+        ]
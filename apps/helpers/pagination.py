@@ -0,0 +1,127 @@
+import json
+
+from asgiref.sync import sync_to_async
+from django.core.paginator import InvalidPage, Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, CursorPagination, PageNumberPagination
+
+
+# below this many rows an exact COUNT(*) is cheap enough and more useful than an estimate
+APPROXIMATE_COUNT_THRESHOLD = 10000
+
+
+def approximate_count(queryset):
+    """
+    Row count for ``queryset`` taken from the query planner's estimate.
+
+    Only PostgreSQL exposes a usable estimate; other backends, and small
+    results where the estimate is unreliable, fall back to an exact count.
+    """
+    if connections[queryset.db].vendor != 'postgresql':
+        return queryset.count()
+    plan = json.loads(queryset.order_by().explain(format='json'))
+    estimate = int(plan[0]['Plan']['Plan Rows'])
+    if estimate < APPROXIMATE_COUNT_THRESHOLD:
+        return queryset.count()
+    return estimate
+
+
+class ApproximateCountPaginator(Paginator):
+    @cached_property
+    def count(self):
+        return approximate_count(self.object_list)
+
+
+class ApproximateCountPagination(PageNumberPagination):
+    django_paginator_class = ApproximateCountPaginator
+
+
+async def apaginate_page_number(pagination, queryset, request):
+    """
+    ``PageNumberPagination.paginate_queryset`` on the async ORM: the count
+    and the page rows (with their prefetches) are read with ``acount`` and
+    ``aiterator``. The approximate count still runs in a worker thread.
+    """
+    pagination.request = request
+    page_size = pagination.get_page_size(request)
+    if not page_size:
+        return None
+
+    paginator = pagination.django_paginator_class(queryset, page_size)
+    if isinstance(paginator, ApproximateCountPaginator):
+        count = await sync_to_async(approximate_count)(queryset)
+    else:
+        count = await queryset.acount()
+    # Paginator.count is a cached_property; prime it so page() does not query
+    paginator.__dict__['count'] = count
+    try:
+        pagination.page = paginator.page(pagination.get_page_number(request, paginator))
+    except InvalidPage as exc:
+        raise NotFound(pagination.invalid_page_message.format(
+            page_number=pagination.get_page_number(request, paginator), message=str(exc)
+        ))
+    pagination.page.object_list = [
+        row async for row in pagination.page.object_list.aiterator(chunk_size=page_size)
+    ]
+    if paginator.num_pages > 1 and pagination.template is not None:
+        pagination.display_page_controls = True
+    return list(pagination.page)
+
+
+class KeysetPagination(CursorPagination):
+    """
+    Cursor pagination over the primary key. Ids grow with ``created_at``, so
+    this is creation order, and every page is an indexed ``id > X LIMIT n``
+    no matter how deep it is; no ``COUNT(*)`` is run.
+    """
+    ordering = 'id'
+
+
+class SelectablePagination(BasePagination):
+    """
+    Lets each request choose how a list endpoint is paginated.
+
+        ?page=N                   page numbers with an exact count (default)
+        ?page=N&count=approximate page numbers with a planner-estimated count
+        ?pagination=cursor        keyset pages; follow ``next``/``previous``
+
+    Requests carrying a ``cursor`` parameter are always served by keyset pagination.
+    """
+    cursor_query_param = KeysetPagination.cursor_query_param
+
+    def get_paginator(self, request):
+        if request.query_params.get('pagination') == 'cursor' or self.cursor_query_param in request.query_params:
+            return KeysetPagination()
+        if request.query_params.get('count') == 'approximate':
+            return ApproximateCountPagination()
+        return PageNumberPagination()
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.paginator = self.get_paginator(request)
+        return self.paginator.paginate_queryset(queryset, request, view=view)
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """Async ``paginate_queryset``; keyset pages are still read in a worker thread."""
+        self.paginator = self.get_paginator(request)
+        if isinstance(self.paginator, PageNumberPagination):
+            return await apaginate_page_number(self.paginator, queryset, request)
+        return await sync_to_async(self.paginator.paginate_queryset)(queryset, request, view=view)
+
+    def get_paginated_response(self, data):
+        return self.paginator.get_paginated_response(data)
+
+    def get_paginated_response_schema(self, schema):
+        return PageNumberPagination().get_paginated_response_schema(schema)
+
+    def get_schema_operation_parameters(self, view):
+        return (PageNumberPagination().get_schema_operation_parameters(view)
+                + KeysetPagination().get_schema_operation_parameters(view))
+
+    def to_html(self):
+        return self.paginator.to_html()
+
+    @property
+    def display_page_controls(self):
+        return getattr(self.paginator, 'display_page_controls', False)
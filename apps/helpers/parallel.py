@@ -0,0 +1,28 @@
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+
+
+def ordered_map(func, tasks, workers=0):
+    """
+    Yield ``func(*args)`` for every ``args`` tuple in ``tasks``, in order.
+
+    With ``workers`` the calls run in a process pool (each worker sets Django
+    up, so ``func`` may use models and serializers but should not query), and
+    at most two tasks per worker are in flight: ``tasks`` is consumed only as
+    fast as results are taken, so neither inputs nor results pile up in memory.
+    """
+    if not workers:
+        for args in tasks:
+            yield func(*args)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=django.setup) as pool:
+        pending = deque()
+        for args in tasks:
+            pending.append(pool.submit(func, *args))
+            if len(pending) >= workers * 2:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
@@ -1,8 +1,73 @@
+import time
+
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import cache, caches
+from django.core.cache.backends.locmem import LocMemCache
 from rest_framework.permissions import BasePermission
 
+
+AUTHZ_CACHE_TIMEOUT = 60 * 15
+# a per-process (locmem) cache never hears of invalidations made by other workers, so there a
+# revoked permission is honoured elsewhere for at most this long
+AUTHZ_LOCAL_CACHE_TIMEOUT = 10
+AUTHZ_VERSION_KEY = 'authz:version'
+
+
+def authz_cache_key(user_id):
+    """Cache key of a user's groups/permissions under the current global version."""
+    # versions start from the clock, so one evicted from the cache is never reissued
+    version = cache.get_or_set(AUTHZ_VERSION_KEY, time.time_ns, timeout=None)
+    return f'authz:{version}:{user_id}'
+
+
+def authz_cache_timeout():
+    """How long entries are kept: briefly while the ``default`` cache is not shared between processes."""
+    return AUTHZ_LOCAL_CACHE_TIMEOUT if isinstance(caches['default'], LocMemCache) else AUTHZ_CACHE_TIMEOUT
+
+
+def invalidate_user_authz(*user_ids):
+    """Drop the cached groups/permissions of specific users."""
+    cache.delete_many([authz_cache_key(user_id) for user_id in user_ids])
+
+
+def invalidate_all_authz():
+    """Expire every user's cached groups/permissions, e.g. when a group's permissions change."""
+    try:
+        cache.incr(AUTHZ_VERSION_KEY)
+    except ValueError:
+        cache.set(AUTHZ_VERSION_KEY, time.time_ns(), timeout=None)
+
+
+def get_user_authz(user):
+    """
+    Group names and permission strings of ``user``, read from the cache.
+
+    The database is only queried on a miss. Entries are invalidated by the
+    handlers in ``apps.helpers.signals`` whenever group membership or
+    permissions change, and are also memoised on the user object for the
+    rest of the request. Invalidations only reach other processes through a
+    shared ``default`` cache; with the per-process default (locmem) entries
+    expire after ``AUTHZ_LOCAL_CACHE_TIMEOUT`` seconds instead.
+    """
+    if not user or not user.is_authenticated:
+        return {'groups': frozenset(), 'permissions': frozenset()}
+    if not hasattr(user, '_authz_cache'):
+        key = authz_cache_key(user.pk)
+        authz = cache.get(key)
+        if authz is None:
+            authz = {
+                'groups': frozenset(user.groups.values_list('name', flat=True)),
+                'permissions': frozenset(ModelBackend().get_all_permissions(user)),
+            }
+            cache.set(key, authz, authz_cache_timeout())
+        user._authz_cache = authz
+    return user._authz_cache
+
+
 class IsManager(BasePermission):
     """
     Custom permission to grant access only to users who belong to the 'Manager' group.
+    Group membership is served from the authorization cache (see get_user_authz).
     Usage:
         Apply this permission class to DRF views or viewsets to restrict access
         to managerial users only.
@@ -12,4 +77,4 @@ class IsManager(BasePermission):
             permission_classes = [IsManager]
     """
     def has_permission(self, request, view):
-        return request.user.groups.filter(name="Manager").exists()
+        return "Manager" in get_user_authz(request.user)['groups']
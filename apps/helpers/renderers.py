@@ -0,0 +1,60 @@
+import re
+
+import orjson
+from rest_framework.renderers import JSONRenderer
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    ``JSONRenderer`` with the same bytes out, encoded by orjson.
+
+    Compact, unindented output (the API default) is encoded by orjson; types
+    it does not know, and datetimes, go through DRF's ``JSONEncoder``. Where
+    orjson's output could differ from the standard library's, the response
+    falls back to ``JSONRenderer``: indented or ASCII-only output, integers
+    beyond 64 bits or non-string keys (orjson refuses those), and floats
+    written with an exponent or below 1e-4 (spotted in the output; a string
+    that merely looks like one only costs the faster path). Non-finite floats
+    are written as ``null`` instead of failing.
+    """
+    options = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS
+    # floats Python writes as 1e+16 / 1e-05 and orjson as 1e16 / 0.00001: a regex over the whole
+    # body costs more than the encoding saves, so a translate/substring screen runs first
+    screen = bytes.maketrans(b'123456789E', b'000000000e')
+    float_mismatch = re.compile(rb'[:,\[]-?(?:[0-9.]+[eE]|0\.0000)')
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if (self.ensure_ascii or not self.compact
+                or self.get_indent(accepted_media_type, renderer_context or {}) is not None):
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            ret = orjson.dumps(data, default=self.encoder_class().default, option=self.options)
+        except TypeError:
+            return super().render(data, accepted_media_type, renderer_context)
+        if self.may_differ(ret):
+            return super().render(data, accepted_media_type, renderer_context)
+        # \u2028 and \u2029 are escaped as JSONRenderer does
+        return ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+
+    def may_differ(self, ret):
+        if b'0e' not in ret.translate(self.screen) and b'0.0000' not in ret:
+            return False
+        return self.float_mismatch.search(ret) is not None
+
+
+class CSVRenderer(JSONRenderer):
+    """
+    Lets content negotiation select CSV (``?format=csv`` or ``Accept: text/csv``)
+    for views that stream their own CSV body. Anything rendered through it
+    (i.e. error responses) is written as JSON.
+    """
+    media_type = 'text/csv'
+    format = 'csv'
+
+
+class NDJSONRenderer(JSONRenderer):
+    """Content negotiation counterpart of CSVRenderer for newline-delimited JSON."""
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
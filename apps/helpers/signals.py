@@ -0,0 +1,50 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group, Permission
+from django.db.backends.signals import connection_created
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from .metrics import record_query
+from .permissions import invalidate_all_authz, invalidate_user_authz
+
+User = get_user_model()
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+@receiver(m2m_changed, sender=User.user_permissions.through)
+def user_authz_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if not action.startswith('post_'):
+        return
+    if isinstance(instance, User):
+        invalidate_user_authz(instance.pk)
+    elif pk_set:
+        # changed from the group/permission side: only the listed users are affected
+        invalidate_user_authz(*pk_set)
+    else:
+        invalidate_all_authz()
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, **kwargs):
+    # is_active / is_superuser decide which permissions a user has
+    invalidate_user_authz(instance.pk)
+
+
+@receiver(m2m_changed, sender=Group.permissions.through)
+def group_permissions_changed(sender, action, **kwargs):
+    if action.startswith('post_'):
+        invalidate_all_authz()
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+@receiver(post_delete, sender=Permission)
+def authz_objects_changed(sender, **kwargs):
+    invalidate_all_authz()
+
+
+@receiver(connection_created)
+def install_query_recorder(sender, connection, **kwargs):
+    # fires on every (re)connect of a thread's connection; its wrappers persist in between
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
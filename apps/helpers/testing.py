@@ -0,0 +1,44 @@
+from django.core.cache import caches
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+
+class QueryBudgetMixin:
+    """
+    TestCase mixin that fails when an endpoint's query count depends on how
+    many rows it returns (the classic N+1 regression).
+
+    Usage:
+        class SupplierTests(QueryBudgetMixin, TestCase):
+            def test_list_query_budget(self):
+                self.assertQueryBudget(reverse('supplier-list'), lambda n: make_suppliers(n))
+
+    ``populate(n)`` is called before each measurement to add ``n`` more rows;
+    every request must then run the same number of queries. Caches are
+    cleared before each measurement, so cached lookups cannot hide an N+1.
+    """
+    query_budget_sizes = (1, 5, 15)
+
+    def clear_caches(self):
+        for cache in caches.all():
+            cache.clear()
+
+    def count_queries(self, url, **extra):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url, **extra)
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries), response
+
+    def assertQueryBudget(self, url, populate, sizes=None, **extra):
+        counts = {}
+        rows = 0
+        for size in sizes or self.query_budget_sizes:
+            populate(size - rows)
+            rows = size
+            self.clear_caches()
+            counts[size], _ = self.count_queries(url, **extra)
+        self.assertEqual(
+            len(set(counts.values())), 1,
+            f"Query count for {url} grows with the number of rows (rows: queries) {counts}",
+        )
+        return counts
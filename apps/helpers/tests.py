@@ -0,0 +1,385 @@
+import threading
+import time
+import uuid
+from datetime import date, datetime, timezone as dt_timezone
+from decimal import Decimal
+
+from django.contrib.auth.models import User, Group, Permission
+from django.core.exceptions import ImproperlyConfigured
+from django.core.cache import cache, caches
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from unittest import mock, skipUnless
+
+from django.test import TestCase, TransactionTestCase, Client, RequestFactory, override_settings
+from django.urls import reverse
+from django.utils.translation import gettext_lazy
+from rest_framework import serializers
+from rest_framework.exceptions import ErrorDetail
+from rest_framework.renderers import JSONRenderer
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from apps.helpers.changes import change_feed
+from apps.helpers.fastpath import FastSerializer
+from apps.helpers.renderers import FastJSONRenderer
+
+from apps.helpers.lookups import LOOKUP_LOCAL_CACHE
+from apps.helpers.metrics import request_metrics
+from apps.helpers.models import Change
+from apps.helpers.permissions import (AUTHZ_CACHE_TIMEOUT, AUTHZ_LOCAL_CACHE_TIMEOUT, IsManager, authz_cache_timeout,
+                                      get_user_authz)
+from apps.product.lookups import product_lookup
+from apps.product.models import Product
+from apps.purchase.ledger import post_movements
+from apps.purchase.models import PurchaseOrder, PurchaseOrderItem
+from apps.purchase.services import receive_items
+from apps.supplier.models import Supplier
+
+
+class AuthzCacheTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.manager_group, _ = Group.objects.get_or_create(name="Manager")
+        self.user = User.objects.create_user(username='user', password='testpass')
+
+    def _fresh_user(self):
+        # a new instance per "request", as the JWT authentication hands out
+        return User.objects.get(pk=self.user.pk)
+
+    def _is_manager(self, user):
+        request = RequestFactory().post('/')
+        request.user = user
+        return IsManager().has_permission(request, None)
+
+    def test_cached_checks_run_no_queries(self):
+        self.manager_group.permissions.add(Permission.objects.get(codename='add_purchaseorder'))
+        self.user.groups.add(self.manager_group)
+        self.assertTrue(self._is_manager(self._fresh_user()))
+
+        user = self._fresh_user()
+        with self.assertNumQueries(0):
+            self.assertTrue(self._is_manager(user))
+            self.assertTrue(user.has_perm('purchase.add_purchaseorder'))
+            self.assertFalse(user.has_perm('purchase.delete_purchaseorder'))
+
+    def test_membership_change_invalidates(self):
+        self.assertFalse(self._is_manager(self._fresh_user()))
+
+        self.user.groups.add(self.manager_group)
+        self.assertTrue(self._is_manager(self._fresh_user()))
+
+        self.manager_group.user_set.remove(self.user)
+        self.assertFalse(self._is_manager(self._fresh_user()))
+
+    def test_group_permission_change_invalidates(self):
+        self.user.groups.add(self.manager_group)
+        self.assertFalse(self._fresh_user().has_perm('purchase.add_purchaseorder'))
+
+        self.manager_group.permissions.add(Permission.objects.get(codename='add_purchaseorder'))
+        self.assertTrue(self._fresh_user().has_perm('purchase.add_purchaseorder'))
+
+    def test_entries_expire_soon_on_a_per_process_cache(self):
+        self.assertFalse(self._is_manager(self._fresh_user()))
+        # another worker revokes or grants membership: this process's cache never hears of it
+        with mock.patch('apps.helpers.signals.invalidate_user_authz'):
+            self.user.groups.add(self.manager_group)
+        self.assertFalse(self._is_manager(self._fresh_user()))
+        with mock.patch('django.core.cache.backends.locmem.time.time',
+                        return_value=time.time() + AUTHZ_LOCAL_CACHE_TIMEOUT + 1):
+            self.assertTrue(self._is_manager(self._fresh_user()))
+
+        with self.settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}}):
+            self.assertEqual(authz_cache_timeout(), AUTHZ_CACHE_TIMEOUT)
+
+    def test_anonymous_user_has_no_groups(self):
+        from django.contrib.auth.models import AnonymousUser
+        self.assertEqual(get_user_authz(AnonymousUser())['groups'], frozenset())
+
+
+class LookupCacheTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        caches[LOOKUP_LOCAL_CACHE].clear()
+        product_lookup.stats.clear()
+        self.products = Product.objects.bulk_create([Product(name=f"P{i}", sku=f"P-{i}") for i in range(3)])
+        self.pks = [product.pk for product in self.products]
+
+    def test_reads_through_both_tiers_in_batches(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(product_lookup.get_many(self.pks + [999999])[self.pks[0]], {'name': "P0", 'sku': "P-0"})
+        with self.assertNumQueries(0):
+            product_lookup.get_many(self.pks)
+        # another process: empty local tier, warm shared tier
+        caches[LOOKUP_LOCAL_CACHE].clear()
+        with self.assertNumQueries(0):
+            product_lookup.get_many(self.pks)
+        self.assertEqual(dict(product_lookup.stats), {'local_hits': 3, 'shared_hits': 3, 'misses': 4})
+
+    def test_saves_invalidate_and_bulk_writes_bump_the_version(self):
+        product_lookup.get_many(self.pks)
+        product = self.products[0]
+        product.name = "Renamed"
+        product.save()
+        self.assertEqual(product_lookup.get(product.pk)['name'], "Renamed")
+
+        Product.objects.filter(pk=self.pks[1]).update(name="Bulk")
+        self.assertEqual(product_lookup.get(self.pks[1])['name'], "P1")
+        product_lookup.invalidate_all()
+        self.assertEqual(product_lookup.get(self.pks[1])['name'], "Bulk")
+
+
+    def test_saves_invalidate_again_on_commit(self):
+        product = self.products[0]
+        with self.captureOnCommitCallbacks(execute=True):
+            product.name = "Renamed"
+            product.save()
+            # another request read the row before the save committed, and cached the old name
+            key = product_lookup.key(product_lookup.version(), product.pk)
+            product_lookup.shared.set(key, {'name': "P0", 'sku': "P-0"})
+            product_lookup.local.set(key, {'name': "P0", 'sku': "P-0"})
+        self.assertEqual(product_lookup.get(product.pk)['name'], "Renamed")
+
+    def test_bump_after_the_version_was_evicted_is_not_lost(self):
+        product_lookup.get_many(self.pks)
+        # the shared tier lost the version; this process still holds the old one locally
+        cache.delete(product_lookup.version_key)
+        Product.objects.filter(pk=self.pks[0]).update(name="Bulk")
+        product_lookup.invalidate_all()
+        self.assertEqual(product_lookup.get(self.pks[0])['name'], "Bulk")
+
+class ChangeFeedTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        user = User.objects.create_user(username='sync', password='testpass')
+        self.client.defaults['HTTP_AUTHORIZATION'] = f'Bearer {RefreshToken.for_user(user).access_token}'
+        self.supplier = Supplier.objects.create(name="Acme")
+        self.product = Product.objects.create(name="Widget", sku="W-1", stock_quantity=0)
+
+    def _read(self, since=0, **params):
+        response = self.client.get(reverse('change-list'), {'since': since, **params})
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def _po(self):
+        po = PurchaseOrder.objects.create(supplier=self.supplier, status='approved')
+        PurchaseOrderItem.objects.create(po=po, product=self.product, ordered_quantity=5)
+        return po
+
+    def test_feed_returns_only_the_deltas_since_a_token(self):
+        first = self._read()
+        self.assertEqual({(c['model'], c['id']) for c in first['changes']},
+                         {('supplier.supplier', self.supplier.id), ('product.product', self.product.id)})
+
+        po = self._po()
+        receive_items(po, {self.product.id: 2})
+        batch = self._read(first['next'])
+        changes = {(c['model'], c['id']): c for c in batch['changes']}
+        # the PO's own write, its item and the receipt collapse into one entry with the current state
+        self.assertEqual(set(changes), {('purchase.purchaseorder', po.id), ('product.product', self.product.id)})
+        self.assertEqual(changes[('purchase.purchaseorder', po.id)]['data']['status'], 'partially_delivered')
+        self.assertEqual(changes[('purchase.purchaseorder', po.id)]['data']['items'][0]['received_quantity'], 2)
+        self.assertEqual(changes[('product.product', self.product.id)]['data']['stock_quantity'], 2)
+
+        self.assertEqual(self._read(batch['next'])['changes'], [])
+        po_id = po.id
+        po.delete()
+        (deleted,) = self._read(batch['next'])['changes']
+        self.assertEqual((deleted['action'], deleted['id'], deleted['data']), ('delete', po_id, None))
+
+    def test_batches_cost_the_same_whatever_their_size(self):
+        since = self._read()['next']
+        counts = []
+        for size in (2, 12):
+            for _ in range(size):
+                self._po()
+            post_movements('ADJUSTMENT', {self.product.id: 1})
+            cache.clear()
+            caches['local'].clear()
+            with CaptureQueriesContext(connection) as ctx:
+                batch = self._read(since, limit=100)
+            since = batch['next']
+            self.assertEqual(len(batch['changes']), size + 1)
+            counts.append(len(ctx.captured_queries))
+        self.assertEqual(counts[0], counts[1])
+
+        page = self._read(0, limit=1)
+        self.assertTrue(page['has_more'])
+        self.assertEqual(self.client.get(reverse('change-list'), {'since': 'x'}).status_code, 400)
+
+    def test_changes_of_unfinished_transactions_are_held_back(self):
+        Change.objects.all().delete()
+        # transaction 100 writes first and commits last; 101 commits in between
+        Change.objects.create(model='product.product', object_id=self.product.id, txid=100)
+        later = Change.objects.create(model='supplier.supplier', object_id=self.supplier.id, txid=101)
+        with mock.patch('apps.helpers.changes.finished_before', return_value=100):
+            self.assertEqual(self._read(), {'changes': [], 'next': '0', 'has_more': False})
+
+        Change.objects.create(model='product.product', object_id=self.product.id, txid=100)
+        with mock.patch('apps.helpers.changes.finished_before', return_value=102):
+            batch = self._read()
+            self.assertEqual([change['model'] for change in batch['changes']],
+                             ['product.product', 'supplier.supplier'])
+            self.assertEqual(batch['next'], f'101.{later.pk}')
+            self.assertEqual(self._read(batch['next'])['changes'], [])
+
+
+@skipUnless(connection.vendor == 'postgresql', "Requires concurrent writers")
+class ChangeFeedConcurrencyTests(TransactionTestCase):
+
+    def test_long_running_writer_is_not_skipped(self):
+        supplier = Supplier.objects.create(name="Acme")
+        _, position, _ = change_feed.read()
+        written, release = threading.Event(), threading.Event()
+
+        def writer():
+            try:
+                with transaction.atomic():
+                    Product.objects.create(name="Widget", sku="W-1")
+                    written.set()
+                    release.wait(10)
+            finally:
+                connection.close()
+
+        thread = threading.Thread(target=writer)
+        thread.start()
+        self.assertTrue(written.wait(10))
+        # commits while the writer is still open
+        supplier.name = "Renamed"
+        supplier.save()
+        changes, held, _ = change_feed.read(position)
+        self.assertEqual((changes, held), ([], position))
+
+        release.set()
+        thread.join()
+        changes, _, _ = change_feed.read(held)
+        self.assertEqual({change['model'] for change in changes}, {'product.product', 'supplier.supplier'})
+
+
+class FastJSONRendererTests(TestCase):
+
+    def assertSameBytes(self, data, accepted_media_type='application/json'):
+        self.assertEqual(FastJSONRenderer().render(data, accepted_media_type),
+                         JSONRenderer().render(data, accepted_media_type))
+
+    def test_output_matches_json_renderer(self):
+        self.assertSameBytes({
+            'text': 'caf\u00e9 \u6f22 \U0001f600 "quoted" \\ \u2028\u2029 ' + ''.join(map(chr, range(32))) + '\x7f',
+            'numbers': [0, -1, 2 ** 63 - 1, 0.5, 123.456, 100.0, -0.0],
+            'exponent floats': [1e16, 1e-05, 1.5e300, 6.02e23],
+            'decimal': Decimal('12.50'),
+            'datetimes': [datetime(2024, 5, 1, 12, 30, 15, 123456, tzinfo=dt_timezone.utc), date(2024, 5, 1)],
+            'uuid': uuid.UUID(int=1),
+            'lazy': gettext_lazy('This field is required.'),
+            'error': [ErrorDetail('Invalid.', code='invalid')],
+            'nested': {'empty': [], 'none': None, 'flags': [True, False]},
+        })
+        self.assertSameBytes([{'big': 2 ** 70}, {1: 'int key'}])
+        self.assertSameBytes({'a': [1, {'b': 2}]}, 'application/json; indent=4')
+        self.assertEqual(FastJSONRenderer().render(None), b'')
+
+
+class FastSerializerTests(TestCase):
+
+    def test_rejects_fields_it_cannot_read_from_columns(self):
+        class MethodSerializer(serializers.ModelSerializer):
+            label = serializers.SerializerMethodField()
+
+            class Meta:
+                model = Supplier
+                fields = ['id', 'label']
+
+        class RelatedObjectSerializer(serializers.ModelSerializer):
+            supplier = serializers.StringRelatedField()
+
+            class Meta:
+                model = PurchaseOrder
+                fields = ['id', 'supplier']
+
+        for serializer_class in (MethodSerializer, RelatedObjectSerializer):
+            with self.assertRaises(ImproperlyConfigured):
+                FastSerializer(serializer_class)
+
+
+class RequestMetricsTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        request_metrics.reset()
+        self.admin = User.objects.create_user(username='admin', password='testpass', is_staff=True)
+        self.user = User.objects.create_user(username='user', password='testpass')
+        self.auth = {'HTTP_AUTHORIZATION': f'Bearer {RefreshToken.for_user(self.admin).access_token}'}
+        self.client = Client(**self.auth)
+        supplier = Supplier.objects.create(name="Acme")
+        PurchaseOrder.objects.create(supplier=supplier, status='pending')
+
+    def _metrics(self):
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain'))
+        return response.content.decode().splitlines()
+
+    def _sample(self, line_prefix):
+        return next(float(line.rsplit(' ', 1)[1]) for line in self._metrics() if line.startswith(line_prefix))
+
+    def test_records_queries_and_latency_per_view(self):
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(self.client.get(reverse('purchaseorder-list')).status_code, 200)
+        queries = len(ctx.captured_queries)
+        self.client.get('/api/no-such-endpoint/')
+
+        labels = '{view="purchaseorder-list",method="GET"}'
+        self.assertEqual(self._sample(f'http_request_queries_sum{labels}'), queries)
+        self.assertEqual(self._sample(f'http_request_duration_seconds_count{labels}'), 1)
+        self.assertGreater(self._sample(f'http_request_db_seconds_sum{labels}'), 0)
+        self.assertGreater(self._sample(f'http_request_render_seconds_sum{labels}'), 0)
+        lines = self._metrics()
+        self.assertIn('http_request_duration_seconds_bucket{view="purchaseorder-list",method="GET",le="+Inf"} 1',
+                      lines)
+        self.assertIn('http_responses_total{view="<unmatched>",method="GET",status="404"} 1', lines)
+        self.assertIn('# TYPE http_request_queries histogram', lines)
+
+    async def test_records_queries_of_async_views_under_asgi(self):
+        response = await self.async_client.get(reverse('purchaseorder-async-list'),
+                                               headers={'Authorization': self.auth['HTTP_AUTHORIZATION']})
+        self.assertEqual(response.status_code, 200)
+        text = request_metrics.expose()
+        queries = next(line for line in text.splitlines()
+                       if line.startswith('http_request_queries_sum{view="purchaseorder-async-list"'))
+        self.assertGreater(float(queries.rsplit(' ', 1)[1]), 0)
+
+    def test_streamed_bodies_are_recorded_as_they_are_read(self):
+        labels = '{view="purchaseorder-export",method="GET"}'
+        response = self.client.get(reverse('purchaseorder-export'))
+        self.assertTrue(response.streaming)
+        self.assertNotIn(f'http_request_duration_seconds_count{labels}', request_metrics.expose())
+
+        with CaptureQueriesContext(connection) as ctx:
+            b''.join(response.streaming_content)
+        self.assertGreater(len(ctx.captured_queries), 0)
+        self.assertEqual(self._sample(f'http_request_duration_seconds_count{labels}'), 1)
+        self.assertGreaterEqual(self._sample(f'http_request_queries_sum{labels}'), len(ctx.captured_queries))
+        self.assertGreater(self._sample(f'http_request_render_seconds_sum{labels}'), 0)
+
+    def test_metrics_are_for_staff_only(self):
+        self.client.defaults['HTTP_AUTHORIZATION'] = f'Bearer {RefreshToken.for_user(self.user).access_token}'
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 403)
+        self.assertEqual(Client().get(reverse('metrics')).status_code, 401)
+
+    def test_slow_requests_are_logged_with_sampled_sql(self):
+        with override_settings(METRICS_SLOW_REQUEST_SECONDS=0, METRICS_SQL_SAMPLE_RATE=1.0), \
+                self.assertLogs('apps.helpers.metrics', 'WARNING') as logs:
+            self.client.get(reverse('purchaseorder-list'))
+        self.assertIn('purchaseorder-list', logs.output[0])
+        self.assertIn('SELECT', logs.output[0])
+
+        with override_settings(METRICS_SLOW_REQUEST_SECONDS=0, METRICS_SQL_SAMPLE_RATE=0.0), \
+                self.assertLogs('apps.helpers.metrics', 'WARNING') as logs:
+            self.client.get(reverse('purchaseorder-list'))
+        self.assertNotIn('SELECT', logs.output[0])
+
+        with override_settings(METRICS_SLOW_REQUEST_SECONDS=None), self.assertNoLogs('apps.helpers.metrics'):
+            self.client.get(reverse('purchaseorder-list'))
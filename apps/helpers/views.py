@@ -0,0 +1,53 @@
+from rest_framework import viewsets
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from .changes import (CHANGE_FEED_BATCH_SIZE, CHANGE_FEED_MAX_BATCH_SIZE, change_feed, format_position,
+                      parse_position)
+from .metrics import PrometheusRenderer, request_metrics
+from .models import Change
+
+
+class ChangeFeedViewSet(viewsets.GenericViewSet):
+    """
+        Incremental change feed for purchase orders (including their items), products and suppliers.
+
+        Methods:
+            list(request):
+                Changes after ?since=<token> (from the beginning if omitted), at most ?limit= per
+                batch (default 500, max 5000), each with the object's current representation or
+                action "delete". Returns {"changes": [...], "next": <token>, "has_more": bool};
+                pass "next" back as ?since to continue.
+        """
+    queryset = Change.objects.all()
+    pagination_class = None
+
+    def list(self, request, *args, **kwargs):
+        try:
+            since = parse_position(request.query_params.get('since', '0'))
+            limit = int(request.query_params.get('limit', CHANGE_FEED_BATCH_SIZE))
+        except ValueError:
+            return Response({"detail": "since must be a token returned as next and limit an integer."}, status=400)
+        if not 0 < limit <= CHANGE_FEED_MAX_BATCH_SIZE:
+            return Response({"detail": f"limit must be between 1 and {CHANGE_FEED_MAX_BATCH_SIZE}."}, status=400)
+
+        changes, position, has_more = change_feed.read(since, limit, context=self.get_serializer_context())
+        return Response({"changes": changes, "next": format_position(*position), "has_more": has_more})
+
+
+class MetricsView(APIView):
+    """
+        Request metrics of this process in the Prometheus text format, for staff users.
+
+        Methods:
+            get(request):
+                Per-view histograms of latency, query count, database time and render time,
+                responses by status and lookup cache counters. Scrape it with a staff user's
+                token (Authorization: Token <key>).
+        """
+    permission_classes = [IsAdminUser]
+    renderer_classes = [PrometheusRenderer]
+
+    def get(self, request, *args, **kwargs):
+        return Response(request_metrics.expose())
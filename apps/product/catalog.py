@@ -0,0 +1,186 @@
+import csv
+import json
+from itertools import islice
+
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from rest_framework import serializers
+
+from .lookups import product_lookup
+from .models import Product
+from .reorder import refresh_reorder_needed
+from .serializers import ProductImportSerializer
+from ..helpers.changes import record_changes, record_queryset_changes
+from ..helpers.parallel import ordered_map
+from ..purchase.ledger import post_movements
+from ..purchase.models import PurchaseOrder
+from ..purchase.services import touch_purchase_orders
+from ..supplier.lookups import supplier_lookup
+from ..supplier.models import Supplier
+from ..supplier.serializers import SupplierImportSerializer
+
+
+IMPORT_BATCH_SIZE = 5000
+IMPORT_SERIALIZERS = {
+    'products': ProductImportSerializer,
+    'suppliers': SupplierImportSerializer,
+}
+# columns replaced on an existing row; stock only changes through the ledger
+PRODUCT_UPDATE_FIELDS = ['name', 'reorder_threshold', 'preferred_supplier', 'updated_at']
+SUPPLIER_UPDATE_FIELDS = ['name', 'email', 'phone', 'updated_at']
+
+
+def read_records(stream, export_format):
+    """
+    Yield raw records from a text stream: a dict per CSV row (blank cells are
+    left out so model defaults apply) or the undecoded line for NDJSON, which
+    is decoded during validation so that work can run in worker processes.
+    """
+    if export_format == 'csv':
+        for row in csv.DictReader(stream):
+            yield {key: value for key, value in row.items() if key is not None and value not in ('', None)}
+    else:
+        for line in stream:
+            if line.strip():
+                yield line
+
+
+def validate_rows(kind, start, rows):
+    """
+    Validate one batch of raw records numbered from ``start``. Touches no
+    database. Returns ``(valid, errors)``: ``[(record_number, validated_data)]``
+    and ``[(record_number, errors)]``.
+    """
+    # one serializer for the whole batch: building a ModelSerializer's fields costs more than validating a row
+    serializer = IMPORT_SERIALIZERS[kind]()
+    valid, errors = [], []
+    for record_number, row in enumerate(rows, start):
+        if isinstance(row, str):
+            try:
+                row = json.loads(row)
+            except ValueError as exc:
+                errors.append((record_number, {'non_field_errors': [f'JSON parse error - {exc}']}))
+                continue
+        if not isinstance(row, dict):
+            errors.append((record_number, {'non_field_errors': ['Expected an object.']}))
+            continue
+        try:
+            valid.append((record_number, dict(serializer.run_validation(row))))
+        except serializers.ValidationError as exc:
+            errors.append((record_number, exc.detail))
+    return valid, errors
+
+
+def _batches(records, batch_size):
+    start = 1
+    records = iter(records)
+    while batch := list(islice(records, batch_size)):
+        yield start, batch
+        start += len(batch)
+
+
+def upsert_products(rows):
+    """
+    Insert or update ``rows`` (validated product data) on ``sku`` with one
+    ``bulk_create(update_conflicts=True)``. New products get their reorder
+    flag and an opening ledger ADJUSTMENT for their stock; existing products
+    keep their stock and have their flag refreshed against the new threshold.
+    Returns ``(inserted, updated)``.
+    """
+    by_sku = {row['sku']: row for row in rows}
+    products = [Product(**row) for row in by_sku.values()]
+    for product in products:
+        product.reorder_needed = product.stock_quantity < product.reorder_threshold
+
+    with transaction.atomic():
+        existing = dict(Product.objects.filter(sku__in=by_sku).values_list('sku', 'name'))
+        Product.objects.bulk_create(products, update_conflicts=True, unique_fields=['sku'],
+                                    update_fields=PRODUCT_UPDATE_FIELDS)
+        record_queryset_changes(Product.objects.filter(sku__in=by_sku))
+        if existing:
+            refresh_reorder_needed(Product.objects.filter(sku__in=existing))
+        renamed = [sku for sku, name in existing.items() if by_sku[sku]['name'] != name]
+        if renamed:
+            touch_purchase_orders(PurchaseOrder.objects.filter(items__product__sku__in=renamed))
+
+        opening = dict(
+            Product.objects.filter(sku__in=by_sku.keys() - existing).exclude(stock_quantity=0)
+            .values_list('pk', 'stock_quantity')
+        )
+        if opening:
+            post_movements('ADJUSTMENT', opening, apply_stock=False)
+    return len(by_sku) - len(existing), len(existing)
+
+
+def _reset_supplier_sequence():
+    # explicit ids do not advance the primary key sequence on PostgreSQL
+    with connection.cursor() as cursor:
+        for sql in connection.ops.sequence_reset_sql(no_style(), [Supplier]):
+            cursor.execute(sql)
+
+
+def upsert_suppliers(rows):
+    """
+    Insert or update ``rows`` (validated supplier data). Rows with an id are
+    upserted on it with one ``bulk_create(update_conflicts=True)``, after
+    which the id sequence is moved past them; rows without one are then
+    inserted with a plain ``bulk_create``, so an id drawn from the sequence
+    can never overwrite a supplier. Returns ``(inserted, updated)``.
+    """
+    by_id = {row['id']: row for row in rows if 'id' in row}
+    new = [row for row in rows if 'id' not in row]
+
+    with transaction.atomic():
+        existing = dict(Supplier.objects.filter(pk__in=by_id).values_list('pk', 'name'))
+        suppliers = []
+        if by_id:
+            suppliers += Supplier.objects.bulk_create([Supplier(**row) for row in by_id.values()],
+                                                      update_conflicts=True, unique_fields=['id'],
+                                                      update_fields=SUPPLIER_UPDATE_FIELDS)
+            _reset_supplier_sequence()
+        if new:
+            suppliers += Supplier.objects.bulk_create([Supplier(**row) for row in new])
+        # new rows only get their ids back on backends that can return them
+        record_changes(Supplier, [supplier.pk for supplier in suppliers if supplier.pk is not None])
+        renamed = [pk for pk, name in existing.items() if by_id[pk]['name'] != name]
+        if renamed:
+            touch_purchase_orders(PurchaseOrder.objects.filter(supplier__in=renamed))
+    return len(by_id) + len(new) - len(existing), len(existing)
+
+
+def _unknown_suppliers(valid):
+    """Split out product rows whose preferred supplier does not exist, with one lookup per batch."""
+    wanted = {data['preferred_supplier_id'] for _, data in valid if data.get('preferred_supplier_id')}
+    known = set(Supplier.objects.filter(pk__in=wanted).values_list('pk', flat=True))
+    kept, errors = [], []
+    for record_number, data in valid:
+        supplier_id = data.get('preferred_supplier_id')
+        if supplier_id and supplier_id not in known:
+            errors.append((record_number, {'preferred_supplier': [f'Invalid pk "{supplier_id}" - object does not exist.']}))
+        else:
+            kept.append((record_number, data))
+    return kept, errors
+
+
+def import_catalog(kind, records, batch_size=IMPORT_BATCH_SIZE, workers=0):
+    """
+    Upsert ``records`` (from ``read_records``) as ``kind`` ('products' or
+    'suppliers'), ``batch_size`` at a time. Each batch is validated (in a pool
+    of ``workers`` processes if given), checked against the database with a
+    single lookup and written in its own transaction.
+
+    Yields ``{'rows', 'inserted', 'updated', 'errors'}`` per batch, where
+    ``errors`` lists ``(record_number, errors)`` for rejected records.
+    """
+    upsert, lookup = (upsert_products, product_lookup) if kind == 'products' else (upsert_suppliers, supplier_lookup)
+    batches = ((kind, start, rows) for start, rows in _batches(records, batch_size))
+    for valid, errors in ordered_map(validate_rows, batches, workers):
+        size = len(valid) + len(errors)
+        if kind == 'products':
+            valid, unknown = _unknown_suppliers(valid)
+            errors = sorted(errors + unknown, key=lambda error: error[0])
+        inserted, updated = upsert([data for _, data in valid]) if valid else (0, 0)
+        if updated:
+            # bulk_create sends no post_save, so cached names are expired wholesale
+            lookup.invalidate_all()
+        yield {'rows': size, 'inserted': inserted, 'updated': updated, 'errors': errors}
@@ -0,0 +1,6 @@
+from ..helpers.lookups import LookupCache
+from .models import Product
+
+
+# names and SKUs change rarely and are shown on every PO line
+product_lookup = LookupCache(Product, ['name', 'sku'])
@@ -0,0 +1,48 @@
+import json
+import sys
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand
+
+from apps.product.catalog import IMPORT_BATCH_SIZE, import_catalog, read_records
+
+
+class Command(BaseCommand):
+    help = 'Stream a CSV or NDJSON supplier master / product catalogue into the database, upserting in batches.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="CSV or NDJSON file to import, or '-' for stdin.")
+        parser.add_argument('--kind', choices=['products', 'suppliers'], default='products',
+                            help='Products are upserted on sku, suppliers on id.')
+        parser.add_argument('--format', choices=['csv', 'ndjson'],
+                            help='Input format (default: from the file extension, NDJSON for stdin).')
+        parser.add_argument('--batch-size', type=int, default=IMPORT_BATCH_SIZE)
+        parser.add_argument('--workers', type=int, default=0,
+                            help='Decode and validate batches in this many worker processes.')
+
+    def handle(self, *args, **kwargs):
+        path = kwargs['path']
+        export_format = kwargs['format'] or ('csv' if path.lower().endswith('.csv') else 'ndjson')
+        stream = sys.stdin if path == '-' else Path(path).open(newline='', encoding='utf-8')
+
+        totals = {'rows': 0, 'inserted': 0, 'updated': 0, 'rejected': 0}
+        started = time.perf_counter()
+        with stream:
+            records = read_records(stream, export_format)
+            for batch in import_catalog(kwargs['kind'], records, kwargs['batch_size'], kwargs['workers']):
+                for record_number, errors in batch['errors']:
+                    self.stderr.write(f"record {record_number}: {json.dumps(errors)}")
+                totals['rows'] += batch['rows']
+                totals['inserted'] += batch['inserted']
+                totals['updated'] += batch['updated']
+                totals['rejected'] += len(batch['errors'])
+                elapsed = time.perf_counter() - started
+                self.stdout.write(f"{totals['rows']} rows ({totals['rows'] / max(elapsed, 1e-9):,.0f} rows/s)")
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {totals['rows']} {kwargs['kind']} records in {elapsed:.1f}s "
+            f"({totals['rows'] / max(elapsed, 1e-9):,.0f} rows/s): {totals['inserted']} inserted, "
+            f"{totals['updated']} updated, {totals['rejected']} rejected."
+        ))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from apps.product.reorder import refresh_reorder_needed
+
+
+class Command(BaseCommand):
+    help = 'Re-evaluate reorder_needed for every product in one set-based UPDATE.'
+
+    def handle(self, *args, **kwargs):
+        changed = refresh_reorder_needed()
+        self.stdout.write(self.style.SUCCESS(f"Updated reorder flag on {changed} products."))
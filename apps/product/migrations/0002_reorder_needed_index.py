@@ -0,0 +1,29 @@
+# Generated by Django 5.2 on 2026-10-18 14:16
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def refresh_reorder_needed(apps, schema_editor):
+    """Flags left stale by product edits before the flag was maintained on every write."""
+    Product = apps.get_model('product', 'Product')
+    below = models.Q(stock_quantity__lt=models.F('reorder_threshold'))
+    Product.objects.filter(models.Q(reorder_needed=False) & below | models.Q(reorder_needed=True) & ~below).update(
+        reorder_needed=models.Case(models.When(below, then=models.Value(True)), default=models.Value(False))
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('product', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(refresh_reorder_needed, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(condition=models.Q(('reorder_needed', True)), fields=['id'], name='product_reorder_needed_idx'),
+        ),
+    ]
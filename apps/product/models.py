@@ -1,12 +1,30 @@
 from django.db import models
-from ..helpers.models import TimeStamp
+from ..helpers.models import LoadedValuesMixin, TimeStamp
+from ..supplier.models import Supplier
 
 
 # Create your models here.
 
-class Product(TimeStamp):
+class Product(LoadedValuesMixin, TimeStamp):
     name = models.CharField(max_length=255)
     sku = models.CharField(max_length=100, unique=True)
     stock_quantity = models.IntegerField(default=0)
     reorder_threshold = models.IntegerField(default=10)
-    reorder_needed = models.BooleanField(default=False)
\ No newline at end of file
+    reorder_needed = models.BooleanField(default=False)
+    # supplier that automatic reorders are placed with
+    preferred_supplier = models.ForeignKey(Supplier, on_delete=models.SET_NULL, null=True, blank=True,
+                                           related_name='preferred_products')
+
+    class Meta:
+        indexes = [
+            # backs /api/product/reorder/; only the (few) flagged rows are indexed
+            models.Index(fields=['id'], condition=models.Q(reorder_needed=True), name='product_reorder_needed_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        # single-row writes keep the flag in step here; set-based writes use apps.product.reorder
+        self.reorder_needed = self.stock_quantity < self.reorder_threshold
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'stock_quantity', 'reorder_threshold'} & set(update_fields):
+            kwargs['update_fields'] = {*update_fields, 'reorder_needed'}
+        super().save(*args, **kwargs)
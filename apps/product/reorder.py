@@ -0,0 +1,24 @@
+from django.db.models import Case, F, Q, Value, When
+
+from .models import Product
+from ..helpers.changes import record_queryset_changes
+
+
+def below_threshold():
+    """Products whose stock is below their reorder threshold."""
+    return Q(stock_quantity__lt=F('reorder_threshold'))
+
+
+def refresh_reorder_needed(products=None):
+    """
+    Bring ``reorder_needed`` in line with stock and threshold for ``products``
+    (a queryset, default all products) in one UPDATE. Only rows whose flag is
+    wrong are written, and recorded on the change feed with one INSERT ...
+    SELECT over the same rows. Returns the number of rows changed.
+    """
+    products = Product.objects.all() if products is None else products
+    stale = products.filter(Q(reorder_needed=False) & below_threshold() | Q(reorder_needed=True) & ~below_threshold())
+    record_queryset_changes(stale)
+    return stale.update(
+        reorder_needed=Case(When(below_threshold(), then=Value(True)), default=Value(False))
+    )
@@ -4,5 +4,19 @@ from .models import Product
 class ProductSerializer(serializers.ModelSerializer):
     class Meta:
         model = Product
-        fields = ['id', 'name', 'sku', 'stock_quantity', 'reorder_threshold', 'reorder_needed']
-        read_only_fields = ['reorder_needed']
\ No newline at end of file
+        fields = ['id', 'name', 'sku', 'stock_quantity', 'reorder_threshold', 'reorder_needed', 'preferred_supplier']
+        read_only_fields = ['reorder_needed']
+
+class ProductImportSerializer(serializers.ModelSerializer):
+    """
+    Row validation for ``import_catalog``. Needs no database access, so it can
+    run in worker processes; SKU uniqueness is the upsert key and supplier ids
+    are checked per batch by the importer.
+    """
+    preferred_supplier = serializers.IntegerField(source='preferred_supplier_id', min_value=1,
+                                                  allow_null=True, required=False)
+
+    class Meta:
+        model = Product
+        fields = ['name', 'sku', 'stock_quantity', 'reorder_threshold', 'preferred_supplier']
+        extra_kwargs = {'sku': {'validators': []}}
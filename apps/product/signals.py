@@ -0,0 +1,23 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from ..helpers.changes import change_feed, record_change
+from ..helpers.models import Change
+from .lookups import product_lookup
+from .models import Product
+from .serializers import ProductSerializer
+
+
+change_feed.register(Product, ProductSerializer)
+
+
+@receiver(post_save, sender=Product)
+def product_saved(sender, instance, **kwargs):
+    product_lookup.invalidate(instance.pk)
+    record_change(instance)
+
+
+@receiver(post_delete, sender=Product)
+def product_deleted(sender, instance, **kwargs):
+    product_lookup.invalidate(instance.pk)
+    record_change(instance, Change.DELETE)
@@ -1,3 +1,178 @@
-from django.test import TestCase
+import json
+import os
+import tempfile
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.core.management import call_command
+from django.test import TestCase, Client
+from django.urls import reverse
+from django.contrib.auth.models import User, Permission
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from apps.helpers.testing import QueryBudgetMixin
+from apps.product import catalog
+from apps.product.catalog import upsert_suppliers
+from apps.product.models import Product
+from apps.product.reorder import refresh_reorder_needed
+from apps.product.views import ProductViewSet
+from apps.purchase.ledger import post_movements
+from apps.purchase.models import InventoryTransaction
+from apps.supplier.models import Supplier
+
+
+class ProductTests(QueryBudgetMixin, TestCase):
+
+    def setUp(self):
+        self.client = Client()
+        self.user = User.objects.create_user(username='employee', password='testpass')
+        self.client.defaults['HTTP_AUTHORIZATION'] = f'Bearer {RefreshToken.for_user(self.user).access_token}'
+
+    def test_list_query_budget(self):
+        def populate(count):
+            start = Product.objects.count()
+            Product.objects.bulk_create([
+                Product(name=f"Product {i}", sku=f"SKU-{i}") for i in range(start, start + count)
+            ])
+
+        self.assertQueryBudget(reverse('product-list'), populate)
+
+    def test_cursor_pagination_walks_all_rows_without_counting(self):
+        Product.objects.bulk_create([Product(name=f"Product {i}", sku=f"SKU-{i}") for i in range(45)])
+
+        url, seen, queries = reverse('product-list') + '?pagination=cursor', [], []
+        while url:
+            count, response = self.count_queries(url)
+            body = response.json()
+            self.assertNotIn('count', body)
+            seen += [row['id'] for row in body['results']]
+            queries.append(count)
+            url = body['next']
+
+        self.assertEqual(seen, sorted(Product.objects.values_list('id', flat=True)))
+        # the last page costs the same as the first
+        self.assertEqual(len(set(queries)), 1)
+
+    def test_page_number_pagination_stays_default(self):
+        Product.objects.bulk_create([Product(name=f"Product {i}", sku=f"SKU-{i}") for i in range(25)])
+        body = self.client.get(reverse('product-list') + '?page=2').json()
+        self.assertEqual(body['count'], 25)
+        self.assertEqual(len(body['results']), 5)
+
+        body = self.client.get(reverse('product-list') + '?count=approximate').json()
+        self.assertEqual(body['count'], 25)
+
+    def test_stock_edits_are_recorded_in_the_ledger(self):
+        self.user.user_permissions.add(*Permission.objects.filter(codename__in=['add_product', 'change_product']))
+        response = self.client.post(reverse('product-list'), content_type='application/json',
+                                    data={"name": "Widget", "sku": "W-1", "stock_quantity": 12})
+        self.assertEqual(response.status_code, 201)
+        product_id = response.json()['id']
+
+        response = self.client.patch(reverse('product-detail', args=[product_id]), content_type='application/json',
+                                     data={"stock_quantity": 9})
+        self.assertEqual(response.status_code, 200)
+
+        ledger = list(InventoryTransaction.objects.filter(product_id=product_id).order_by('id')
+                      .values_list('transaction_type', 'quantity'))
+        self.assertEqual(ledger, [('ADJUSTMENT', 12), ('ADJUSTMENT', -3)])
+        self.assertEqual(Product.objects.get(pk=product_id).stock_quantity, 9)
+
+    def test_edit_racing_a_receipt_keeps_the_received_stock(self):
+        self.user.user_permissions.add(Permission.objects.get(codename='change_product'))
+        product = Product.objects.create(name="Widget", sku="W-1", stock_quantity=10)
+        get_object = ProductViewSet.get_object
+
+        def load_then_receive(viewset):
+            # the request has loaded the product when a receipt lands
+            instance = get_object(viewset)
+            post_movements('RECEIVED_PO', {product.pk: 5})
+            return instance
+
+        with mock.patch.object(ProductViewSet, 'get_object', load_then_receive):
+            response = self.client.patch(reverse('product-detail', args=[product.pk]),
+                                         content_type='application/json', data={"name": "Gadget"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['stock_quantity'], 15)
+        product.refresh_from_db()
+        self.assertEqual((product.name, product.stock_quantity), ("Gadget", 15))
+        self.assertFalse(InventoryTransaction.objects.filter(product=product, transaction_type='ADJUSTMENT').exists())
+
+    def test_reorder_flag_follows_every_write_path(self):
+        self.user.user_permissions.add(*Permission.objects.filter(codename__in=['add_product', 'change_product']))
+        response = self.client.post(reverse('product-list'), content_type='application/json',
+                                    data={"name": "Widget", "sku": "W-1", "stock_quantity": 8, "reorder_threshold": 5})
+        product_id = response.json()['id']
+        self.assertFalse(response.json()['reorder_needed'])
+
+        response = self.client.patch(reverse('product-detail', args=[product_id]), content_type='application/json',
+                                     data={"reorder_threshold": 10})
+        self.assertTrue(response.json()['reorder_needed'])
+        self.assertTrue(Product.objects.get(pk=product_id).reorder_needed)
+
+        post_movements('ADJUSTMENT', {product_id: 5})
+        self.assertFalse(Product.objects.get(pk=product_id).reorder_needed)
+
+    def test_reorder_endpoint_lists_flagged_products(self):
+        Product.objects.bulk_create([
+            Product(name="Low", sku="LOW", stock_quantity=1, reorder_threshold=5),
+            Product(name="Ok", sku="OK", stock_quantity=50, reorder_threshold=5),
+        ])
+        # bulk_create skips save(), so the flags are fixed set-based
+        # (one UPDATE, and the INSERT ... SELECT of their change feed rows)
+        with self.assertNumQueries(2):
+            self.assertEqual(refresh_reorder_needed(), 1)
+        self.assertEqual(refresh_reorder_needed(), 0)
+
+        body = self.client.get(reverse('product-reorder')).json()
+        self.assertEqual([row['sku'] for row in body['results']], ["LOW"])
+
+    def _import(self, content, suffix, *args):
+        with tempfile.NamedTemporaryFile('w', suffix=suffix, delete=False) as handle:
+            handle.write(content)
+        self.addCleanup(os.unlink, handle.name)
+        out, err = StringIO(), StringIO()
+        call_command('import_catalog', handle.name, *args, stdout=out, stderr=err)
+        return out.getvalue(), err.getvalue()
+
+    def test_import_catalog_upserts_on_sku(self):
+        supplier = Supplier.objects.create(name="Acme", email="acme@example.com", phone="1")
+        Product.objects.create(name="Old name", sku="W-1", stock_quantity=3, reorder_threshold=1)
+
+        out, err = self._import(
+            "name,sku,stock_quantity,reorder_threshold,preferred_supplier\n"
+            f"Widget,W-1,500,5,{supplier.id}\n"
+            "Gadget,G-1,2,5,\n"
+            "Broken,B-1,many,5,\n"
+            "Orphan,O-1,1,5,999\n",
+            '.csv', '--batch-size', '2',
+        )
+        self.assertIn("1 inserted, 1 updated, 2 rejected", out)
+        self.assertIn('record 3: {"stock_quantity"', err)
+        self.assertIn('record 4: {"preferred_supplier"', err)
+
+        widget, gadget = Product.objects.get(sku="W-1"), Product.objects.get(sku="G-1")
+        # stock of an existing product only moves through the ledger
+        self.assertEqual((widget.name, widget.stock_quantity, widget.preferred_supplier_id), ("Widget", 3, supplier.id))
+        self.assertTrue(widget.reorder_needed)
+        self.assertTrue(gadget.reorder_needed)
+        self.assertEqual(list(InventoryTransaction.objects.values_list('product__sku', 'quantity')), [("G-1", 2)])
+
+    def test_supplier_rows_without_ids_never_overwrite_explicit_ones(self):
+        rows = [{"name": "First"}, {"id": 1, "name": "Explicit"}, {"name": "Second"}]
+        with mock.patch('apps.product.catalog._reset_supplier_sequence', wraps=catalog._reset_supplier_sequence) as reset:
+            self.assertEqual(upsert_suppliers(rows), (3, 0))
+        reset.assert_called_once()
+        self.assertEqual(sorted(Supplier.objects.values_list('name', flat=True)), ["Explicit", "First", "Second"])
+        self.assertEqual(Supplier.objects.get(pk=1).name, "Explicit")
+
+    def test_import_catalog_with_worker_processes(self):
+        lines = [json.dumps({"id": 7, "name": "Acme", "email": "acme@example.com", "phone": "1"}), "{oops"]
+        out, err = self._import("\n".join(lines) + "\n", '.ndjson', '--kind', 'suppliers', '--workers', '2')
+        self.assertIn("1 inserted, 0 updated, 1 rejected", out)
+        self.assertIn("record 2", err)
+
+        lines = [json.dumps({"name": f"P{i}", "sku": f"P-{i}", "preferred_supplier": 7}) for i in range(25)]
+        out, _ = self._import("\n".join(lines), '.ndjson', '--workers', '2', '--batch-size', '4')
+        self.assertIn("25 inserted", out)
+        self.assertEqual(Supplier.objects.get(pk=7).preferred_products.count(), 25)
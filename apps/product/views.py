@@ -1,17 +1,40 @@
+from django.db import transaction
 from django.shortcuts import render
 from rest_framework import viewsets
+from rest_framework.decorators import action
+from ..helpers.conditional import ConditionalGetMixin
+from ..helpers.fastpath import FastListMixin
 from .models import Product
 from .serializers import ProductSerializer
+from ..purchase.ledger import post_movements
 
 
 # Create your views here.
 
-class ProductViewSet(viewsets.ModelViewSet):
+class ProductViewSet(ConditionalGetMixin, FastListMixin, viewsets.ModelViewSet):
     queryset = Product.objects.all().order_by('id')
     serializer_class = ProductSerializer
 
+    @action(detail=False, methods=['get'])
+    def reorder(self, request):
+        """Products below their reorder threshold, read through the partial index on the flag."""
+        queryset = self.filter_queryset(self.get_queryset().filter(reorder_needed=True))
+        page = self.paginate_queryset(queryset)
+        return self.get_paginated_response(self.get_serializer(page, many=True).data)
+
     def perform_create(self, serializer):
-        serializer.save(created_by=self.request.user)
+        with transaction.atomic():
+            product = serializer.save(created_by=self.request.user)
+            # opening balance, so the ledger always adds up to stock_quantity
+            if product.stock_quantity:
+                post_movements('ADJUSTMENT', {product.pk: product.stock_quantity}, apply_stock=False)
 
     def perform_update(self, serializer):
-        serializer.save(updated_by=self.request.user)
+        with transaction.atomic():
+            # save the row as it is under the lock, not as it was loaded: a receipt may have moved stock since
+            serializer.instance = Product.objects.select_for_update().get(pk=serializer.instance.pk)
+            previous = serializer.instance.stock_quantity
+            product = serializer.save(updated_by=self.request.user)
+            # a directly edited stock level is recorded as an adjustment
+            if 'stock_quantity' in serializer.validated_data and product.stock_quantity != previous:
+                post_movements('ADJUSTMENT', {product.pk: product.stock_quantity - previous}, apply_stock=False)
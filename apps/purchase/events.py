@@ -0,0 +1,21 @@
+from django.db import transaction
+
+from ..helpers.events import EventStream, event_hub
+
+
+PURCHASE_ORDER_CHANNEL = 'purchase-orders'
+
+
+def publish_status_change(po, previous):
+    """
+    Push ``po``'s move from status ``previous`` to the connected dashboards,
+    as a ``status`` event with ``{"id", "status", "previous"}``, once the
+    current transaction commits.
+    """
+    if po.status == previous:
+        return
+    data = {'id': po.pk, 'status': po.status, 'previous': previous}
+    transaction.on_commit(lambda: event_hub.publish(PURCHASE_ORDER_CHANNEL, 'status', data))
+
+
+purchase_order_events = EventStream(PURCHASE_ORDER_CHANNEL)
@@ -0,0 +1,189 @@
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.db import transaction
+from django.db.models import (Case, DateTimeField, Exists, F, IntegerField, Max, OuterRef, Subquery, Sum, Value,
+                              When)
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from rest_framework import serializers
+
+from .models import InventoryTransaction, StockSnapshot
+from ..helpers.changes import record_changes, record_queryset_changes
+from ..product.models import Product
+from ..product.reorder import refresh_reorder_needed
+
+
+# receipts only add stock and returns only remove it; adjustments may go either way
+MOVEMENT_SIGNS = {
+    'RECEIVED_PO': 1,
+    'RETURN': -1,
+}
+SNAPSHOT_BATCH_SIZE = 5000
+# ledger rows are dated when written, not when committed: snapshots stay this far behind the clock so
+# no transaction still open can add rows dated before them
+SNAPSHOT_SETTLE_SECONDS = 15 * 60
+# lower bound for "ledger rows after the latest snapshot" when a product has none yet
+LEDGER_EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+
+def per_row_increment(field, amounts):
+    """
+    Build ``field + CASE id WHEN .. THEN .. END`` so a single UPDATE applies
+    a different increment to every row in ``amounts`` ({pk: quantity}).
+    """
+    return F(field) + Case(
+        *[When(pk=pk, then=Value(qty)) for pk, qty in amounts.items()],
+        default=Value(0),
+        output_field=IntegerField(),
+    )
+
+
+def validate_movement(transaction_type, quantity):
+    sign = MOVEMENT_SIGNS.get(transaction_type)
+    if quantity == 0 or (sign is not None and quantity * sign < 0):
+        raise serializers.ValidationError(f"Invalid quantity {quantity} for a {transaction_type} movement.")
+
+
+def post_movements(transaction_type, quantities, po=None, apply_stock=True):
+    """
+    Append one ledger row per product in ``quantities`` ({product_id: signed quantity})
+    and, unless ``apply_stock`` is False (the counter was already set, e.g. by a
+    direct product edit), move ``Product.stock_quantity`` by the same amounts.
+
+    Runs a fixed number of queries however many products are involved:
+    one ``bulk_create`` for the ledger and set-based updates for the counters.
+    """
+    for quantity in quantities.values():
+        validate_movement(transaction_type, quantity)
+
+    with transaction.atomic():
+        if apply_stock:
+            products = Product.objects.filter(pk__in=quantities.keys())
+            products.update(stock_quantity=per_row_increment('stock_quantity', quantities))
+            refresh_reorder_needed(products)
+            record_changes(Product, quantities.keys())
+        return InventoryTransaction.objects.bulk_create([
+            InventoryTransaction(product_id=product_id, quantity=quantity, transaction_type=transaction_type, po=po)
+            for product_id, quantity in quantities.items()
+        ])
+
+
+def _latest_snapshot(as_of, product):
+    return StockSnapshot.objects.filter(product=product, taken_at__lte=as_of).order_by('-taken_at')
+
+
+def _ledger_total(**filters):
+    """Correlated ``SUM(quantity)`` of the ledger rows matching ``filters``, 0 if there are none."""
+    total = (
+        InventoryTransaction.objects.filter(**filters)
+        .order_by().values('product').annotate(total=Sum('quantity')).values('total')
+    )
+    return Coalesce(Subquery(total), 0)
+
+
+def stock_as_of(as_of, product_ids=None):
+    """
+    ``{product_id: stock}`` at ``as_of`` for ``product_ids`` (all products if None).
+
+    Each balance is the product's latest snapshot at or before ``as_of`` plus
+    the ledger rows between that snapshot and ``as_of``, so only the tail of
+    the ledger is read. Answered in one query.
+    """
+    snapshots = _latest_snapshot(as_of, OuterRef('pk'))
+    products = Product.objects.all() if product_ids is None else Product.objects.filter(pk__in=product_ids)
+    products = products.annotate(
+        snapshot_at=Subquery(snapshots.values('taken_at')[:1]),
+        snapshot_quantity=Coalesce(Subquery(snapshots.values('quantity')[:1]), 0),
+    ).annotate(
+        stock=F('snapshot_quantity') + _ledger_total(
+            product=OuterRef('pk'),
+            date__lte=as_of,
+            date__gt=Coalesce(OuterRef('snapshot_at'), Value(LEDGER_EPOCH), output_field=DateTimeField()),
+        )
+    )
+    return dict(products.values_list('pk', 'stock'))
+
+
+def take_snapshots(as_of=None):
+    """
+    Write a ``StockSnapshot`` at ``as_of`` for every product with ledger rows
+    since the previous snapshot run. The new balance is the product's
+    previous snapshot plus the movements in between, computed in one grouped
+    query and inserted in batches. Returns the number of snapshots written.
+
+    ``as_of`` defaults to, and is capped at, ``SNAPSHOT_SETTLE_SECONDS`` ago.
+    Re-running it for the same ``as_of`` writes nothing new.
+    """
+    settled = timezone.now() - timedelta(seconds=SNAPSHOT_SETTLE_SECONDS)
+    as_of = settled if as_of is None else min(as_of, settled)
+    last_run = StockSnapshot.objects.filter(taken_at__lt=as_of).aggregate(last=Max('taken_at'))['last']
+
+    moved = InventoryTransaction.objects.filter(date__lte=as_of).exclude(
+        Exists(StockSnapshot.objects.filter(product=OuterRef('product_id'), taken_at=as_of))
+    )
+    if last_run is not None:
+        moved = moved.filter(date__gt=last_run)
+    moved = moved.order_by().values('product_id').annotate(
+        delta=Sum('quantity'),
+        previous=Coalesce(Subquery(_latest_snapshot(as_of, OuterRef('product_id')).values('quantity')[:1]), 0),
+    )
+
+    written = 0
+    batch = []
+    with transaction.atomic():
+        for row in moved.iterator(chunk_size=SNAPSHOT_BATCH_SIZE):
+            batch.append(StockSnapshot(product_id=row['product_id'], taken_at=as_of,
+                                       quantity=row['previous'] + row['delta']))
+            if len(batch) == SNAPSHOT_BATCH_SIZE:
+                # a concurrent run for the same as_of writes the same balances
+                written += len(StockSnapshot.objects.bulk_create(batch, ignore_conflicts=True))
+                batch = []
+        written += len(StockSnapshot.objects.bulk_create(batch, ignore_conflicts=True))
+    return written
+
+
+def stock_drift(products=None):
+    """
+    Those of ``products`` (a queryset, default all products) whose
+    ``stock_quantity`` differs from the sum of their ledger rows.
+    """
+    products = Product.objects.all() if products is None else products
+    return products.annotate(
+        ledger_quantity=_ledger_total(product=OuterRef('pk'))
+    ).exclude(stock_quantity=F('ledger_quantity'))
+
+
+def reconcile_stock(products=None):
+    """
+    Rebuild ``Product.stock_quantity`` of ``products`` (a queryset, default
+    all products) from the ledger with one set-based UPDATE (a grouped ledger
+    sum per product) of the counters that drifted, recorded on the change
+    feed with one INSERT ... SELECT, then refresh their reorder flags.
+    Returns the number of products updated.
+    """
+    with transaction.atomic():
+        drifted = stock_drift(products)
+        record_queryset_changes(drifted)
+        updated = drifted.update(stock_quantity=_ledger_total(product=OuterRef('pk')))
+        refresh_reorder_needed(products)
+    return updated
+
+
+def adopt_stock_drift():
+    """
+    The opposite of ``reconcile_stock``: record an ADJUSTMENT for every product
+    whose counter differs from its ledger, so the ledger matches the counters.
+    Useful once, to open the ledger on data that predates it.
+    """
+    written = 0
+    batch = []
+    with transaction.atomic():
+        drift = stock_drift().values_list('pk', 'stock_quantity', 'ledger_quantity')
+        for product_id, stock_quantity, ledger_quantity in drift.iterator(chunk_size=SNAPSHOT_BATCH_SIZE):
+            batch.append(InventoryTransaction(product_id=product_id, quantity=stock_quantity - ledger_quantity,
+                                              transaction_type='ADJUSTMENT'))
+            if len(batch) == SNAPSHOT_BATCH_SIZE:
+                written += len(InventoryTransaction.objects.bulk_create(batch))
+                batch = []
+        written += len(InventoryTransaction.objects.bulk_create(batch))
+    return written
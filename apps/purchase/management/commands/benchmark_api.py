@@ -0,0 +1,241 @@
+import json
+import math
+import random
+import statistics
+import time
+import tracemalloc
+from io import StringIO
+
+from django.conf import settings
+from django.contrib.auth.models import Group, User
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework_simplejwt.tokens import AccessToken
+
+from apps.helpers.permissions import get_user_authz
+from apps.product.models import Product
+from apps.purchase.models import PurchaseOrder
+from apps.supplier.models import Supplier
+
+
+OPERATIONS = ('create', 'list', 'filter_status', 'approve', 'receive', 'dashboard')
+# requests per operation run under tracemalloc for the peak memory figure; they double as warm-up
+MEMORY_SAMPLES = 3
+LINES_PER_PO = 3
+
+
+def calibrate(rounds=7):
+    """
+    Median milliseconds of a fixed pure-Python workload. Latencies are
+    compared after scaling by the ratio of the two runs' figures, so a
+    slower (or busier) machine does not read as a regression.
+    """
+    samples = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        json.loads(json.dumps([{'id': i, 'name': f'row {i}', 'values': list(range(i % 10))} for i in range(5000)]))
+        samples.append(time.perf_counter() - started)
+    return round(statistics.median(samples) * 1000, 3)
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list."""
+    return sorted_values[max(math.ceil(fraction * len(sorted_values)) - 1, 0)]
+
+
+class Command(BaseCommand):
+    help = (
+        'End-to-end API benchmark: seed increasing numbers of suppliers, products and purchase orders, drive '
+        'create, list, filter by status, approve, receive and the dashboard through the full middleware stack, '
+        'and report p50/p95/p99 latency, queries per request and peak memory. Runs in a throwaway test '
+        'database of the configured engine (SQLite, or Postgres through DATABASE_URL). --save-baseline stores '
+        'the results; --baseline fails when they regress past --threshold.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='1000,10000', help='Comma-separated purchase order counts, ascending.')
+        parser.add_argument('--requests', type=int, default=50, help='Timed requests per operation and size.')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--baseline', help='Compare with the results stored in this JSON file.')
+        parser.add_argument('--save-baseline', help='Write the results to this JSON file.')
+        parser.add_argument('--threshold', type=float, default=0.2,
+                            help='Allowed relative regression of p95 latency and peak memory (0.2 = 20%%).')
+        parser.add_argument('--latency-floor-ms', type=float, default=1.0,
+                            help='Ignore p95 regressions smaller than this, which are timer noise.')
+        parser.add_argument('--in-place', action='store_true',
+                            help='Use the configured database instead of a test database (it must be disposable).')
+
+    def handle(self, *args, **options):
+        sizes = sorted(int(size) for size in options['sizes'].split(','))
+        if options['requests'] < 1:
+            raise CommandError('--requests must be at least 1.')
+        self.rng = random.Random(options['seed'])
+        self.requests = options['requests']
+
+        # a private cache, so neither shared caches nor stale lookups of another database are involved,
+        # and no slow-request log lines in between the results
+        caches = {alias: {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': f'benchmark-{alias}'}
+                  for alias in settings.CACHES}
+        overrides = override_settings(CACHES=caches, ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver'],
+                                      METRICS_SLOW_REQUEST_SECONDS=None)
+        calibration_ms = calibrate()
+        old_name = None if options['in_place'] else connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            with overrides:
+                results = self.run(sizes, options['seed'])
+        finally:
+            if old_name is not None:
+                connection.creation.destroy_test_db(old_name, verbosity=0)
+        calibration_ms = min(calibration_ms, calibrate())
+
+        if options['save_baseline']:
+            with open(options['save_baseline'], 'w') as handle:
+                json.dump({'vendor': connection.vendor, 'calibration_ms': calibration_ms, 'results': results}, handle, indent=2, sort_keys=True)
+            self.stdout.write(f"Baseline written to {options['save_baseline']}.")
+        if options['baseline']:
+            self.compare(results, calibration_ms, options['baseline'], options['threshold'], options['latency_floor_ms'])
+
+    def run(self, sizes, seed):
+        self.client = self.make_client()
+        results = {}
+        seeded = 0
+        for step, size in enumerate(sizes):
+            if size > seeded:
+                self.stdout.write(f'Seeding {size - seeded} purchase orders...')
+                call_command('seed_data', suppliers=max((size - seeded) // 50, 5),
+                             products=max((size - seeded) // 5, 20), pos=size - seeded, lines=LINES_PER_PO,
+                             seed=seed + step, stdout=StringIO())
+                seeded = size
+            self.supplier_ids = list(Supplier.objects.values_list('id', flat=True))
+            self.product_ids = list(Product.objects.values_list('id', flat=True))
+            page_size = settings.REST_FRAMEWORK['PAGE_SIZE']
+            self.page_count = max(PurchaseOrder.objects.count() // page_size, 1)
+            self.approved_page_count = max(PurchaseOrder.objects.filter(status='approved').count() // page_size, 1)
+            self.created = []
+
+            results[str(size)] = {name: self.measure(getattr(self, f'request_{name}')) for name in OPERATIONS}
+            self.report(size, results[str(size)])
+        return results
+
+    def make_client(self):
+        user, _ = User.objects.get_or_create(username='benchmark')
+        user.is_superuser = user.is_staff = True
+        user.save()
+        user.groups.add(Group.objects.get_or_create(name='Manager')[0])
+        get_user_authz(user)
+        return Client(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(user)}')
+
+    def measure(self, send):
+        """Latency, query and memory figures of ``send(index)`` over ``MEMORY_SAMPLES`` + ``--requests`` calls."""
+        peak = 0
+        for index in range(MEMORY_SAMPLES):
+            tracemalloc.start()
+            try:
+                self.complete(send(index))
+                peak = max(peak, tracemalloc.get_traced_memory()[1])
+            finally:
+                tracemalloc.stop()
+
+        latencies, queries = [], []
+        for index in range(MEMORY_SAMPLES, MEMORY_SAMPLES + self.requests):
+            with CaptureQueriesContext(connection) as ctx:
+                started = time.perf_counter()
+                self.complete(send(index))
+                latencies.append(time.perf_counter() - started)
+            queries.append(len(ctx.captured_queries))
+
+        latencies.sort()
+        return {
+            'p50_ms': round(percentile(latencies, 0.5) * 1000, 3),
+            'p95_ms': round(percentile(latencies, 0.95) * 1000, 3),
+            'p99_ms': round(percentile(latencies, 0.99) * 1000, 3),
+            'queries': statistics.median_low(queries),
+            'peak_kib': round(peak / 1024),
+        }
+
+    @staticmethod
+    def complete(response):
+        if response.status_code >= 400:
+            raise CommandError(f'{response.request["PATH_INFO"]} answered {response.status_code}: '
+                               f'{response.content[:300]!r}')
+        if response.streaming:
+            # streamed pages do their work while being read
+            b''.join(response.streaming_content)
+
+    def request_create(self, index):
+        products = self.rng.sample(self.product_ids, LINES_PER_PO)
+        response = self.client.post(reverse('purchaseorder-list'), {
+            'supplier': self.rng.choice(self.supplier_ids),
+            'items': [{'product': product, 'ordered_quantity': self.rng.randint(1, 50)} for product in products],
+        }, content_type='application/json')
+        if response.status_code == 201:
+            self.created.append(response.json())
+        return response
+
+    def request_list(self, index):
+        return self.client.get(reverse('purchaseorder-list'), {'page': self.rng.randint(1, self.page_count)})
+
+    def request_filter_status(self, index):
+        page = self.rng.randint(1, min(self.approved_page_count, 5))
+        # the first pages of a status, as a client would start browsing it
+        return self.client.get(reverse('purchaseorder-list'), {'status': 'approved', 'page': page})
+
+    def request_approve(self, index):
+        return self.client.post(reverse('purchaseorder-approve', args=[self.created[index]['id']]))
+
+    def request_receive(self, index):
+        po = self.created[index]
+        return self.client.post(reverse('purchaseorder-receive', args=[po['id']]), {
+            'items': [{'product': item['product'], 'received_quantity': item['ordered_quantity']}
+                      for item in po['items']],
+        }, content_type='application/json')
+
+    def request_dashboard(self, index):
+        return self.client.get(reverse('dashboard'))
+
+    def report(self, size, results):
+        self.stdout.write(self.style.SUCCESS(f'{size} purchase orders ({connection.vendor}):'))
+        self.stdout.write(f"{'operation':<14} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'queries':>8} {'peak KiB':>9}")
+        for name, row in results.items():
+            self.stdout.write(f"{name:<14} {row['p50_ms']:>9.2f} {row['p95_ms']:>9.2f} {row['p99_ms']:>9.2f} "
+                              f"{row['queries']:>8} {row['peak_kib']:>9}")
+
+    def compare(self, results, calibration_ms, path, threshold, latency_floor_ms):
+        """
+        Fail on p95 latency (scaled to this machine's speed) or peak memory
+        above the baseline by more than ``threshold``, or on any extra query.
+        """
+        try:
+            with open(path) as handle:
+                baseline = json.load(handle)
+        except (OSError, ValueError) as exc:
+            raise CommandError(f'Cannot read baseline {path}: {exc}')
+        if baseline.get('vendor') != connection.vendor:
+            self.stderr.write(f"Baseline {path} was recorded on {baseline.get('vendor')}, not {connection.vendor}.")
+        speed = calibration_ms / baseline.get('calibration_ms', calibration_ms)
+        self.stdout.write(f'This run is {speed:.2f}x the baseline\'s calibration time; baseline latencies are scaled by it.')
+
+        regressions = []
+        for size, operations in results.items():
+            for name, row in operations.items():
+                base = baseline['results'].get(size, {}).get(name)
+                if base is None:
+                    continue
+                label = f'{size} POs, {name}'
+                if row['queries'] > base['queries']:
+                    regressions.append(f"{label}: {row['queries']} queries per request (baseline {base['queries']})")
+                expected_ms = base['p95_ms'] * speed
+                if row['p95_ms'] > expected_ms * (1 + threshold) and row['p95_ms'] - expected_ms > latency_floor_ms:
+                    regressions.append(f"{label}: p95 {row['p95_ms']:.2f} ms (baseline {expected_ms:.2f} ms scaled)")
+                if row['peak_kib'] > base['peak_kib'] * (1 + threshold):
+                    regressions.append(f"{label}: peak {row['peak_kib']} KiB (baseline {base['peak_kib']} KiB)")
+
+        if regressions:
+            for regression in regressions:
+                self.stderr.write(regression)
+            raise CommandError(f'{len(regressions)} regression(s) against {path}.')
+        self.stdout.write(self.style.SUCCESS(f'No regressions against {path} (threshold {threshold:.0%}).'))
@@ -0,0 +1,118 @@
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from apps.product.models import Product
+from apps.purchase.models import PurchaseOrder, PurchaseOrderItem, InventoryTransaction
+from apps.supplier.models import Supplier
+
+
+class Command(BaseCommand):
+    help = (
+        'Time the purchase order hot-path queries (status filter, open POs, receive line lookup, '
+        'product ledger) and, with --compare, the same queries without the hot-path indexes. '
+        'Only run this against a disposable benchmark database.'
+    )
+
+    CHUNK_SIZE = 10000
+
+    def add_arguments(self, parser):
+        parser.add_argument('--pos', type=int, default=1000000, help='Seed purchase orders up to this many.')
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--compare', action='store_true',
+                            help='Drop the indexes, re-time every query, then restore them.')
+
+    def handle(self, *args, **options):
+        self.seed(options['pos'])
+        self.rng = random.Random(0)
+
+        with_indexes = self.run_queries(options['repeat'])
+        self.report('with indexes', with_indexes)
+
+        if options['compare']:
+            self.alter_indexes('remove')
+            try:
+                without_indexes = self.run_queries(options['repeat'])
+            finally:
+                self.alter_indexes('add')
+            self.report('without indexes', without_indexes)
+            for name, seconds in with_indexes.items():
+                self.stdout.write(f'{name:<24} {without_indexes[name] / seconds:8.1f}x faster with indexes')
+
+    def alter_indexes(self, operation):
+        with connection.schema_editor() as editor:
+            for model in (PurchaseOrder, PurchaseOrderItem, InventoryTransaction):
+                for index in model._meta.indexes:
+                    getattr(editor, f'{operation}_index')(model, index)
+                for constraint in model._meta.constraints:
+                    getattr(editor, f'{operation}_constraint')(model, constraint)
+
+    def seed(self, target):
+        existing = PurchaseOrder.objects.count()
+        if existing >= target:
+            return
+        self.stdout.write(f'Seeding {target - existing} purchase orders...')
+        rng = random.Random(existing)
+        supplier = Supplier.objects.first() or Supplier.objects.create(name='Benchmark Supplier')
+        products = list(Product.objects.values_list('id', flat=True)[:1000])
+        if len(products) < 2:
+            products = [p.id for p in Product.objects.bulk_create([
+                Product(name=f'Benchmark {i}', sku=f'BENCH-{i}') for i in range(1000)
+            ])]
+        statuses = ['pending', 'approved', 'partially_delivered'] + ['completed'] * 7
+
+        for start in range(existing, target, self.CHUNK_SIZE):
+            size = min(self.CHUNK_SIZE, target - start)
+            with transaction.atomic():
+                pos = PurchaseOrder.objects.bulk_create([
+                    PurchaseOrder(supplier=supplier, status=rng.choice(statuses)) for _ in range(size)
+                ])
+                lines = [(po, rng.sample(products, 2)) for po in pos]
+                PurchaseOrderItem.objects.bulk_create([
+                    PurchaseOrderItem(po=po, product_id=product_id, ordered_quantity=10,
+                                      received_quantity=10 if po.status == 'completed' else 0)
+                    for po, product_ids in lines for product_id in product_ids
+                ])
+                InventoryTransaction.objects.bulk_create([
+                    InventoryTransaction(po=po, product_id=product_id, quantity=10, transaction_type='RECEIVED_PO')
+                    for po, product_ids in lines if po.status == 'completed' for product_id in product_ids
+                ])
+
+    def run_queries(self, repeat):
+        max_po = PurchaseOrder.objects.order_by('-id').values_list('id', flat=True).first()
+        items = list(PurchaseOrderItem.objects.values_list('po_id', 'product_id')[:repeat])
+        products = list(Product.objects.values_list('id', flat=True)[:repeat])
+
+        queries = {
+            'filter status page': lambda: list(
+                PurchaseOrder.objects.filter(status='approved', id__gt=self.rng.randint(1, max_po)).order_by('id')[:20]
+            ),
+            'filter status count': lambda: PurchaseOrder.objects.filter(status='approved').count(),
+            'open POs page': lambda: list(
+                PurchaseOrder.objects.exclude(status='completed').filter(id__gt=self.rng.randint(1, max_po))
+                .order_by('id')[:20]
+            ),
+            'receive line lookup': lambda: list(
+                PurchaseOrderItem.objects.filter(**dict(zip(('po_id', 'product_id'), self.rng.choice(items))))
+            ),
+            'product ledger': lambda: list(
+                InventoryTransaction.objects.filter(product_id=self.rng.choice(products)).order_by('-date')[:50]
+            ),
+        }
+        return {name: self.time(query, repeat) for name, query in queries.items()}
+
+    def time(self, query, repeat):
+        samples = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            query()
+            samples.append(time.perf_counter() - start)
+        return statistics.median(samples)
+
+    def report(self, label, results):
+        self.stdout.write(self.style.SUCCESS(f'Median latency {label}:'))
+        for name, seconds in results.items():
+            self.stdout.write(f'{name:<24} {seconds * 1000:10.2f} ms')
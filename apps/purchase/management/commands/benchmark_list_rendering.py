@@ -0,0 +1,62 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.renderers import JSONRenderer
+
+from apps.helpers.fastpath import fast_serializer
+from apps.helpers.renderers import FastJSONRenderer
+from apps.purchase.views import PurchaseOrderViewSet
+
+
+class Command(BaseCommand):
+    help = (
+        'Time loading, serializing and rendering one page of purchase orders (with their lines) through the '
+        'DRF serializer and JSONRenderer against the .values() fast path and FastJSONRenderer, and check that '
+        'every combination produces the same bytes. Seed the database first (seed_data --pos ...).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--page-size', type=int, default=1000)
+        parser.add_argument('--repeat', type=int, default=10)
+
+    def handle(self, *args, **options):
+        viewset = PurchaseOrderViewSet(action='list', kwargs={}, format_kwarg=None, request=None)
+        queryset = viewset.get_queryset()
+        page_size = options['page_size']
+        if queryset.count() < page_size:
+            raise CommandError(f'Needs at least {page_size} purchase orders; run seed_data --pos {page_size}.')
+        fast = fast_serializer(viewset.get_serializer_class())
+
+        def serializer_data():
+            return viewset.get_serializer_class()(list(queryset[:page_size]), many=True).data
+
+        def fast_data():
+            return fast.to_representation(list(fast.rows(queryset)[:page_size]))
+
+        variants = {
+            'serializer + JSONRenderer': (serializer_data, JSONRenderer()),
+            'serializer + FastJSONRenderer': (serializer_data, FastJSONRenderer()),
+            'values() + JSONRenderer': (fast_data, JSONRenderer()),
+            'values() + FastJSONRenderer': (fast_data, FastJSONRenderer()),
+        }
+        results, outputs = {}, set()
+        for name, (load, renderer) in variants.items():
+            # the first pass warms the lookup caches
+            outputs.add(renderer.render(load(), 'application/json'))
+            results[name] = self.time(lambda: renderer.render(load(), 'application/json'), options['repeat'])
+        if len(outputs) != 1:
+            raise CommandError('The variants rendered different bytes.')
+
+        baseline = results['serializer + JSONRenderer']
+        self.stdout.write(self.style.SUCCESS(f'Median time per {page_size}-PO page (identical output):'))
+        for name, seconds in results.items():
+            self.stdout.write(f'{name:<32} {seconds * 1000:10.1f} ms {baseline / seconds:8.1f}x')
+
+    def time(self, func, repeat):
+        samples = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            func()
+            samples.append(time.perf_counter() - start)
+        return statistics.median(samples)
@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from apps.purchase.rollups import ROLLUP_CHUNK_DAYS, rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = (
+        'Backfill (or repair) the daily product and supplier receipt rollups from the inventory ledger, '
+        'one chunk of days per transaction. Receipts are added to the rollups as they are received, so '
+        'this is only needed once for existing history, or after ledger rows were written directly. '
+        'Receipts posted while a chunk is rebuilt may be counted twice or not at all; run it when '
+        'receiving is quiet, or re-run it for the affected days.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', help='First day to rebuild (YYYY-MM-DD; default: the first receipt).')
+        parser.add_argument('--end', help='Last day to rebuild (YYYY-MM-DD; default: today).')
+        parser.add_argument('--chunk-days', type=int, default=ROLLUP_CHUNK_DAYS)
+
+    def handle(self, *args, **options):
+        start, end = (self.parse_day(options[name], name) for name in ('start', 'end'))
+        if options['chunk_days'] < 1:
+            raise CommandError('--chunk-days must be at least 1.')
+
+        total = 0
+        for first, last, written in rebuild_rollups(start, end, options['chunk_days']):
+            total += written
+            self.stdout.write(f"{first} to {last}: {written} rollup rows")
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {total} daily rollup rows."))
+
+    @staticmethod
+    def parse_day(value, name):
+        if value is None:
+            return None
+        day = parse_date(value)
+        if day is None:
+            raise CommandError(f'--{name} must be a date (YYYY-MM-DD).')
+        return day
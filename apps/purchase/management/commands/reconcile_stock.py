@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from apps.purchase.ledger import adopt_stock_drift, reconcile_stock, stock_drift
+
+
+class Command(BaseCommand):
+    help = 'Rebuild Product.stock_quantity from the inventory ledger in a single aggregated pass.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Only report how many products disagree with the ledger.')
+        parser.add_argument('--adjust-ledger', action='store_true',
+                            help='Keep the counters and post ADJUSTMENT rows so the ledger matches them instead.')
+
+    def handle(self, *args, **kwargs):
+        drifted = stock_drift().count()
+        self.stdout.write(f"{drifted} products differ from the ledger.")
+        if kwargs['dry_run'] or not drifted:
+            return
+
+        if kwargs['adjust_ledger']:
+            written = adopt_stock_drift()
+            self.stdout.write(self.style.SUCCESS(f"Posted {written} ledger adjustments."))
+        else:
+            updated = reconcile_stock()
+            self.stdout.write(self.style.SUCCESS(f"Rebuilt stock for {updated} products from the ledger."))
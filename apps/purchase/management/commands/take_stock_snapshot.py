@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from apps.purchase.ledger import take_snapshots
+
+
+class Command(BaseCommand):
+    help = 'Snapshot the stock of every product that moved since the previous snapshot. Run periodically (e.g. nightly).'
+
+    def handle(self, *args, **kwargs):
+        written = take_snapshots()
+        self.stdout.write(self.style.SUCCESS(f"Wrote {written} stock snapshots."))
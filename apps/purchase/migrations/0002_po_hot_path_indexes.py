@@ -0,0 +1,57 @@
+# Generated by Django 5.2 on 2026-10-18 14:08
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Min, Sum
+
+
+def merge_duplicate_items(apps, schema_editor):
+    """Fold repeated (po, product) lines into one so the unique constraint can be added."""
+    PurchaseOrderItem = apps.get_model('purchase', 'PurchaseOrderItem')
+    duplicates = (
+        PurchaseOrderItem.objects.values('po_id', 'product_id')
+        .annotate(lines=Count('id'), keep=Min('id'), ordered=Sum('ordered_quantity'), received=Sum('received_quantity'))
+        .filter(lines__gt=1)
+    )
+    for row in duplicates:
+        PurchaseOrderItem.objects.filter(pk=row['keep']).update(
+            ordered_quantity=row['ordered'], received_quantity=row['received']
+        )
+        PurchaseOrderItem.objects.filter(po_id=row['po_id'], product_id=row['product_id']).exclude(
+            pk=row['keep']
+        ).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('product', '0001_initial'),
+        ('purchase', '0001_initial'),
+        ('supplier', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='purchaseorder',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('approved', 'Approved'), ('partially_delivered', 'Partially Delivered'), ('completed', 'Completed')], default='pending', max_length=20),
+        ),
+        migrations.AddIndex(
+            model_name='inventorytransaction',
+            index=models.Index(fields=['product', 'date'], name='purchase_txn_product_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='purchaseorder',
+            index=models.Index(fields=['status', 'id'], name='purchase_po_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='purchaseorder',
+            index=models.Index(condition=models.Q(('status', 'completed'), _negated=True), fields=['id'], name='purchase_po_open_idx'),
+        ),
+        migrations.RunPython(merge_duplicate_items, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='purchaseorderitem',
+            constraint=models.UniqueConstraint(fields=('po', 'product'), name='purchase_item_po_product_uniq'),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2 on 2026-10-18 14:13
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('product', '0001_initial'),
+        ('purchase', '0002_po_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='inventorytransaction',
+            name='po',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='purchase.purchaseorder'),
+        ),
+        migrations.AlterField(
+            model_name='inventorytransaction',
+            name='transaction_type',
+            field=models.CharField(choices=[('RECEIVED_PO', 'Received against PO'), ('ADJUSTMENT', 'Stock adjustment'), ('RETURN', 'Returned to supplier')], max_length=50),
+        ),
+        migrations.CreateModel(
+            name='StockSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('taken_at', models.DateTimeField()),
+                ('quantity', models.IntegerField()),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_snapshots', to='product.product')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['taken_at'], name='purchase_snapshot_taken_idx')],
+                'constraints': [models.UniqueConstraint(fields=('product', 'taken_at'), name='purchase_snapshot_product_uniq')],
+            },
+        ),
+    ]
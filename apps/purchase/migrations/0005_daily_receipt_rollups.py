@@ -0,0 +1,64 @@
+# Generated by Django 5.2 on 2026-10-18 15:22
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('product', '0004_updated_at_auto_now'),
+        ('purchase', '0004_updated_at_auto_now'),
+        ('supplier', '0002_updated_at_auto_now'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyProductReceipts',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('received_quantity', models.PositiveIntegerField(default=0)),
+                ('receipt_count', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='DailySupplierReceipts',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('received_quantity', models.PositiveIntegerField(default=0)),
+                ('receipt_count', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='inventorytransaction',
+            index=models.Index(fields=['date'], name='purchase_txn_date_idx'),
+        ),
+        migrations.AddField(
+            model_name='dailyproductreceipts',
+            name='product',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_receipts', to='product.product'),
+        ),
+        migrations.AddField(
+            model_name='dailysupplierreceipts',
+            name='supplier',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_receipts', to='supplier.supplier'),
+        ),
+        migrations.AddIndex(
+            model_name='dailyproductreceipts',
+            index=models.Index(fields=['day'], name='purchase_dprod_day_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='dailyproductreceipts',
+            constraint=models.UniqueConstraint(fields=('product', 'day'), name='purchase_daily_product_uniq'),
+        ),
+        migrations.AddIndex(
+            model_name='dailysupplierreceipts',
+            index=models.Index(fields=['day'], name='purchase_dsupp_day_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='dailysupplierreceipts',
+            constraint=models.UniqueConstraint(fields=('supplier', 'day'), name='purchase_daily_supplier_uniq'),
+        ),
+    ]
@@ -16,15 +16,98 @@ class PurchaseOrder(TimeStamp):
     supplier = models.ForeignKey(Supplier, on_delete=models.CASCADE)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'id'], name='purchase_po_status_idx'),
+            # the dashboard and receiving only look at open POs; skipped on backends without partial indexes
+            models.Index(fields=['id'], condition=~models.Q(status='completed'), name='purchase_po_open_idx'),
+            # MAX(updated_at) behind the list ETag
+            models.Index(fields=['updated_at'], name='purchase_po_updated_idx'),
+        ]
+
 class PurchaseOrderItem(models.Model):
     po = models.ForeignKey(PurchaseOrder, related_name='items', on_delete=models.CASCADE)
     product = models.ForeignKey(Product, on_delete=models.CASCADE)
     ordered_quantity = models.PositiveIntegerField()
     received_quantity = models.PositiveIntegerField(default=0)
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['po', 'product'], name='purchase_item_po_product_uniq'),
+        ]
+
 class InventoryTransaction(models.Model):
+    """
+    Append-only stock ledger. ``quantity`` is signed: receipts add stock,
+    returns to a supplier remove it and adjustments may go either way.
+    """
+    TRANSACTION_TYPE_CHOICES = [
+        ('RECEIVED_PO', 'Received against PO'),
+        ('ADJUSTMENT', 'Stock adjustment'),
+        ('RETURN', 'Returned to supplier'),
+    ]
     product = models.ForeignKey(Product, on_delete=models.CASCADE)
     quantity = models.IntegerField()
-    transaction_type = models.CharField(max_length=50)
-    po = models.ForeignKey(PurchaseOrder, on_delete=models.CASCADE)
-    date = models.DateTimeField(auto_now_add=True)
\ No newline at end of file
+    transaction_type = models.CharField(max_length=50, choices=TRANSACTION_TYPE_CHOICES)
+    po = models.ForeignKey(PurchaseOrder, on_delete=models.CASCADE, null=True, blank=True)
+    date = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['product', 'date'], name='purchase_txn_product_date_idx'),
+            # date ranges across all products: snapshot runs and rollup rebuilds
+            models.Index(fields=['date'], name='purchase_txn_date_idx'),
+        ]
+
+class StockSnapshot(models.Model):
+    """
+    Stock balance of a product at ``taken_at``: the sum of its ledger rows
+    dated at or before that moment. Written periodically for products that
+    moved since the previous snapshot, so as-of queries only need to add the
+    ledger rows after the latest snapshot.
+    """
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='stock_snapshots')
+    taken_at = models.DateTimeField()
+    quantity = models.IntegerField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['product', 'taken_at'], name='purchase_snapshot_product_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['taken_at'], name='purchase_snapshot_taken_idx'),
+        ]
+
+class DailyProductReceipts(models.Model):
+    """
+    Goods received per product and day, maintained with the ledger (see
+    ``apps.purchase.rollups``), so receipt time series read one row per
+    product and day instead of the ledger itself.
+    """
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='daily_receipts')
+    day = models.DateField()
+    received_quantity = models.PositiveIntegerField(default=0)
+    receipt_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['product', 'day'], name='purchase_daily_product_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['day'], name='purchase_dprod_day_idx'),
+        ]
+
+class DailySupplierReceipts(models.Model):
+    """Goods received against a supplier's purchase orders per day; see ``DailyProductReceipts``."""
+    supplier = models.ForeignKey(Supplier, on_delete=models.CASCADE, related_name='daily_receipts')
+    day = models.DateField()
+    received_quantity = models.PositiveIntegerField(default=0)
+    receipt_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['supplier', 'day'], name='purchase_daily_supplier_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['day'], name='purchase_dsupp_day_idx'),
+        ]
@@ -0,0 +1,65 @@
+from itertools import groupby
+
+from django.db import transaction
+from django.db.models import F, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+from .models import PurchaseOrder, PurchaseOrderItem
+from ..product.models import Product
+
+
+# products are ordered back up to this multiple of their reorder threshold
+ORDER_UP_TO_FACTOR = 2
+OPEN_STATUSES = ('pending', 'approved', 'partially_delivered')
+PLAN_CHUNK_SIZE = 5000
+
+
+def reorder_candidates():
+    """
+    Flagged products that have a preferred supplier, annotated with the
+    quantity already on order (outstanding lines of open POs) and the
+    ``order_quantity`` still needed to reach ``ORDER_UP_TO_FACTOR`` times the
+    threshold. Ordered by supplier so callers can group while streaming.
+    """
+    on_order = (
+        PurchaseOrderItem.objects.filter(product=OuterRef('pk'), po__status__in=OPEN_STATUSES)
+        .order_by().values('product')
+        .annotate(total=Sum(F('ordered_quantity') - F('received_quantity'))).values('total')
+    )
+    return (
+        Product.objects.filter(reorder_needed=True, preferred_supplier__isnull=False)
+        .annotate(on_order=Coalesce(Subquery(on_order), 0))
+        .annotate(order_quantity=F('reorder_threshold') * ORDER_UP_TO_FACTOR - F('stock_quantity') - F('on_order'))
+        .filter(order_quantity__gt=0)
+        .order_by('preferred_supplier_id', 'id')
+    )
+
+
+def plan_reorders():
+    """
+    Yield ``{'supplier': id, 'items': [{'product': id, 'ordered_quantity': n}, ...]}``
+    per supplier, reading candidates with a server-side cursor so memory is
+    bounded by the largest single supplier's line count.
+    """
+    rows = reorder_candidates().values_list('preferred_supplier_id', 'id', 'order_quantity')
+    for supplier_id, lines in groupby(rows.iterator(chunk_size=PLAN_CHUNK_SIZE), key=lambda row: row[0]):
+        yield {
+            'supplier': supplier_id,
+            'items': [{'product': product_id, 'ordered_quantity': quantity} for _, product_id, quantity in lines],
+        }
+
+
+def create_reorder_pos(plans, user=None):
+    """
+    Create one pending PO per plan from ``plan_reorders()``, each with its
+    items in one ``bulk_create`` inside its own transaction, and yield the
+    created POs. A failure only rolls back that supplier's PO.
+    """
+    for plan in plans:
+        with transaction.atomic():
+            po = PurchaseOrder.objects.create(supplier_id=plan['supplier'], created_by=user)
+            PurchaseOrderItem.objects.bulk_create([
+                PurchaseOrderItem(po_id=po.pk, product_id=item['product'], ordered_quantity=item['ordered_quantity'])
+                for item in plan['items']
+            ])
+        yield po
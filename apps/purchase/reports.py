@@ -0,0 +1,101 @@
+import hashlib
+import json
+
+from django.core.cache import cache
+from django.db.models import (Avg, Count, DateField, DurationField, ExpressionWrapper, F, Max, OuterRef, Q,
+                              Subquery, Sum)
+from django.db.models.functions import Trunc
+from django.utils import timezone
+
+from .models import InventoryTransaction, PurchaseOrderItem
+from ..supplier.lookups import supplier_lookup
+
+
+REPORT_CACHE_TIMEOUT = 5 * 60
+REPORT_BUCKETS = ('day', 'week', 'month', 'quarter', 'year')
+
+
+def completed_at():
+    """When a PO was completed: the date of its last receipt in the ledger."""
+    return Subquery(
+        InventoryTransaction.objects.filter(po=OuterRef('pk'), transaction_type='RECEIVED_PO')
+        .order_by().values('po').annotate(last=Max('date')).values('last')
+    )
+
+
+def line_total(expression):
+    """Sum of ``expression`` over the lines of the outer PO."""
+    return Subquery(
+        PurchaseOrderItem.objects.filter(po=OuterRef('pk'))
+        .order_by().values('po').annotate(total=Sum(expression)).values('total')
+    )
+
+
+def purchase_order_report(purchase_orders, group_by, bucket='month'):
+    """
+    Purchasing figures of ``purchase_orders`` (a filtered queryset) per
+    ``supplier`` and/or ``period`` (its creation date truncated to
+    ``bucket``), ordered by those dimensions.
+
+    Each row carries PO counts by state, ordered, received and still open
+    quantities, the fill rate (received / ordered) and the average lead
+    time from creation to the last receipt of completed POs. It is one
+    grouped query over the POs; line totals come from correlated subqueries
+    on the line index, so periods are truncated once per PO rather than
+    once per line.
+    """
+    # aliased, as annotations may not shadow model fields
+    dimensions = {
+        'supplier': F('supplier_id'),
+        'period': Trunc('created_at', bucket, output_field=DateField()),
+    }
+    dimensions = {f'_{name}': dimensions[name] for name in group_by}
+    completed = Q(status='completed')
+    lead_time = ExpressionWrapper(completed_at() - F('created_at'), output_field=DurationField())
+    aggregates = (
+        purchase_orders.order_by().annotate(**dimensions).values(*dimensions).annotate(
+            po_count=Count('pk'),
+            open_po_count=Count('pk', filter=~completed),
+            completed_po_count=Count('pk', filter=completed),
+            ordered=Sum(line_total('ordered_quantity')),
+            received=Sum(line_total('received_quantity')),
+            still_open=Sum(line_total(F('ordered_quantity') - F('received_quantity')), filter=~completed),
+            avg_lead_time=Avg(lead_time, filter=completed),
+        ).order_by(*dimensions)
+    )
+
+    rows = []
+    for row in aggregates:
+        ordered, received, lead_time = row['ordered'] or 0, row['received'] or 0, row['avg_lead_time']
+        rows.append({
+            **{key[1:]: row[key] for key in dimensions},
+            'po_count': row['po_count'],
+            'open_po_count': row['open_po_count'],
+            'completed_po_count': row['completed_po_count'],
+            'ordered_quantity': ordered,
+            'received_quantity': received,
+            'open_quantity': row['still_open'] or 0,
+            'fill_rate': round(received / ordered, 4) if ordered else None,
+            'avg_lead_time_days': round(lead_time.total_seconds() / 86400, 2) if lead_time is not None else None,
+        })
+
+    if 'supplier' in group_by:
+        names = supplier_lookup.get_many(row['supplier'] for row in rows)
+        for row in rows:
+            row['supplier_name'] = names.get(row['supplier'], {}).get('name')
+    return rows
+
+
+def cached_report(name, params, build):
+    """
+    ``{"generated_at": ..., "results": build()}``, kept in the cache for
+    ``REPORT_CACHE_TIMEOUT`` seconds per report and parameter set: figures
+    may lag writes by that long.
+    """
+    fingerprint = hashlib.md5(json.dumps(params, sort_keys=True, default=str).encode()).hexdigest()
+    key = f'report:{name}:{fingerprint}'
+    report = cache.get(key)
+    if report is None:
+        report = {'generated_at': timezone.now(), 'results': build()}
+        cache.set(key, report, REPORT_CACHE_TIMEOUT)
+    return report
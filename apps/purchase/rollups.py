@@ -0,0 +1,129 @@
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+
+from django.db import transaction
+from django.db.models import Case, Count, DateField, F, IntegerField, Min, Sum, Value, When
+from django.db.models.functions import Trunc, TruncDate
+from django.utils import timezone
+
+from .models import DailyProductReceipts, DailySupplierReceipts, InventoryTransaction
+
+
+ROLLUP_CHUNK_DAYS = 31
+
+
+def _start_of(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def _increments(field, key_field, amounts):
+    """``field + CASE WHEN <key_field> = .. THEN .. END`` for ``amounts`` ({key: amount})."""
+    return F(field) + Case(
+        *[When(**{key_field: key}, then=Value(amount)) for key, amount in amounts.items()],
+        default=Value(0),
+        output_field=IntegerField(),
+    )
+
+
+def _add_to_rollup(model, key_field, totals):
+    """
+    Add ``totals`` ({(key, day): (quantity, receipts)}) to the rollup rows
+    of ``model``, whether the rows exist or not: missing rows are inserted
+    as zeros (conflicts ignored) in one query, then incremented with one
+    UPDATE per day (a receipt falls on one), so concurrent receipts never
+    lose counts.
+    """
+    if not totals:
+        return
+    model.objects.bulk_create(
+        [model(**{key_field: key, 'day': day}) for key, day in totals],
+        ignore_conflicts=True,
+    )
+    by_day = defaultdict(dict)
+    for (key, day), amounts in totals.items():
+        by_day[day][key] = amounts
+    for day, rows in by_day.items():
+        model.objects.filter(**{f'{key_field}__in': rows, 'day': day}).update(
+            received_quantity=_increments('received_quantity', key_field, {key: qty for key, (qty, _) in rows.items()}),
+            receipt_count=_increments('receipt_count', key_field, {key: count for key, (_, count) in rows.items()}),
+        )
+
+
+def rollup_receipts(receipts, supplier_id):
+    """
+    Add freshly written RECEIVED_PO ledger rows (all against POs of
+    ``supplier_id``) to the daily product and supplier rollups, in the
+    caller's transaction. Takes a fixed number of queries.
+    """
+    by_product = defaultdict(lambda: [0, 0])
+    by_supplier = defaultdict(lambda: [0, 0])
+    for receipt in receipts:
+        day = timezone.localdate(receipt.date)
+        for totals in (by_product[receipt.product_id, day], by_supplier[supplier_id, day]):
+            totals[0] += receipt.quantity
+            totals[1] += 1
+    with transaction.atomic():
+        _add_to_rollup(DailyProductReceipts, 'product_id', {key: tuple(value) for key, value in by_product.items()})
+        _add_to_rollup(DailySupplierReceipts, 'supplier_id', {key: tuple(value) for key, value in by_supplier.items()})
+
+
+def rebuild_rollups(start=None, end=None, chunk_days=ROLLUP_CHUNK_DAYS):
+    """
+    Recompute the daily rollups from the ledger for the days from ``start``
+    to ``end`` (inclusive; default: the first receipt to today), one chunk
+    of ``chunk_days`` days per transaction, so memory and lock time stay
+    bounded however long the history is. Safe to re-run.
+
+    Yields ``(first day, last day, rollup rows written)`` per chunk.
+    """
+    receipts = InventoryTransaction.objects.filter(transaction_type='RECEIVED_PO')
+    if start is None:
+        first = receipts.aggregate(first=Min('date'))['first']
+        if first is None:
+            return
+        start = timezone.localdate(first)
+    end = end or timezone.localdate()
+
+    day = start
+    while day <= end:
+        last = min(day + timedelta(days=chunk_days - 1), end)
+        with transaction.atomic():
+            written = 0
+            chunk = receipts.filter(date__gte=_start_of(day), date__lt=_start_of(last + timedelta(days=1))).order_by()
+            for model, key_field, group in (
+                (DailyProductReceipts, 'product_id', 'product_id'),
+                (DailySupplierReceipts, 'supplier_id', 'po__supplier_id'),
+            ):
+                model.objects.filter(day__gte=day, day__lte=last).delete()
+                rows = chunk.annotate(day=TruncDate('date')).values(group, 'day').annotate(
+                    quantity=Sum('quantity'), receipts=Count('pk'),
+                )
+                written += len(model.objects.bulk_create([
+                    model(**{key_field: row[group], 'day': row['day'], 'received_quantity': row['quantity'],
+                             'receipt_count': row['receipts']})
+                    for row in rows
+                ]))
+        yield day, last, written
+        day = last + timedelta(days=1)
+
+
+def receipt_series(rollups, key, bucket='day'):
+    """
+    ``[{period, <key>, received_quantity, receipt_count}]`` from a filtered
+    rollup queryset (``key`` is ``product`` or ``supplier``), summed per
+    ``bucket`` of days and ordered by period. Reads the rollup rows only,
+    never the ledger.
+    """
+    key_field = f'{key}_id'
+    period = F('day') if bucket == 'day' else Trunc('day', bucket, output_field=DateField())
+    rows = (
+        rollups.order_by().annotate(period=period)
+        .values('period', key_field)
+        .annotate(quantity=Sum('received_quantity'), receipts=Sum('receipt_count'))
+        .order_by('period', key_field)
+    )
+    return [
+        {'period': row['period'], key: row[key_field], 'received_quantity': row['quantity'],
+         'receipt_count': row['receipts']}
+        for row in rows
+    ]
@@ -1,36 +1,105 @@
+from django.db import transaction
+from django.db.models import Prefetch, prefetch_related_objects
 from rest_framework import serializers
+from .ledger import post_movements, validate_movement
 from .models import PurchaseOrder, PurchaseOrderItem, InventoryTransaction
-from ..product.models import Product
+from ..helpers.lookups import CachedLookupField, LookupListSerializer
+from ..product.lookups import product_lookup
+from ..supplier.lookups import supplier_lookup
+from ..supplier.serializers import SupplierSerializer
+
+
+def check_unique_products(items):
+    """A product may appear on only one line of a PO."""
+    seen = set()
+    errors = []
+    for item in items:
+        errors.append({'product': ["Product appears on more than one line."]} if item['product_id'] in seen else {})
+        seen.add(item['product_id'])
+    if any(errors):
+        raise serializers.ValidationError(errors)
 
 
 class PurchaseOrderItemSerializer(serializers.ModelSerializer):
-    product_name = serializers.CharField(source='product.name', read_only=True)
+    # products are resolved for the whole PO at once in PurchaseOrderSerializer.validate_items
+    product = serializers.IntegerField(source='product_id', min_value=1)
+    product_name = CachedLookupField(product_lookup, 'name', source='product_id')
     class Meta:
         model = PurchaseOrderItem
         fields = ['id', 'product', 'product_name', 'ordered_quantity', 'received_quantity']
         read_only_fields = ['received_quantity']
+        list_serializer_class = LookupListSerializer
 
 
 class PurchaseOrderSerializer(serializers.ModelSerializer):
     items = PurchaseOrderItemSerializer(many=True)
-    supplier_name = serializers.CharField(source='supplier.name', read_only=True)
+    supplier_name = CachedLookupField(supplier_lookup, 'name', source='supplier_id')
     created_by_name = serializers.CharField(source='created_by.username', read_only=True)
 
     class Meta:
         model = PurchaseOrder
         fields = ['id', 'supplier', 'supplier_name', 'created_by', 'created_by_name', 'status', 'created_at', 'items']
         read_only_fields = ['status']
+        list_serializer_class = LookupListSerializer
+
+    def validate_items(self, items):
+        """
+        Check every referenced product exists with one batched query. The
+        caches may still list a deleted product, so they are not asked; the
+        rows read refresh the names shown in the response instead.
+        """
+        check_unique_products(items)
+        products = product_lookup.load({item['product_id'] for item in items})
+
+        message = serializers.PrimaryKeyRelatedField.default_error_messages['does_not_exist']
+        errors = [
+            {'product': [message.format(pk_value=item['product_id'])]} if item['product_id'] not in products else {}
+            for item in items
+        ]
+        if any(errors):
+            raise serializers.ValidationError(errors)
+        return items
 
     def create(self, validated_data):
         items_data = validated_data.pop('items')
-        po = PurchaseOrder.objects.create(**validated_data)
-        for item in items_data:
-            PurchaseOrderItem.objects.create(po=po, **item)
+        with transaction.atomic():
+            po = PurchaseOrder.objects.create(**validated_data)
+            PurchaseOrderItem.objects.bulk_create([
+                PurchaseOrderItem(po=po, **item) for item in items_data
+            ])
+
+        # the response lists the lines read back in one query, in the order the PO views use
+        prefetch_related_objects([po], Prefetch('items', queryset=PurchaseOrderItem.objects.order_by('id')))
         return po
 
 
+class PurchaseOrderIngestSerializer(serializers.Serializer):
+    """
+    Shape validation for one record of a bulk PO import. No queries are run
+    here; supplier and product references are checked per chunk by
+    services.ingest_purchase_orders.
+
+    ``supplier`` is either an existing supplier id or a supplier object to create.
+    """
+    supplier = serializers.JSONField()
+    items = PurchaseOrderItemSerializer(many=True)
+
+    def validate_supplier(self, value):
+        if isinstance(value, dict):
+            supplier = SupplierSerializer(data=value)
+            supplier.is_valid(raise_exception=True)
+            return supplier.validated_data
+        if isinstance(value, int) and not isinstance(value, bool) and value > 0:
+            return value
+        raise serializers.ValidationError("Expected a supplier id or a supplier object.")
+
+    def validate_items(self, items):
+        check_unique_products(items)
+        return items
+
+
 class PurchaseOrderReceiveItemSerializer(serializers.Serializer):
-    product = serializers.PrimaryKeyRelatedField(queryset=Product.objects.all())
+    product = serializers.IntegerField(min_value=1)
     received_quantity = serializers.IntegerField(min_value=1)
 
 class PurchaseOrderReceiveSerializer(serializers.Serializer):
@@ -41,21 +110,45 @@ class PurchaseOrderReceiveSerializer(serializers.Serializer):
             raise serializers.ValidationError("At least one item must be provided.")
 
         po = self.context.get('po')
-        po_items = {item.product.id: item for item in po.items.all()}
+        po_items = {item.product_id: item for item in po.items.all()}
 
+        # merge repeated lines for the same product into one quantity
+        received = {}
         for entry in data['items']:
-            product = entry['product']
-            received_quantity = entry['received_quantity']
+            received[entry['product']] = received.get(entry['product'], 0) + entry['received_quantity']
 
+        for product_id, received_quantity in received.items():
             # check product id is in po/not
-            if product.id not in po_items:
-                raise serializers.ValidationError(f"Product {product.name} is not part of this PO.")
+            if product_id not in po_items:
+                raise serializers.ValidationError(f"Product {product_id} is not part of this PO.")
 
-            po_item = po_items[product.id]
+            po_item = po_items[product_id]
             # check total receive quantity
             if po_item.received_quantity + received_quantity > po_item.ordered_quantity:
                 raise serializers.ValidationError(
-                    f"Received quantity for {product.id} exceeds the ordered quantity."
+                    f"Received quantity for {product_id} exceeds the ordered quantity."
                 )
 
-        return data
\ No newline at end of file
+        data['received'] = received
+        return data
+
+
+class InventoryTransactionSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = InventoryTransaction
+        fields = ['id', 'product', 'quantity', 'transaction_type', 'po', 'date']
+        read_only_fields = ['po', 'date']
+
+    def validate_transaction_type(self, value):
+        if value == 'RECEIVED_PO':
+            raise serializers.ValidationError("Receipts are recorded by receiving a purchase order.")
+        return value
+
+    def validate(self, data):
+        validate_movement(data['transaction_type'], data['quantity'])
+        return data
+
+    def create(self, validated_data):
+        (entry,) = post_movements(validated_data['transaction_type'],
+                                  {validated_data['product'].pk: validated_data['quantity']})
+        return entry
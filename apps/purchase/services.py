@@ -0,0 +1,208 @@
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import Count, F
+from django.utils import timezone
+from rest_framework import serializers
+from rest_framework.exceptions import ParseError
+
+from .events import publish_status_change
+from .ledger import per_row_increment, post_movements
+from .models import PurchaseOrder, PurchaseOrderItem
+from .rollups import rollup_receipts
+from .serializers import PurchaseOrderIngestSerializer
+from ..helpers.changes import record_changes, record_queryset_changes
+from ..product.models import Product
+from ..supplier.models import Supplier
+
+
+RECEIVABLE_STATUSES = ('approved', 'partially_delivered')
+INGEST_CHUNK_SIZE = 500
+STATUS_SUMMARY_CACHE_KEY = 'purchase:status-summary'
+STATUS_SUMMARY_TIMEOUT = 60
+
+
+def receive_items(po, items):
+    """
+    Receive goods against a purchase order.
+
+    ``items`` is a mapping of ``{product_id: received_quantity}``. The PO row,
+    its affected items and their products are locked in one pass, quantities
+    are applied with ``F()`` expressions (so concurrent receipts of the same
+    SKU never overwrite each other) and the ledger is written with a single
+    ``bulk_create``, then added to the daily receipt rollups. The number of
+    queries does not depend on the number of lines received.
+
+    Raises ``serializers.ValidationError`` if, once locked, the PO is no
+    longer receivable or a line would exceed its ordered quantity.
+    """
+    with transaction.atomic():
+        po = PurchaseOrder.objects.select_for_update().get(pk=po.pk)
+        if po.status not in RECEIVABLE_STATUSES:
+            raise serializers.ValidationError("PO must be approved or partially delivered to receive items.")
+
+        po_items = {
+            po_item.product_id: po_item
+            for po_item in PurchaseOrderItem.objects.select_for_update()
+            .select_related('product')
+            .filter(po=po, product_id__in=items.keys())
+        }
+
+        item_amounts = {}
+        for product_id, received_qty in items.items():
+            po_item = po_items.get(product_id)
+            if po_item is None:
+                raise serializers.ValidationError(f"Product {product_id} is not part of this PO.")
+            if po_item.received_quantity + received_qty > po_item.ordered_quantity:
+                raise serializers.ValidationError(
+                    f"Received quantity for {product_id} exceeds the ordered quantity."
+                )
+            item_amounts[po_item.pk] = received_qty
+
+        PurchaseOrderItem.objects.filter(pk__in=item_amounts.keys()).update(
+            received_quantity=per_row_increment('received_quantity', item_amounts)
+        )
+        receipts = post_movements('RECEIVED_PO', items, po=po)
+        rollup_receipts(receipts, po.supplier_id)
+
+        outstanding = po.items.filter(received_quantity__lt=F('ordered_quantity')).exists()
+        previous = po.status
+        po.status = 'partially_delivered' if outstanding else 'completed'
+        po.save(update_fields=['status'])
+        publish_status_change(po, previous)
+
+    return po
+
+
+def ingest_purchase_orders(records, user=None, chunk_size=INGEST_CHUNK_SIZE):
+    """
+    Create many purchase orders from an iterable of PO records.
+
+    Records are consumed ``chunk_size`` at a time. Each chunk is validated
+    with one supplier and one product lookup, then its new suppliers, POs and
+    items are inserted with ``bulk_create`` in a single transaction, so a
+    failing chunk never leaves partial POs behind and earlier chunks stay
+    committed.
+
+    Returns one result per record, in input order: ``{'index', 'id'}`` for
+    created POs and ``{'index', 'errors'}`` for rejected ones.
+    """
+    results = []
+    chunk = []
+    parse_error = None
+    try:
+        for record in records:
+            chunk.append(record)
+            if len(chunk) == chunk_size:
+                results.extend(_ingest_chunk(chunk, len(results), user))
+                chunk = []
+    except ParseError as exc:
+        # the stream is unreadable past this point; keep what was read and report it
+        parse_error = exc.detail
+    if chunk:
+        results.extend(_ingest_chunk(chunk, len(results), user))
+    if parse_error is not None:
+        results.append({'index': len(results), 'errors': parse_error})
+    # bulk_create bypasses the post_save handler that normally does this
+    invalidate_status_summary()
+    return results
+
+
+def _ingest_chunk(chunk, offset, user):
+    results = {}
+    valid = {}
+    for index, record in enumerate(chunk, start=offset):
+        serializer = PurchaseOrderIngestSerializer(data=record)
+        if serializer.is_valid():
+            valid[index] = serializer.validated_data
+        else:
+            results[index] = {'index': index, 'errors': serializer.errors}
+
+    supplier_ids = {data['supplier'] for data in valid.values() if not isinstance(data['supplier'], dict)}
+    product_ids = {item['product_id'] for data in valid.values() for item in data['items']}
+    known_suppliers = set(Supplier.objects.filter(pk__in=supplier_ids).values_list('pk', flat=True))
+    known_products = set(Product.objects.filter(pk__in=product_ids).values_list('pk', flat=True))
+
+    for index, data in list(valid.items()):
+        errors = {}
+        if not isinstance(data['supplier'], dict) and data['supplier'] not in known_suppliers:
+            errors['supplier'] = [f'Invalid pk "{data["supplier"]}" - object does not exist.']
+        missing = sorted({item['product_id'] for item in data['items']} - known_products)
+        if missing:
+            errors['items'] = [f'Invalid pk "{pk}" - object does not exist.' for pk in missing]
+        if errors:
+            results[index] = {'index': index, 'errors': errors}
+            del valid[index]
+
+    with transaction.atomic():
+        # identical inline suppliers within a chunk are created once
+        new_suppliers = {}
+        for data in valid.values():
+            if isinstance(data['supplier'], dict):
+                key = tuple(sorted(data['supplier'].items()))
+                data['supplier'] = new_suppliers.setdefault(key, Supplier(created_by=user, **data['supplier']))
+        _bulk_create_with_pks(Supplier, list(new_suppliers.values()))
+
+        pos = {
+            index: PurchaseOrder(
+                supplier_id=data['supplier'].pk if isinstance(data['supplier'], Supplier) else data['supplier'],
+                created_by=user,
+            )
+            for index, data in valid.items()
+        }
+        _bulk_create_with_pks(PurchaseOrder, list(pos.values()))
+
+        PurchaseOrderItem.objects.bulk_create([
+            PurchaseOrderItem(po=pos[index], product_id=item['product_id'], ordered_quantity=item['ordered_quantity'])
+            for index, data in valid.items()
+            for item in data['items']
+        ])
+        # bulk_create sends no post_save, so the change feed is written here
+        record_changes(Supplier, [supplier.pk for supplier in new_suppliers.values()])
+        record_changes(PurchaseOrder, [po.pk for po in pos.values()])
+
+    for index, po in pos.items():
+        results[index] = {'index': index, 'id': po.pk}
+    return [results[index] for index in sorted(results)]
+
+
+def _bulk_create_with_pks(model, objs):
+    # bulk_create only sets primary keys on backends that can return them
+    if connection.features.can_return_rows_from_bulk_insert:
+        model.objects.bulk_create(objs)
+    else:
+        for obj in objs:
+            obj.save(force_insert=True)
+
+
+def get_status_summary():
+    """
+    Number of purchase orders per status, e.g. ``{'pending': 3, 'completed': 10, ...}``.
+
+    Computed with one grouped COUNT over the status index and kept in the
+    cache until a PO is saved or deleted (see ``apps.purchase.signals``) or
+    the short timeout expires.
+    """
+    summary = cache.get(STATUS_SUMMARY_CACHE_KEY)
+    if summary is None:
+        counts = dict(
+            PurchaseOrder.objects.order_by().values_list('status').annotate(total=Count('id'))
+        )
+        summary = {status: counts.get(status, 0) for status, _ in PurchaseOrder.STATUS_CHOICES}
+        cache.set(STATUS_SUMMARY_CACHE_KEY, summary, STATUS_SUMMARY_TIMEOUT)
+    return summary
+
+
+def invalidate_status_summary():
+    cache.delete(STATUS_SUMMARY_CACHE_KEY)
+
+
+def touch_purchase_orders(purchase_orders):
+    """
+    Move ``updated_at`` of ``purchase_orders`` (a queryset) and record them
+    on the change feed, set-based, after a change to a name they show (their
+    supplier's, a product's or their creator's), so their ETags and the
+    copies synced from the feed are refreshed. Returns the number touched.
+    """
+    with transaction.atomic():
+        record_queryset_changes(purchase_orders)
+        return purchase_orders.update(updated_at=timezone.now())
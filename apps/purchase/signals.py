@@ -0,0 +1,74 @@
+from django.contrib.auth import get_user_model
+from django.db.models import Prefetch
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from ..helpers.changes import change_feed, record_change, record_changes
+from ..helpers.models import Change
+from ..product.models import Product
+from ..supplier.models import Supplier
+from .models import PurchaseOrder, PurchaseOrderItem
+from .serializers import PurchaseOrderSerializer
+from .services import invalidate_status_summary, touch_purchase_orders
+
+User = get_user_model()
+
+
+# items are published as part of their PO
+change_feed.register(PurchaseOrder, PurchaseOrderSerializer, PurchaseOrder.objects.select_related('created_by').prefetch_related(
+    Prefetch('items', queryset=PurchaseOrderItem.objects.order_by('id'))
+))
+
+
+@receiver(post_save, sender=PurchaseOrder)
+def purchase_order_saved(sender, instance, **kwargs):
+    invalidate_status_summary()
+    record_change(instance)
+
+
+@receiver(post_delete, sender=PurchaseOrder)
+def purchase_order_deleted(sender, instance, **kwargs):
+    invalidate_status_summary()
+    record_change(instance, Change.DELETE)
+
+
+@receiver(post_save, sender=PurchaseOrderItem)
+def purchase_order_item_saved(sender, instance, **kwargs):
+    # no post_delete receiver, which would stop cascades from fast-deleting: items go away with their PO,
+    # or with their product, which touches its POs first (see product_deleted)
+    record_changes(PurchaseOrder, [instance.po_id])
+
+
+# POs show their supplier's, products' and creator's names: renaming one moves the POs' updated_at,
+# which their ETags and change feed entries follow
+
+@receiver(post_save, sender=Supplier)
+def supplier_renamed(sender, instance, created, **kwargs):
+    if not created and instance.has_changed('name'):
+        touch_purchase_orders(PurchaseOrder.objects.filter(supplier=instance))
+
+
+@receiver(post_save, sender=Product)
+def product_renamed(sender, instance, created, **kwargs):
+    if not created and instance.has_changed('name'):
+        touch_purchase_orders(PurchaseOrder.objects.filter(items__product=instance))
+
+
+@receiver(pre_delete, sender=Product)
+def product_deleted(sender, instance, **kwargs):
+    # deleting a product cascades to its lines on POs, which drop out of them
+    touch_purchase_orders(PurchaseOrder.objects.filter(items__product=instance))
+
+
+@receiver(pre_save, sender=User)
+def remember_username(sender, instance, update_fields=None, **kwargs):
+    # users are not loaded through LoadedValuesMixin; logins only save last_login
+    if instance.pk is not None and (update_fields is None or 'username' in update_fields):
+        instance._previous_username = User.objects.filter(pk=instance.pk).values_list('username', flat=True).first()
+
+
+@receiver(post_save, sender=User)
+def user_renamed(sender, instance, created, **kwargs):
+    previous = instance.__dict__.pop('_previous_username', None)
+    if not created and previous is not None and previous != instance.username:
+        touch_purchase_orders(PurchaseOrder.objects.filter(created_by=instance))
@@ -1,20 +1,59 @@
-from django.test import TestCase, Client
+import asyncio
+import csv
+import json
+import math
+import os
+import tempfile
+import threading
+from io import StringIO
+from datetime import datetime, timedelta, timezone as dt_timezone
+from unittest import mock, skipUnless
+
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.db.models import F
+from django.test import TestCase, TransactionTestCase, Client
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
-from django.contrib.auth.models import User, Group
+from django.utils import timezone
+from django.utils.http import http_date
+from django.contrib.auth.models import User, Group, Permission
 from rest_framework_simplejwt.tokens import RefreshToken
 
-from supplier.models import Supplier
-from product.models import Product
-from purchase.models import PurchaseOrder, PurchaseOrderItem
+from apps.helpers.events import EventStream, event_hub
+from apps.helpers.models import Change, IdempotencyKey
+from apps.helpers.permissions import get_user_authz
+from apps.helpers.testing import QueryBudgetMixin
+from apps.supplier.models import Supplier
+from apps.product.lookups import product_lookup
+from apps.product.models import Product
+from apps.product.catalog import upsert_suppliers
+from apps.supplier.lookups import supplier_lookup
+from apps.purchase.events import PURCHASE_ORDER_CHANNEL, purchase_order_events
+from apps.purchase.ledger import per_row_increment, post_movements, reconcile_stock, stock_as_of, stock_drift, take_snapshots
+from apps.purchase.models import (PurchaseOrder, PurchaseOrderItem, InventoryTransaction, StockSnapshot,
+                                  DailyProductReceipts, DailySupplierReceipts)
+from apps.purchase.replenishment import plan_reorders
+from apps.purchase.rollups import rebuild_rollups
+from apps.purchase.serializers import PurchaseOrderSerializer
+from apps.purchase.services import receive_items
+from apps.purchase.views import PurchaseOrderListView, PurchaseOrderViewSet
+from apps.product.views import ProductViewSet
+from apps.supplier.views import SupplierViewSet
 
 
-class PurchaseOrderTests(TestCase):
+class PurchaseOrderTests(QueryBudgetMixin, TestCase):
 
     def setUp(self):
         self.client = Client()
+        cache.clear()
 
         # Create "Manager" group if it doesn't exist
         manager_group, _ = Group.objects.get_or_create(name="Manager")
+        manager_group.permissions.add(*Permission.objects.filter(content_type__app_label='purchase'))
 
         # Create user and add to "Manager" group
         self.manager = User.objects.create_user(username='manager', password='testpass', is_staff=True)
@@ -22,6 +61,8 @@ class PurchaseOrderTests(TestCase):
 
         # 🔥 Force reload of user to reflect group assignment
         self.manager = User.objects.get(pk=self.manager.pk)
+        # warm the authorization cache so query counts below measure the steady state
+        get_user_authz(self.manager)
 
         # Create JWT token for the manager
         refresh = RefreshToken.for_user(self.manager)
@@ -115,3 +156,1043 @@ class PurchaseOrderTests(TestCase):
         po.save()
         response = self.client.delete(reverse('purchaseorder-detail', args=[po_id]))
         self.assertEqual(response.status_code, 204)
+
+    def _approved_po(self, products, ordered_quantity=10, supplier=None):
+        po = PurchaseOrder.objects.create(supplier=supplier or self.supplier, status='approved')
+        PurchaseOrderItem.objects.bulk_create([
+            PurchaseOrderItem(po=po, product=product, ordered_quantity=ordered_quantity) for product in products
+        ])
+        return po
+
+    def _receive_queries(self, line_count):
+        products = Product.objects.bulk_create([
+            Product(name=f"P{line_count}-{i}", sku=f"SKU-{line_count}-{i}") for i in range(line_count)
+        ])
+        po = self._approved_po(products)
+        receive_data = {"items": [{"product": p.id, "received_quantity": 1} for p in products]}
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post(reverse('purchaseorder-receive', args=[po.id]), data=receive_data,
+                                        content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries)
+
+    def test_receive_query_count_is_constant(self):
+        self.assertEqual(self._receive_queries(1), self._receive_queries(25))
+
+    def test_receive_writes_ledger_and_reorder_flag(self):
+        low = Product.objects.create(name="Low", sku="LOW", stock_quantity=0, reorder_threshold=50)
+        po = self._approved_po([self.product, low])
+
+        receive_items(po, {self.product.id: 10, low.id: 4})
+
+        self.product.refresh_from_db()
+        low.refresh_from_db()
+        po.refresh_from_db()
+        self.assertEqual(self.product.stock_quantity, 20)
+        self.assertFalse(self.product.reorder_needed)
+        self.assertEqual(low.stock_quantity, 4)
+        self.assertTrue(low.reorder_needed)
+        self.assertEqual(po.status, 'partially_delivered')
+        self.assertEqual(InventoryTransaction.objects.filter(po=po).count(), 2)
+
+    def test_receive_uses_current_stock_not_validated_snapshot(self):
+        # two docks validate against the same stock level before either one writes
+        first = self._approved_po([self.product])
+        second = self._approved_po([self.product])
+        stale = Product.objects.get(pk=self.product.pk)
+
+        receive_items(first, {stale.id: 3})
+        receive_items(second, {stale.id: 4})
+
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock_quantity, 17)
+
+    def test_receipt_landing_between_read_and_write_is_not_lost(self):
+        po = self._approved_po([self.product])
+        stale = PurchaseOrder.objects.get(pk=po.pk)
+        receive_items(stale, {self.product.id: 3})
+
+        def concurrent_receipt(field, amounts):
+            # another dock's receipt of the same line commits after this one read the rows
+            PurchaseOrderItem.objects.filter(po=po).update(received_quantity=F('received_quantity') + 2)
+            Product.objects.filter(pk=self.product.pk).update(stock_quantity=F('stock_quantity') + 2)
+            return per_row_increment(field, amounts)
+
+        with mock.patch('apps.purchase.services.per_row_increment', side_effect=concurrent_receipt):
+            receive_items(stale, {self.product.id: 4})
+
+        self.assertEqual(PurchaseOrderItem.objects.get(po=po).received_quantity, 9)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock_quantity, 10 + 3 + 2 + 4)
+        self.assertEqual(InventoryTransaction.objects.filter(po=po).count(), 2)
+
+    def test_receive_rejects_quantity_over_ordered(self):
+        po = self._approved_po([self.product], ordered_quantity=2)
+        receive_data = {"items": [{"product": self.product.id, "received_quantity": 1},
+                                  {"product": self.product.id, "received_quantity": 2}]}
+        response = self.client.post(reverse('purchaseorder-receive', args=[po.id]), data=receive_data,
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock_quantity, 10)
+
+    def test_create_large_purchase_order_query_count(self):
+        products = Product.objects.bulk_create([Product(name=f"Line {i}", sku=f"LINE-{i}") for i in range(1000)])
+        po_data = {
+            "supplier": self.supplier.id,
+            "items": [{"product": p.id, "ordered_quantity": 1} for p in products],
+        }
+        fields = [f for f in PurchaseOrderItem._meta.concrete_fields if not f.primary_key]
+        insert_batches = math.ceil(1000 / connection.ops.bulk_batch_size(fields, products))
+
+        # auth (1), supplier, products (warms the name cache), savepoint (2), PO insert, change feed row,
+        # item inserts, items read back, supplier name
+        with self.assertNumQueries(9 + insert_batches):
+            response = self.client.post(reverse('purchaseorder-list'), data=po_data, content_type='application/json')
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(response.json()['items']), 1000)
+        self.assertEqual(response.json()['items'][-1]['product_name'], "Line 999")
+        self.assertEqual(PurchaseOrderItem.objects.count(), 1000)
+
+    def test_create_rejects_unknown_product(self):
+        po_data = {"supplier": self.supplier.id, "items": [{"product": self.product.id, "ordered_quantity": 1},
+                                                           {"product": 999999, "ordered_quantity": 1}]}
+        response = self.client.post(reverse('purchaseorder-list'), data=po_data, content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['items'][0], {})
+        self.assertIn('product', response.json()['items'][1])
+        self.assertEqual(PurchaseOrder.objects.count(), 0)
+
+    def test_create_rejects_product_deleted_behind_the_cache(self):
+        gone = Product.objects.create(name="Gone", sku="GONE-1")
+        product_lookup.get(gone.id)
+        # deleted by another process: this one's caches still list it
+        with connection.cursor() as cursor:
+            cursor.execute('DELETE FROM product_product WHERE id = %s', [gone.id])
+        po_data = {"supplier": self.supplier.id, "items": [{"product": gone.id, "ordered_quantity": 1}]}
+        response = self.client.post(reverse('purchaseorder-list'), data=po_data, content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('product', response.json()['items'][0])
+
+    def test_bulk_create_purchase_orders(self):
+        records = [
+            {"supplier": self.supplier.id, "items": [{"product": self.product.id, "ordered_quantity": 5}]},
+            {"supplier": {"name": "New Supplier", "email": "new@example.com", "phone": "123"},
+             "items": [{"product": self.product.id, "ordered_quantity": 2}]},
+            {"supplier": self.supplier.id, "items": [{"product": 999999, "ordered_quantity": 1}]},
+            {"supplier": self.supplier.id, "items": [{"product": self.product.id, "ordered_quantity": -1}]},
+        ]
+        response = self.client.post(reverse('purchaseorder-bulk'), data=records, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+
+        body = response.json()
+        self.assertEqual((body['created'], body['failed']), (2, 2))
+        self.assertEqual([result['index'] for result in body['results']], [0, 1, 2, 3])
+        self.assertIn('errors', body['results'][2])
+        self.assertIn('errors', body['results'][3])
+        new_po = PurchaseOrder.objects.get(pk=body['results'][1]['id'])
+        self.assertEqual(new_po.supplier.name, "New Supplier")
+        self.assertEqual(new_po.created_by, self.manager)
+        self.assertEqual(PurchaseOrderItem.objects.count(), 2)
+
+    def test_bulk_create_from_ndjson_in_chunks(self):
+        record = {"supplier": self.supplier.id, "items": [{"product": self.product.id, "ordered_quantity": 1}]}
+        body = "\n".join(json.dumps(record) for _ in range(1200))
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post(reverse('purchaseorder-bulk'), data=body, content_type='application/x-ndjson')
+        self.assertEqual(response.status_code, 200)
+        # a handful of statements per chunk of 500, never one per record
+        self.assertLess(len(ctx.captured_queries), 50)
+        self.assertEqual(response.json()['created'], 1200)
+        self.assertEqual(PurchaseOrder.objects.count(), 1200)
+
+    def test_bulk_create_reports_malformed_ndjson_line(self):
+        record = json.dumps({"supplier": self.supplier.id, "items": []})
+        response = self.client.post(reverse('purchaseorder-bulk'), data=f"{record}\n{{broken\n",
+                                    content_type='application/x-ndjson')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['created'], 1)
+        self.assertIn('line 2', str(response.json()['results'][1]['errors']))
+
+    def _populate_pos(self, count, lines=3):
+        products = Product.objects.bulk_create([
+            Product(name=f"Line {i}", sku=f"LINE-{Product.objects.count()}-{i}") for i in range(lines)
+        ])
+        for _ in range(count):
+            self._approved_po(products, supplier=Supplier.objects.create(name="Supplier"))
+
+    def test_list_query_budget(self):
+        self.assertQueryBudget(reverse('purchaseorder-list'), self._populate_pos)
+        self.assertQueryBudget(reverse('purchaseorder-list') + '?status=approved', self._populate_pos)
+
+    def test_retrieve_query_count_independent_of_lines(self):
+        small = self._approved_po([self.product])
+        large = self._approved_po(Product.objects.bulk_create([
+            Product(name=f"Line {i}", sku=f"LINE-{i}") for i in range(30)
+        ]))
+        small_count, _ = self.count_queries(reverse('purchaseorder-detail', args=[small.id]))
+        self.clear_caches()
+        large_count, response = self.count_queries(reverse('purchaseorder-detail', args=[large.id]))
+        self.assertEqual(small_count, large_count)
+        self.assertEqual(response.json()['items'][0]['product_name'], "Line 0")
+        self.assertEqual(response.json()['supplier_name'], "Test Supplier")
+
+    def test_list_serves_names_from_the_lookup_cache(self):
+        self._populate_pos(12)
+        url = reverse('purchaseorder-list')
+        self.clear_caches()
+        get_user_authz(self.manager)
+        cold, _ = self.count_queries(url)
+        warm, _ = self.count_queries(url)
+        # the supplier and product name lookups for the page are one batch each
+        self.assertEqual(cold - warm, 2)
+
+        supplier = PurchaseOrder.objects.order_by('id').first().supplier
+        self.manager.user_permissions.add(Permission.objects.get(codename='change_supplier'))
+        response = self.client.patch(reverse('supplier-detail', args=[supplier.id]), data={"name": "Renamed"},
+                                     content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.client.get(url).json()['results'][0]['supplier_name'], "Renamed")
+
+    def test_updated_at_moves_on_every_write_path(self):
+        po = self._approved_po([self.product])
+        stamps = [PurchaseOrder.objects.values_list('updated_at', flat=True).get(pk=po.pk)]
+
+        receive_items(po, {self.product.id: 2})  # save(update_fields=['status'])
+        stamps.append(PurchaseOrder.objects.values_list('updated_at', flat=True).get(pk=po.pk))
+        PurchaseOrder.objects.filter(pk=po.pk).update(status='completed')
+        stamps.append(PurchaseOrder.objects.values_list('updated_at', flat=True).get(pk=po.pk))
+        self.assertEqual(stamps, sorted(set(stamps)))
+
+        product_stamp = Product.objects.values_list('updated_at', flat=True).get(pk=self.product.pk)
+        post_movements('ADJUSTMENT', {self.product.id: 1})
+        self.assertGreater(Product.objects.values_list('updated_at', flat=True).get(pk=self.product.pk), product_stamp)
+
+    def test_conditional_get_answers_304_without_serializing(self):
+        po = self._approved_po([self.product])
+        for url in (reverse('purchaseorder-list') + '?status=approved', reverse('purchaseorder-detail', args=[po.id])):
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+
+            with mock.patch.object(PurchaseOrderSerializer, 'to_representation') as serialize:
+                with self.assertNumQueries(2):  # authentication, validators
+                    cached = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+            self.assertEqual(cached.status_code, 304)
+            self.assertEqual(cached['ETag'], response['ETag'])
+            serialize.assert_not_called()
+
+        list_etag = self.client.get(reverse('purchaseorder-list'))['ETag']
+        detail_etag = self.client.get(reverse('purchaseorder-detail', args=[po.id]))['ETag']
+        receive_items(po, {self.product.id: 1})
+        for url, etag in ((reverse('purchaseorder-list'), list_etag),
+                          (reverse('purchaseorder-detail', args=[po.id]), detail_etag)):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 200)
+            self.assertNotEqual(response['ETag'], etag)
+
+    def test_lists_are_revalidated_by_etag_only(self):
+        older, newest = self._approved_po([self.product]), self._approved_po([self.product])
+        url = reverse('purchaseorder-list')
+        response = self.client.get(url)
+        self.assertNotIn('Last-Modified', response)
+        self.assertIn('Last-Modified', self.client.get(reverse('purchaseorder-detail', args=[newest.id])))
+
+        # MAX(updated_at) stays put when a row other than the newest is deleted
+        since = http_date(newest.updated_at.timestamp() + 1)
+        older.delete()
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=since)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['count'], 1)
+
+    def test_deleting_a_product_revalidates_the_pos_listing_it(self):
+        other = Product.objects.create(name="Gadget", sku="G-1")
+        po = self._approved_po([self.product, other])
+        url = reverse('purchaseorder-list')
+        etag = self.client.get(url)['ETag']
+        since = Change.objects.order_by('-pk').values_list('pk', flat=True).first()
+
+        other.delete()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['results'][0]['items']), 1)
+        self.assertTrue(Change.objects.filter(pk__gt=since, model='purchase.purchaseorder', object_id=po.pk).exists())
+
+    def test_renaming_what_a_po_shows_revalidates_it(self):
+        po = self._approved_po([self.product])
+        PurchaseOrder.objects.filter(pk=po.pk).update(created_by=self.manager)
+        url = reverse('purchaseorder-detail', args=[po.id])
+
+        def rename_supplier(name):
+            supplier = Supplier.objects.get(pk=self.supplier.pk)
+            supplier.name = name
+            supplier.save()
+
+        def rename_product(name):
+            product = Product.objects.get(pk=self.product.pk)
+            product.name = name
+            product.save()
+
+        def rename_user(name):
+            self.manager.username = name
+            self.manager.save()
+
+        def import_supplier(name):
+            upsert_suppliers([{'id': self.supplier.id, 'name': name, 'email': 'acme@example.com', 'phone': '1'}])
+            supplier_lookup.invalidate_all()
+
+        for rename, shown in ((rename_supplier, lambda body: body['supplier_name']),
+                              (rename_product, lambda body: body['items'][0]['product_name']),
+                              (rename_user, lambda body: body['created_by_name']),
+                              (import_supplier, lambda body: body['supplier_name'])):
+            etag = self.client.get(url)['ETag']
+            rename(f"Renamed by {rename.__name__}")
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 200, rename.__name__)
+            self.assertEqual(shown(response.json()), f"Renamed by {rename.__name__}")
+
+        # other edits leave the PO alone
+        etag = self.client.get(url)['ETag']
+        supplier = Supplier.objects.get(pk=self.supplier.pk)
+        supplier.phone = "555"
+        supplier.save()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+    def test_create_rejects_duplicate_product_lines(self):
+        self.po_data["items"].append({"product": self.product.id, "ordered_quantity": 1})
+        response = self.client.post(reverse('purchaseorder-list'), data=self.po_data, content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['items'][0], {})
+        self.assertIn('product', response.json()['items'][1])
+
+    def _render_dashboard(self, url=None):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url or reverse('dashboard'))
+            content = b''.join(response.streaming_content).decode()
+        return len(ctx.captured_queries), content
+
+    def test_dashboard_streams_with_constant_queries(self):
+        self._populate_pos(2)
+        small_count, _ = self._render_dashboard()
+        self._populate_pos(20)
+        PurchaseOrder.objects.filter(pk__in=PurchaseOrder.objects.order_by('id').values('pk')[:5]).update(
+            status='completed')
+        cache.clear()
+        large_count, content = self._render_dashboard()
+
+        self.assertEqual(small_count, large_count)
+        self.assertIn('approved: 17', content)
+        self.assertIn('completed: 5', content)
+        self.assertEqual(content.count('<tr id="po-'), 17)
+
+    @mock.patch.object(PurchaseOrderListView, 'paginate_by', 2)
+    def test_dashboard_pages_open_pos(self):
+        self._populate_pos(5)
+        ids = list(PurchaseOrder.objects.order_by('id').values_list('id', flat=True))
+
+        _, first = self._render_dashboard()
+        self.assertIn(f'href="?after={ids[1]}"', first)
+
+        _, last = self._render_dashboard(reverse('dashboard') + f'?after={ids[3]}')
+        self.assertEqual(last.count('<tr id="po-'), 1)
+        self.assertNotIn('Next page', last)
+
+    def _export(self, url, **params):
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        return response, b''.join(response.streaming_content).decode()
+
+    def test_export_streams_po_lines_as_csv(self):
+        po = self._approved_po([self.product, Product.objects.create(name="Other", sku="OTHER")])
+        empty = PurchaseOrder.objects.create(supplier=self.supplier, created_by=self.manager)
+
+        response, content = self._export(reverse('purchaseorder-export'))
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        rows = list(csv.DictReader(StringIO(content)))
+        self.assertEqual([row['po_id'] for row in rows], [str(po.id), str(po.id), str(empty.id)])
+        self.assertEqual(rows[1]['product_sku'], "OTHER")
+        self.assertEqual(rows[2]['item_id'], "")
+
+    def test_export_ndjson_honours_filters(self):
+        old = self._approved_po([self.product])
+        PurchaseOrder.objects.filter(pk=old.pk).update(created_at=datetime(2025, 1, 1, tzinfo=dt_timezone.utc))
+        recent = self._approved_po([self.product])
+        PurchaseOrder.objects.create(supplier=self.supplier, created_by=self.manager)
+
+        response, content = self._export(reverse('purchaseorder-export'), format='ndjson',
+                                         status='approved', created_at_after='2026-01-01')
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        records = [json.loads(line) for line in content.splitlines()]
+        self.assertEqual([record['po_id'] for record in records], [recent.id])
+        self.assertEqual(records[0]['ordered_quantity'], 10)
+
+        response = self.client.get(reverse('purchaseorder-export'), {'created_at_before': 'yesterday'})
+        self.assertEqual(response.status_code, 400)
+
+
+class StatusEventStreamTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        manager_group, _ = Group.objects.get_or_create(name="Manager")
+        manager_group.permissions.add(*Permission.objects.filter(content_type__app_label='purchase'))
+        user = User.objects.create_user(username='manager', password='testpass')
+        user.groups.add(manager_group)
+        self.token = str(RefreshToken.for_user(user).access_token)
+        self.client = Client(HTTP_AUTHORIZATION=f'Bearer {self.token}')
+
+        self.product = Product.objects.create(name="Widget", sku="W-1", stock_quantity=0)
+        self.po = PurchaseOrder.objects.create(supplier=Supplier.objects.create(name="Acme"), status='pending')
+        PurchaseOrderItem.objects.create(po=self.po, product=self.product, ordered_quantity=10)
+
+    def open_stream(self, app=purchase_order_events, query_string=b'', headers=()):
+        sent = asyncio.Queue()
+        disconnect = asyncio.Event()
+
+        async def receive():
+            await disconnect.wait()
+            return {'type': 'http.disconnect'}
+
+        scope = {'type': 'http', 'method': 'GET', 'path': '/api/purchase/events/',
+                 'query_string': query_string, 'headers': list(headers)}
+        task = asyncio.ensure_future(app(scope, receive, sent.put))
+        return sent, disconnect, task
+
+    async def next_message(self, sent):
+        return await asyncio.wait_for(sent.get(), 5)
+
+    def post(self, path, data=None):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(path, data, content_type='application/json')
+
+    async def test_pushes_status_transitions_to_open_streams(self):
+        sent, disconnect, task = self.open_stream(query_string=f'access_token={self.token}'.encode())
+        start = await self.next_message(sent)
+        self.assertEqual(start['status'], 200)
+        self.assertIn((b'content-type', b'text/event-stream'), start['headers'])
+        self.assertEqual((await self.next_message(sent))['body'], b'retry: 5000\n\n')
+
+        response = await sync_to_async(self.post)(reverse('purchaseorder-approve', args=[self.po.id]))
+        self.assertEqual(response.status_code, 200)
+        event = (await self.next_message(sent))['body'].decode()
+        self.assertTrue(event.startswith('event: status\ndata: '))
+        self.assertEqual(json.loads(event.split('data: ', 1)[1]),
+                         {'id': self.po.id, 'status': 'approved', 'previous': 'pending'})
+
+        await sync_to_async(self.post)(reverse('purchaseorder-receive', args=[self.po.id]),
+                                       {'items': [{'product': self.product.id, 'received_quantity': 4}]})
+        event = (await self.next_message(sent))['body'].decode()
+        self.assertIn('"status": "partially_delivered", "previous": "approved"', event)
+
+        self.assertEqual(event_hub.subscriber_count(PURCHASE_ORDER_CHANNEL), 1)
+        disconnect.set()
+        await asyncio.wait_for(task, 5)
+        self.assertEqual(event_hub.subscriber_count(PURCHASE_ORDER_CHANNEL), 0)
+
+    async def test_idle_streams_get_keepalives(self):
+        app = EventStream(PURCHASE_ORDER_CHANNEL, keepalive=0.01)
+        sent, disconnect, task = self.open_stream(app, headers=[(b'authorization', f'Bearer {self.token}'.encode())])
+        await self.next_message(sent)
+        await self.next_message(sent)
+        self.assertEqual((await self.next_message(sent))['body'], b': keepalive\n\n')
+        disconnect.set()
+        await asyncio.wait_for(task, 5)
+
+    async def test_rejects_missing_or_invalid_tokens(self):
+        for query_string in (b'', b'access_token=not-a-token'):
+            sent, _, task = self.open_stream(query_string=query_string)
+            await asyncio.wait_for(task, 5)
+            self.assertEqual((await self.next_message(sent))['status'], 401)
+            self.assertIn('detail', json.loads((await self.next_message(sent))['body']))
+        self.assertEqual(event_hub.subscriber_count(PURCHASE_ORDER_CHANNEL), 0)
+
+
+class AsyncReadViewTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        user = User.objects.create_user(username='reader', password='testpass')
+        self.auth = {'HTTP_AUTHORIZATION': f'Bearer {RefreshToken.for_user(user).access_token}'}
+        self.client = Client(**self.auth)
+        supplier = Supplier.objects.create(name="Acme")
+        products = [Product.objects.create(name=f"Widget {i}", sku=f"W-{i}", preferred_supplier=supplier)
+                    for i in range(3)]
+        for i in range(25):
+            po = PurchaseOrder.objects.create(supplier=supplier, status='approved' if i % 2 else 'pending')
+            for product in products[:i % 3 + 1]:
+                PurchaseOrderItem.objects.create(po=po, product=product, ordered_quantity=5)
+        self.po = po
+
+    def assertSameResponse(self, sync_url, async_url, **params):
+        expected = self.client.get(sync_url, params)
+        response = self.client.get(async_url, params)
+        self.assertEqual(response.status_code, expected.status_code)
+        # pagination links point back at the endpoint that served the page
+        self.assertEqual(response.content.decode().replace(async_url, sync_url), expected.content.decode())
+        if expected.status_code == 200:
+            # same validators apart from the path, which is part of the fingerprint
+            self.assertTrue(response.has_header('ETag'))
+            self.assertEqual(response.get('Last-Modified'), expected.get('Last-Modified'))
+        return response
+
+    def test_async_endpoints_match_the_sync_ones(self):
+        for basename in ('supplier', 'product', 'purchaseorder'):
+            sync_list, async_list = reverse(f'{basename}-list'), reverse(f'{basename}-async-list')
+            for params in ({}, {'page': 2}, {'pagination': 'cursor'}, {'count': 'approximate'}):
+                self.assertSameResponse(sync_list, async_list, **params)
+        self.assertSameResponse(reverse('purchaseorder-list'), reverse('purchaseorder-async-list'), status='approved')
+        self.assertSameResponse(reverse('purchaseorder-detail', args=[self.po.id]),
+                                reverse('purchaseorder-async-detail', args=[self.po.id]))
+
+    def test_errors_match_the_sync_ones(self):
+        for params in ({'page': 9}, {'status': 'bogus'}):
+            response = self.client.get(reverse('purchaseorder-async-list'), params)
+            self.assertEqual(response.status_code, self.client.get(reverse('purchaseorder-list'), params).status_code)
+        self.assertEqual(self.client.get(reverse('purchaseorder-async-detail', args=[0])).status_code, 404)
+        self.assertEqual(Client().get(reverse('purchaseorder-async-list')).status_code, 401)
+        self.assertEqual(self.client.post(reverse('purchaseorder-async-list')).status_code, 405)
+
+    async def test_conditional_get_under_asgi(self):
+        url = reverse('purchaseorder-async-detail', args=[self.po.id])
+        response = await self.async_client.get(url, headers={'Authorization': self.auth['HTTP_AUTHORIZATION']})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['id'], self.po.id)
+        revalidated = await self.async_client.get(url, headers={'Authorization': self.auth['HTTP_AUTHORIZATION'],
+                                                                'If-None-Match': response['ETag']})
+        self.assertEqual(revalidated.status_code, 304)
+
+
+class FastListTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        user = User.objects.create_user(username='reader', password='testpass')
+        self.client = Client(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(user).access_token}')
+        suppliers = [Supplier.objects.create(name="Acme \u2028 Ltd", email="a@example.com"),
+                     Supplier.objects.create(name="B\u00e9ta")]
+        products = [Product.objects.create(name=f"Widget {i}", sku=f"W-{i}", stock_quantity=i,
+                                           preferred_supplier=suppliers[i % 2] if i % 3 else None)
+                    for i in range(4)]
+        for i in range(30):
+            # some POs without creator or lines
+            po = PurchaseOrder.objects.create(supplier=suppliers[i % 2], status=['pending', 'approved'][i % 2],
+                                              created_by=user if i % 3 else None)
+            for product in products[:i % 4]:
+                PurchaseOrderItem.objects.create(po=po, product=product, ordered_quantity=i + 1,
+                                                 received_quantity=i % 2)
+
+    def test_fast_lists_are_byte_identical(self):
+        for viewset, basename in ((PurchaseOrderViewSet, 'purchaseorder'), (ProductViewSet, 'product'),
+                                  (SupplierViewSet, 'supplier')):
+            for params in ({}, {'page': 2}, {'pagination': 'cursor'}, {'format': 'json'}):
+                url = reverse(f'{basename}-list')
+                fast = self.client.get(url, params)
+                with mock.patch.object(viewset, 'fast_list', False):
+                    expected = self.client.get(url, params)
+                self.assertEqual(fast.status_code, expected.status_code)
+                self.assertEqual(fast.content, expected.content, (basename, params))
+                self.assertEqual(fast.get('ETag'), expected.get('ETag'))
+        self.assertEqual(len(self.client.get(reverse('purchaseorder-list'), {'status': 'approved'}).json()['results']),
+                         15)
+
+
+class ApiBenchmarkTests(TestCase):
+
+    def _benchmark(self, **options):
+        out = StringIO()
+        call_command('benchmark_api', '--in-place', sizes='30', requests=2, threshold=1000,
+                     stdout=out, stderr=StringIO(), **options)
+        return out.getvalue()
+
+    def _rewrite(self, path, **values):
+        with open(path) as handle:
+            baseline = json.load(handle)
+        for row in baseline['results']['30'].values():
+            row.update(values)
+        with open(path, 'w') as handle:
+            json.dump(baseline, handle)
+
+    def test_reports_every_operation_and_compares_with_a_baseline(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'baseline.json')
+            output = self._benchmark(save_baseline=path)
+            for operation in ('create', 'list', 'filter_status', 'approve', 'receive', 'dashboard'):
+                self.assertIn(operation, output)
+
+            self._rewrite(path, queries=1000)
+            self.assertIn('No regressions', self._benchmark(baseline=path))
+
+            # every operation now issues more queries than the baseline
+            self._rewrite(path, queries=0)
+            with self.assertRaisesMessage(CommandError, '6 regression(s)'):
+                self._benchmark(baseline=path)
+
+
+class ReportTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        user = User.objects.create_user(username='analyst', password='testpass')
+        self.client = Client(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(user).access_token}')
+        self.acme = Supplier.objects.create(name="Acme")
+        self.globex = Supplier.objects.create(name="Globex")
+        self.widget = Product.objects.create(name="Widget", sku="W-1")
+        self.gadget = Product.objects.create(name="Gadget", sku="G-1")
+
+        # Acme: one PO completed 4 days after creation in January, one half-received in February
+        self.completed = self._po(self.acme, 'approved', datetime(2026, 1, 10, tzinfo=dt_timezone.utc), 10, 10)
+        receive_items(self.completed, {self.widget.id: 10, self.gadget.id: 10})
+        InventoryTransaction.objects.filter(po=self.completed).update(date=datetime(2026, 1, 14, tzinfo=dt_timezone.utc))
+        self._po(self.acme, 'partially_delivered', datetime(2026, 2, 3, tzinfo=dt_timezone.utc), 20, 5, received=10)
+        # Globex: one pending PO in February
+        self._po(self.globex, 'pending', datetime(2026, 2, 20, tzinfo=dt_timezone.utc), 8, 2)
+
+    def _po(self, supplier, status, created_at, widgets, gadgets, received=0):
+        po = PurchaseOrder.objects.create(supplier=supplier, status=status)
+        PurchaseOrderItem.objects.create(po=po, product=self.widget, ordered_quantity=widgets, received_quantity=received)
+        PurchaseOrderItem.objects.create(po=po, product=self.gadget, ordered_quantity=gadgets)
+        PurchaseOrder.objects.filter(pk=po.pk).update(created_at=created_at)
+        return PurchaseOrder.objects.get(pk=po.pk)
+
+    def _report(self, name, **params):
+        response = self.client.get(reverse(f'report-{name}'), params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()['results']
+
+    def test_supplier_report(self):
+        acme, globex = self._report('suppliers')
+        self.assertEqual(acme, {
+            'supplier': self.acme.id, 'supplier_name': 'Acme', 'po_count': 2, 'open_po_count': 1,
+            'completed_po_count': 1, 'ordered_quantity': 45, 'received_quantity': 30, 'open_quantity': 15,
+            'fill_rate': 0.6667, 'avg_lead_time_days': 4.0,
+        })
+        self.assertEqual((globex['po_count'], globex['fill_rate'], globex['avg_lead_time_days']), (1, 0.0, None))
+
+        filtered = self._report('suppliers', status='partially_delivered', created_at_after='2026-02-01')
+        self.assertEqual([(row['supplier'], row['open_quantity']) for row in filtered], [(self.acme.id, 15)])
+
+    def test_volume_report_buckets_by_period(self):
+        months = self._report('volume')
+        self.assertEqual([(row['period'], row['po_count'], row['ordered_quantity']) for row in months],
+                         [('2026-01-01', 1, 20), ('2026-02-01', 2, 35)])
+
+        by_supplier = self._report('volume', bucket='year', group_by='supplier')
+        self.assertEqual([(row['period'], row['supplier_name'], row['open_quantity']) for row in by_supplier],
+                         [('2026-01-01', 'Acme', 15), ('2026-01-01', 'Globex', 10)])
+
+        for params in ({'bucket': 'decade'}, {'group_by': 'product'}, {'status': 'lost'},
+                       {'created_at_after': 'yesterday'}):
+            self.assertEqual(self.client.get(reverse('report-volume'), params).status_code, 400)
+
+    def test_reports_are_cached_until_they_expire(self):
+        first = self.client.get(reverse('report-suppliers')).json()
+        self._po(self.globex, 'pending', datetime(2026, 3, 1, tzinfo=dt_timezone.utc), 1, 1)
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(self.client.get(reverse('report-suppliers')).json(), first)
+        self.assertFalse(any('purchase_purchaseorder' in query['sql'] for query in ctx.captured_queries))
+
+        cache.clear()
+        globex = self._report('suppliers')[1]
+        self.assertEqual(globex['po_count'], 2)
+
+
+class ReceiptRollupTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        user = User.objects.create_user(username='clerk', password='testpass')
+        self.client = Client(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(user).access_token}')
+        self.supplier = Supplier.objects.create(name="Acme")
+        self.widget = Product.objects.create(name="Widget", sku="W-1")
+        self.gadget = Product.objects.create(name="Gadget", sku="G-1")
+
+    def _po(self):
+        po = PurchaseOrder.objects.create(supplier=self.supplier, status='approved')
+        PurchaseOrderItem.objects.create(po=po, product=self.widget, ordered_quantity=10)
+        PurchaseOrderItem.objects.create(po=po, product=self.gadget, ordered_quantity=10)
+        return po
+
+    def _rollups(self):
+        return (
+            sorted(DailyProductReceipts.objects.values_list('product_id', 'day', 'received_quantity', 'receipt_count')),
+            sorted(DailySupplierReceipts.objects.values_list('supplier_id', 'day', 'received_quantity', 'receipt_count')),
+        )
+
+    def test_receiving_adds_to_the_daily_rollups(self):
+        today = timezone.localdate()
+        po = self._po()
+        receive_items(po, {self.widget.id: 3, self.gadget.id: 1})
+        receive_items(po, {self.widget.id: 4})
+        receive_items(self._po(), {self.gadget.id: 5})
+
+        products, suppliers = self._rollups()
+        self.assertEqual(products, sorted([(self.widget.id, today, 7, 2), (self.gadget.id, today, 6, 2)]))
+        self.assertEqual(suppliers, [(self.supplier.id, today, 13, 4)])
+
+    def test_receiving_a_po_with_thousands_of_lines(self):
+        products = Product.objects.bulk_create([Product(name=f"Part {i}", sku=f"PART-{i}") for i in range(1200)])
+        po = PurchaseOrder.objects.create(supplier=self.supplier, status='approved')
+        PurchaseOrderItem.objects.bulk_create([
+            PurchaseOrderItem(po=po, product=product, ordered_quantity=2) for product in products
+        ])
+        receive_items(po, {product.id: 1 for product in products})
+
+        self.assertEqual(DailyProductReceipts.objects.filter(received_quantity=1, receipt_count=1).count(), 1200)
+        self.assertEqual(self._rollups()[1], [(self.supplier.id, timezone.localdate(), 1200, 1200)])
+
+    def test_rebuild_matches_the_incremental_rollups(self):
+        po = self._po()
+        receive_items(po, {self.widget.id: 3, self.gadget.id: 2})
+        # a receipt two days earlier, written around receive_items as seeding or imports do
+        receipt = post_movements('RECEIVED_PO', {self.widget.id: 4}, po=po)[0]
+        InventoryTransaction.objects.filter(pk=receipt.pk).update(date=timezone.now() - timedelta(days=2))
+        products, suppliers = self._rollups()
+
+        chunks = list(rebuild_rollups(chunk_days=1))
+        self.assertEqual(len(chunks), 3)
+        self.assertNotEqual(self._rollups(), (products, suppliers))
+        self.assertEqual(sum(row[2] for row in self._rollups()[1]), 9)
+
+        DailyProductReceipts.objects.all().delete()
+        DailySupplierReceipts.objects.all().delete()
+        out = StringIO()
+        call_command('rebuild_rollups', stdout=out)
+        self.assertIn('Rebuilt 5 daily rollup rows', out.getvalue())
+        rebuilt = self._rollups()
+        for _ in rebuild_rollups():
+            pass
+        self.assertEqual(self._rollups(), rebuilt)
+
+    def test_receipt_series_read_the_rollups(self):
+        receive_items(self._po(), {self.widget.id: 3, self.gadget.id: 2})
+        today = timezone.localdate().isoformat()
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('report-receipts'))
+        self.assertEqual(response.json()['results'], [
+            {'period': today, 'supplier': self.supplier.id, 'received_quantity': 5, 'receipt_count': 2},
+        ])
+        self.assertFalse(any('purchase_inventorytransaction' in query['sql'] for query in ctx.captured_queries))
+
+        response = self.client.get(reverse('report-receipts'), {'product': self.widget.id, 'bucket': 'year'})
+        self.assertEqual([(row['product'], row['received_quantity']) for row in response.json()['results']],
+                         [(self.widget.id, 3)])
+        response = self.client.get(reverse('report-receipts'), {'day_before': today})
+        self.assertEqual(response.json()['results'], [])
+        for params in ({'product': 'x'}, {'product': 1, 'supplier': 1}, {'bucket': 'hour'}):
+            self.assertEqual(self.client.get(reverse('report-receipts'), params).status_code, 400)
+
+
+class IdempotencyKeyTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        manager_group, _ = Group.objects.get_or_create(name="Manager")
+        manager_group.permissions.add(*Permission.objects.filter(content_type__app_label='purchase'))
+        self.manager = User.objects.create_user(username='manager', password='testpass')
+        self.manager.groups.add(manager_group)
+        self.client = Client(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(self.manager).access_token}')
+        self.supplier = Supplier.objects.create(name="Acme")
+        self.product = Product.objects.create(name="Widget", sku="W-1", stock_quantity=10)
+
+    def _approved_po(self):
+        po = PurchaseOrder.objects.create(supplier=self.supplier, status='approved')
+        PurchaseOrderItem.objects.create(po=po, product=self.product, ordered_quantity=10)
+        return po
+
+    def _receive(self, po, quantity, key):
+        return self.client.post(reverse('purchaseorder-receive', args=[po.id]), {
+            'items': [{'product': self.product.id, 'received_quantity': quantity}],
+        }, content_type='application/json', headers={'Idempotency-Key': key})
+
+    def test_retried_receive_is_replayed_without_touching_stock(self):
+        po = self._approved_po()
+        first = self._receive(po, 4, 'scan-1')
+        self.assertEqual(first.status_code, 200)
+
+        with CaptureQueriesContext(connection) as ctx:
+            retry = self._receive(po, 4, 'scan-1')
+        self.assertEqual(retry.status_code, 200)
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(retry.json(), first.json())
+        tables = ' '.join(query['sql'] for query in ctx.captured_queries)
+        self.assertNotIn('product_product', tables)
+        self.assertNotIn('purchase_purchaseorderitem', tables)
+
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock_quantity, 14)
+        self.assertEqual(InventoryTransaction.objects.filter(po=po).count(), 1)
+
+        # a new key is a new receipt
+        self.assertEqual(self._receive(po, 2, 'scan-2').status_code, 200)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock_quantity, 16)
+
+    def test_retried_create_and_approve_apply_once(self):
+        data = {'supplier': self.supplier.id, 'items': [{'product': self.product.id, 'ordered_quantity': 5}]}
+        url = reverse('purchaseorder-list')
+        first = self.client.post(url, data, content_type='application/json', headers={'Idempotency-Key': 'po-1'})
+        retry = self.client.post(url, data, content_type='application/json', headers={'Idempotency-Key': 'po-1'})
+        self.assertEqual((first.status_code, retry.status_code), (201, 201))
+        self.assertEqual(retry.json(), first.json())
+        self.assertEqual(PurchaseOrder.objects.count(), 1)
+
+        approve = reverse('purchaseorder-approve', args=[first.json()['id']])
+        responses = [self.client.post(approve, headers={'Idempotency-Key': 'approve-1'}) for _ in range(2)]
+        self.assertEqual([response.status_code for response in responses], [200, 200])
+        self.assertEqual(responses[1]['Idempotent-Replayed'], 'true')
+        # without a key the transition is checked again
+        self.assertEqual(self.client.post(approve).status_code, 400)
+
+    def test_keys_are_scoped_per_user_and_request(self):
+        po = self._approved_po()
+        self.assertEqual(self._receive(po, 4, 'scan-1').status_code, 200)
+        response = self._receive(po, 5, 'scan-1')
+        self.assertEqual(response.status_code, 422)
+
+        clerk = User.objects.create_user(username='clerk', password='testpass')
+        clerk.user_permissions.add(*Permission.objects.filter(content_type__app_label='purchase'))
+        self.client = Client(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(clerk).access_token}')
+        self.assertEqual(self._receive(po, 5, 'scan-1').status_code, 200)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock_quantity, 19)
+
+        self.assertEqual(self._receive(po, 1, 'k' * 256).status_code, 400)
+
+    def test_errors_release_the_key(self):
+        po = PurchaseOrder.objects.create(supplier=self.supplier, status='pending')
+        PurchaseOrderItem.objects.create(po=po, product=self.product, ordered_quantity=10)
+        self.assertEqual(self._receive(po, 4, 'scan-1').status_code, 400)
+        self.assertEqual(self._receive(po, 40, 'scan-1').status_code, 400)
+        self.assertFalse(IdempotencyKey.objects.exists())
+
+        po.status = 'approved'
+        po.save()
+        self.assertEqual(self._receive(po, 4, 'scan-1').status_code, 200)
+        self.assertEqual(IdempotencyKey.objects.get().status_code, 200)
+
+    def test_in_progress_stale_and_expired_keys(self):
+        po = self._approved_po()
+        now = timezone.now()
+        with mock.patch('apps.helpers.idempotency.request_fingerprint', return_value='fingerprint'):
+            record = IdempotencyKey.objects.create(user=self.manager, key='scan-1', fingerprint='fingerprint',
+                                                   expires_at=now + timedelta(hours=1))
+            self.assertEqual(self._receive(po, 4, 'scan-1').status_code, 409)
+
+            # an old claim whose row lock is held belongs to a request that is only slow
+            IdempotencyKey.objects.filter(pk=record.pk).update(created_at=now - timedelta(minutes=5))
+            with mock.patch('apps.helpers.idempotency.lock_key', return_value=False):
+                self.assertEqual(self._receive(po, 4, 'scan-1').status_code, 409)
+            self.assertTrue(IdempotencyKey.objects.filter(pk=record.pk, status_code__isnull=True).exists())
+
+            # the first attempt died without committing: its key is taken over
+            self.assertEqual(self._receive(po, 4, 'scan-1').status_code, 200)
+
+            IdempotencyKey.objects.update(expires_at=now - timedelta(seconds=1))
+            self.assertNotIn('Idempotent-Replayed', self._receive(po, 4, 'scan-1'))
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock_quantity, 18)
+
+        IdempotencyKey.objects.update(expires_at=now - timedelta(seconds=1))
+        out = StringIO()
+        call_command('prune_idempotency_keys', stdout=out)
+        self.assertIn('Pruned 1 expired idempotency keys', out.getvalue())
+        self.assertFalse(IdempotencyKey.objects.exists())
+
+
+@skipUnless(connection.features.has_select_for_update, "Requires row-level locking")
+class ConcurrentReceiveTests(TransactionTestCase):
+
+    def test_parallel_receives_do_not_lose_increments(self):
+        supplier = Supplier.objects.create(name="Test Supplier")
+        product = Product.objects.create(name="Test Product", stock_quantity=0)
+        pos = []
+        for _ in range(8):
+            po = PurchaseOrder.objects.create(supplier=supplier, status='approved')
+            PurchaseOrderItem.objects.create(po=po, product=product, ordered_quantity=5)
+            pos.append(po)
+
+        barrier = threading.Barrier(len(pos))
+
+        def worker(po):
+            try:
+                barrier.wait()
+                receive_items(po, {product.id: 5})
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker, args=(po,)) for po in pos]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        product.refresh_from_db()
+        self.assertEqual(product.stock_quantity, 40)
+        self.assertEqual(InventoryTransaction.objects.filter(product=product).count(), 8)
+
+
+@skipUnless(connection.features.has_select_for_update_nowait, "Requires NOWAIT row locks")
+class ConcurrentIdempotencyKeyTests(TransactionTestCase):
+
+    def test_slow_request_keeps_its_key(self):
+        user = User.objects.create_user(username='clerk', password='testpass')
+        user.user_permissions.add(*Permission.objects.filter(content_type__app_label='purchase'))
+        auth = f'Bearer {RefreshToken.for_user(user).access_token}'
+        product = Product.objects.create(name="Widget", sku="W-1", stock_quantity=0)
+        po = PurchaseOrder.objects.create(supplier=Supplier.objects.create(name="Acme"), status='approved')
+        PurchaseOrderItem.objects.create(po=po, product=product, ordered_quantity=10)
+        url = reverse('purchaseorder-receive', args=[po.id])
+        data = {'items': [{'product': product.id, 'received_quantity': 4}]}
+        started, release, responses = threading.Event(), threading.Event(), []
+
+        def slow_receive(*args):
+            started.set()
+            release.wait(10)
+            return receive_items(*args)
+
+        def first():
+            try:
+                responses.append(Client(HTTP_AUTHORIZATION=auth).post(
+                    url, data, content_type='application/json', headers={'Idempotency-Key': 'scan-1'}))
+            finally:
+                connection.close()
+
+        # every claim in progress is probed, but the first request's is still running
+        with mock.patch('apps.purchase.views.receive_items', slow_receive), \
+                mock.patch('apps.helpers.idempotency.IDEMPOTENCY_LOCK_SECONDS', 0):
+            thread = threading.Thread(target=first)
+            thread.start()
+            self.assertTrue(started.wait(10))
+            retry = Client(HTTP_AUTHORIZATION=auth).post(url, data, content_type='application/json',
+                                                         headers={'Idempotency-Key': 'scan-1'})
+            release.set()
+            thread.join()
+
+        self.assertEqual((retry.status_code, responses[0].status_code), (409, 200))
+        product.refresh_from_db()
+        self.assertEqual(product.stock_quantity, 4)
+        self.assertEqual(InventoryTransaction.objects.filter(po=po).count(), 1)
+
+
+class InventoryLedgerTests(TestCase):
+
+    def setUp(self):
+        self.client = Client()
+        self.user = User.objects.create_user(username='clerk', password='testpass')
+        self.user.user_permissions.add(Permission.objects.get(codename='add_inventorytransaction'))
+        self.client.defaults['HTTP_AUTHORIZATION'] = f'Bearer {RefreshToken.for_user(self.user).access_token}'
+        self.product = Product.objects.create(name="Widget", sku="W-1", stock_quantity=0, reorder_threshold=5)
+
+    def _post(self, quantity, day, transaction_type='ADJUSTMENT'):
+        (entry,) = post_movements(transaction_type, {self.product.id: quantity})
+        InventoryTransaction.objects.filter(pk=entry.pk).update(date=self._day(day))
+
+    def _day(self, day):
+        return datetime(2026, 1, day, 12, tzinfo=dt_timezone.utc)
+
+    def test_returns_and_adjustments_move_stock(self):
+        response = self.client.post(reverse('inventorytransaction-list'), content_type='application/json',
+                                    data={"product": self.product.id, "quantity": 20, "transaction_type": "ADJUSTMENT"})
+        self.assertEqual(response.status_code, 201)
+        response = self.client.post(reverse('inventorytransaction-list'), content_type='application/json',
+                                    data={"product": self.product.id, "quantity": -18, "transaction_type": "RETURN"})
+        self.assertEqual(response.status_code, 201)
+
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock_quantity, 2)
+        self.assertTrue(self.product.reorder_needed)
+
+    def test_movement_sign_is_enforced(self):
+        for transaction_type, quantity in [("RETURN", 5), ("RECEIVED_PO", 5), ("ADJUSTMENT", 0)]:
+            response = self.client.post(reverse('inventorytransaction-list'), content_type='application/json',
+                                        data={"product": self.product.id, "quantity": quantity,
+                                              "transaction_type": transaction_type})
+            self.assertEqual(response.status_code, 400, transaction_type)
+        self.assertFalse(InventoryTransaction.objects.exists())
+
+    def test_stock_as_of_reads_snapshot_plus_tail(self):
+        self._post(10, day=1)
+        self._post(5, day=3)
+        self.assertEqual(take_snapshots(as_of=self._day(4)), 1)
+        self._post(-4, day=6)
+        # nothing moved since the last run
+        self.assertEqual(take_snapshots(as_of=self._day(5)), 0)
+        self.assertEqual(StockSnapshot.objects.get().quantity, 15)
+        # re-running the same snapshot is a no-op
+        self.assertEqual(take_snapshots(as_of=self._day(4)), 0)
+
+        self.assertEqual(stock_as_of(self._day(2), [self.product.id]), {self.product.id: 10})
+        self.assertEqual(stock_as_of(self._day(4), [self.product.id]), {self.product.id: 15})
+        self.assertEqual(stock_as_of(self._day(7), [self.product.id]), {self.product.id: 11})
+
+        response = self.client.get(reverse('inventorytransaction-stock'),
+                                   {'product': self.product.id, 'as_of': self._day(7).isoformat()})
+        self.assertEqual(response.json()['results'], [{"product": self.product.id, "stock_quantity": 11}])
+
+    def test_reconcile_rebuilds_counters_from_ledger(self):
+        other = Product.objects.create(name="Gadget", sku="G-1", stock_quantity=99)
+        self._post(7, day=1)
+        Product.objects.filter(pk=self.product.pk).update(stock_quantity=1000)
+        self.assertEqual(stock_drift().count(), 2)
+
+        with self.assertNumQueries(6):
+            # savepoint, one UPDATE for the drifted stock levels, one for the reorder flags, release,
+            # and an INSERT ... SELECT of change feed rows before each UPDATE
+            reconcile_stock()
+
+        self.product.refresh_from_db()
+        other.refresh_from_db()
+        self.assertEqual((self.product.stock_quantity, other.stock_quantity), (7, 0))
+        self.assertFalse(stock_drift().exists())
+
+    def test_snapshots_stay_behind_open_transactions(self):
+        post_movements('ADJUSTMENT', {self.product.id: 3})
+        # written just now, so a transaction still open may add rows dated before it
+        self.assertEqual(take_snapshots(), 0)
+        self.assertEqual(take_snapshots(as_of=timezone.now()), 0)
+        self.assertFalse(StockSnapshot.objects.exists())
+
+    def test_export_ledger_by_date_range(self):
+        self._post(10, day=1)
+        self._post(5, day=3)
+        self._post(-4, day=6)
+
+        response = self.client.get(reverse('inventorytransaction-export'),
+                                   {'format': 'ndjson', 'date_after': '2026-01-02', 'date_before': '2026-01-06'})
+        records = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual([(record['quantity'], record['product_sku']) for record in records], [(5, "W-1")])
+
+
+class ReorderGenerationTests(TestCase):
+
+    def setUp(self):
+        self.acme, self.globex = Supplier.objects.bulk_create([Supplier(name="Acme"), Supplier(name="Globex")])
+        self.low_acme = Product.objects.create(name="A", sku="A", stock_quantity=2, reorder_threshold=10,
+                                               preferred_supplier=self.acme)
+        self.low_acme_on_order = Product.objects.create(name="B", sku="B", stock_quantity=0, reorder_threshold=10,
+                                                        preferred_supplier=self.acme)
+        self.low_globex = Product.objects.create(name="C", sku="C", stock_quantity=0, reorder_threshold=5,
+                                                 preferred_supplier=self.globex)
+        Product.objects.create(name="D", sku="D", stock_quantity=50, reorder_threshold=5, preferred_supplier=self.acme)
+        Product.objects.create(name="E", sku="E", stock_quantity=0, reorder_threshold=5)
+
+        open_po = PurchaseOrder.objects.create(supplier=self.acme, status='approved')
+        PurchaseOrderItem.objects.create(po=open_po, product=self.low_acme_on_order, ordered_quantity=25,
+                                         received_quantity=5)
+
+    def test_plans_group_by_supplier_and_net_off_open_orders(self):
+        plans = list(plan_reorders())
+        self.assertEqual(plans, [
+            {'supplier': self.acme.id, 'items': [{'product': self.low_acme.id, 'ordered_quantity': 18}]},
+            {'supplier': self.globex.id, 'items': [{'product': self.low_globex.id, 'ordered_quantity': 10}]},
+        ])
+
+    def test_generated_pos_are_not_ordered_twice(self):
+        out = StringIO()
+        call_command('generate_reorder_pos', '--dry-run', stdout=out)
+        self.assertEqual(len(out.getvalue().splitlines()), 2)
+        self.assertEqual(PurchaseOrder.objects.count(), 1)
+
+        call_command('generate_reorder_pos', stdout=StringIO())
+        self.assertEqual(PurchaseOrder.objects.filter(status='pending').count(), 2)
+        self.assertEqual(list(plan_reorders()), [])
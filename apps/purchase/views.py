@@ -1,20 +1,39 @@
+from collections.abc import Iterator
+
+from django.db.models import Prefetch
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 from django.shortcuts import render
-from django.views.generic import ListView
+from django.template.loader import get_template, render_to_string
+from django.utils.html import format_html
+from django.utils.safestring import mark_safe
+from django.views.generic import View
 from django_filters.rest_framework import DjangoFilterBackend
-from rest_framework import viewsets
+from rest_framework import mixins, viewsets
 from rest_framework.decorators import action
+from rest_framework.parsers import JSONParser
 from rest_framework.response import Response
-from .models import PurchaseOrder, InventoryTransaction
-from .serializers import PurchaseOrderSerializer, PurchaseOrderReceiveSerializer
-from django.db import transaction
+from .events import publish_status_change
+from .ledger import stock_as_of
+from .models import PurchaseOrder, PurchaseOrderItem, InventoryTransaction, DailyProductReceipts, DailySupplierReceipts
+from .reports import REPORT_BUCKETS, cached_report, purchase_order_report
+from .rollups import receipt_series
+from .serializers import PurchaseOrderSerializer, PurchaseOrderReceiveSerializer, InventoryTransactionSerializer
+from .services import receive_items, ingest_purchase_orders, get_status_summary
 
+from ..helpers.conditional import ConditionalGetMixin
+from ..helpers.fastpath import FastListMixin
+from ..helpers.idempotency import idempotent
+from ..helpers.exports import EXPORT_RENDERER_CLASSES, filter_date_range, stream_export
+from ..helpers.parsers import NDJSONParser
 from ..helpers.permissions import IsManager
 
 
 # Create your views here.
 
 
-class PurchaseOrderViewSet(viewsets.ModelViewSet):
+class PurchaseOrderViewSet(ConditionalGetMixin, FastListMixin, viewsets.ModelViewSet):
     """
         ViewSet for managing Purchase Orders.
 
@@ -22,6 +41,22 @@ class PurchaseOrderViewSet(viewsets.ModelViewSet):
         Integrates filtering and permission control.
 
         Methods:
+            list(request) / retrieve(request, pk=None):
+                Send ETag/Last-Modified and answer a matching If-None-Match with 304 without
+                serializing (see ConditionalGetMixin).
+
+            list(request):
+                Rendered from .values() rows by FastListMixin (same output as the serializer): one
+                query for the page and one for its lines, with names from the lookup caches.
+
+            get_queryset():
+                Loads creator and items in a fixed number of queries, so serializing a page does not
+                issue a query per PO or per line. Supplier and product names come from the lookup caches.
+
+            create(request) / approve(request, pk=None) / receive(request, pk=None):
+                Accept an Idempotency-Key header: a retry with the same key gets the stored response
+                back without being applied again (see apps.helpers.idempotency).
+
             perform_create(serializer):
                 Automatically sets 'created_by' to the current user on PO creation.
 
@@ -29,34 +64,75 @@ class PurchaseOrderViewSet(viewsets.ModelViewSet):
                 Custom action to approve a pending Purchase Order.
                 Only users in the "Manager" group can perform this action.
                 Returns 400 if the PO is not in 'pending' status.
+                The transition is pushed to /api/purchase/events/ (see apps.purchase.events).
+
+            bulk(request):
+                Custom action to create many POs in one request from a JSON list or an NDJSON stream.
+                Returns the new PO id or the validation errors for every record, in input order.
 
             receive(request, pk=None):
                 Custom action to receive items against an approved or partially delivered PO.
                 Validates quantities, updates stock, and logs inventory transactions.
-                Automatically updates the PO status to 'completed' or 'partially_delivered'.
+                Automatically updates the PO status to 'completed' or 'partially_delivered'
+                and pushes the transition to /api/purchase/events/.
 
             destroy(request, *args, **kwargs):
                 Prevents deletion of POs unless they are in 'pending' status.
                 Returns 400 if trying to delete a PO that has already been approved or processed.
+
+            export(request):
+                Streams every PO line as CSV (default) or NDJSON (?format=ndjson), one row per item
+                and a single row for POs without items. Honours the status filter and
+                ?created_at_after= / ?created_at_before=.
         """
-    queryset = PurchaseOrder.objects.all().order_by('id').prefetch_related('items')
+    queryset = PurchaseOrder.objects.all().order_by('id')
     serializer_class = PurchaseOrderSerializer
     filter_backends = [DjangoFilterBackend]
     filterset_fields = ['status',]
 
+    def get_queryset(self):
+        # lines in id order, as the fast list path renders them
+        items = PurchaseOrderItem.objects.only(
+            'id', 'po_id', 'product_id', 'ordered_quantity', 'received_quantity'
+        ).order_by('id')
+        queryset = super().get_queryset().select_related('created_by').prefetch_related(
+            Prefetch('items', queryset=items)
+        )
+        if self.action in ('list', 'retrieve'):
+            # read-only paths only need the serialized columns
+            queryset = queryset.only('id', 'supplier_id', 'created_by_id', 'status', 'created_at', 'created_by__username')
+        return queryset
+
+    @idempotent
+    def create(self, request, *args, **kwargs):
+        return super().create(request, *args, **kwargs)
+
     def perform_create(self, serializer):
         serializer.save(created_by=self.request.user)
 
     @action(detail=True, methods=['post'], permission_classes=[IsManager])
+    @idempotent
     def approve(self, request, pk=None):
         po = self.get_object()
         if po.status != 'pending':
             return Response({"detail": "Only pending POs can be approved."}, status=400)
         po.status = 'approved'
         po.save()
+        publish_status_change(po, 'pending')
         return Response(self.get_serializer(po).data)
 
+    @action(detail=False, methods=['post'], parser_classes=[JSONParser, NDJSONParser])
+    def bulk(self, request):
+        records = request.data
+        if not isinstance(records, (list, Iterator)):
+            return Response({"detail": "Expected a list of purchase orders."}, status=400)
+
+        results = ingest_purchase_orders(records, user=request.user)
+        created = sum(1 for result in results if 'id' in result)
+        return Response({"created": created, "failed": len(results) - created, "results": results})
+
     @action(detail=True, methods=['post'])
+    @idempotent
     def receive(self, request, pk=None):
         po = self.get_object()
 
@@ -67,35 +143,30 @@ class PurchaseOrderViewSet(viewsets.ModelViewSet):
         serializer.is_valid(raise_exception=True)
         validated_data = serializer.validated_data
 
-        with transaction.atomic():
-            all_received = True
-            for entry in validated_data['items']:
-                product = entry['product']
-                received_qty = entry['received_quantity']
-
-                po_item = po.items.get(product=product)
-                po_item.received_quantity += received_qty
-                po_item.save()
+        receive_items(po, validated_data['received'])
 
-                product.stock_quantity += received_qty
-                product.reorder_needed = product.stock_quantity < product.reorder_threshold
-                product.save()
-
-                # save transaction for each entry
-                InventoryTransaction.objects.create(
-                    product=product,
-                    quantity=received_qty,
-                    transaction_type="RECEIVED_PO",
-                    po=po
-                )
-
-                if po_item.received_quantity < po_item.ordered_quantity:
-                    all_received = False
+        po = self.get_queryset().get(pk=po.pk)
+        return Response(self.get_serializer(po).data)
 
-            po.status = 'completed' if all_received else 'partially_delivered'
-            po.save()
+    export_columns = {
+        'po_id': 'id',
+        'status': 'status',
+        'created_at': 'created_at',
+        'supplier_id': 'supplier_id',
+        'supplier_name': 'supplier__name',
+        'created_by': 'created_by__username',
+        'item_id': 'items__id',
+        'product_id': 'items__product_id',
+        'product_sku': 'items__product__sku',
+        'ordered_quantity': 'items__ordered_quantity',
+        'received_quantity': 'items__received_quantity',
+    }
 
-        return Response(self.get_serializer(po).data)
+    @action(detail=False, methods=['get'], renderer_classes=EXPORT_RENDERER_CLASSES)
+    def export(self, request):
+        queryset = self.filter_queryset(PurchaseOrder.objects.all())
+        queryset = filter_date_range(queryset, request, 'created_at').order_by('id', 'items__id')
+        return stream_export(queryset, self.export_columns, request.accepted_renderer.format, 'purchase-orders')
 
     def destroy(self, request, *args, **kwargs):
         po = self.get_object()
@@ -104,15 +175,183 @@ class PurchaseOrderViewSet(viewsets.ModelViewSet):
         return super().destroy(request, *args, **kwargs)
 
 
-class PurchaseOrderListView(ListView):
+class InventoryTransactionViewSet(mixins.CreateModelMixin, viewsets.ReadOnlyModelViewSet):
+    """
+        ViewSet for the inventory ledger.
+
+        Ledger rows are append-only: receipts are written by PurchaseOrderViewSet.receive,
+        adjustments and returns are posted here and move the product's stock by the same amount.
+
+        Methods:
+            stock(request):
+                Stock of the given products (?product=1,2,3) as of a moment in time
+                (?as_of=<ISO datetime>, default now), read from the latest snapshot plus the
+                ledger rows after it.
+
+            export(request):
+                Streams the ledger as CSV (default) or NDJSON (?format=ndjson). Honours the
+                product/transaction_type/po filters and ?date_after= / ?date_before=.
+        """
+    queryset = InventoryTransaction.objects.all().order_by('id')
+    serializer_class = InventoryTransactionSerializer
+    filter_backends = [DjangoFilterBackend]
+    filterset_fields = ['product', 'transaction_type', 'po']
+
+    @action(detail=False, methods=['get'])
+    def stock(self, request):
+        try:
+            product_ids = [int(pk) for pk in request.query_params.get('product', '').split(',') if pk]
+        except ValueError:
+            return Response({"detail": "product must be a comma separated list of ids."}, status=400)
+        if not product_ids:
+            return Response({"detail": "At least one product id is required."}, status=400)
+
+        as_of = timezone.now()
+        if 'as_of' in request.query_params:
+            as_of = parse_datetime(request.query_params['as_of'])
+            if as_of is None:
+                return Response({"detail": "as_of must be an ISO 8601 datetime."}, status=400)
+            if timezone.is_naive(as_of):
+                as_of = timezone.make_aware(as_of)
+
+        stock = stock_as_of(as_of, product_ids)
+        return Response({
+            "as_of": as_of,
+            "results": [{"product": pk, "stock_quantity": stock[pk]} for pk in product_ids if pk in stock],
+        })
+
+    export_columns = {
+        'id': 'id',
+        'date': 'date',
+        'transaction_type': 'transaction_type',
+        'product_id': 'product_id',
+        'product_sku': 'product__sku',
+        'quantity': 'quantity',
+        'po_id': 'po_id',
+    }
+
+    @action(detail=False, methods=['get'], renderer_classes=EXPORT_RENDERER_CLASSES)
+    def export(self, request):
+        queryset = filter_date_range(self.filter_queryset(self.get_queryset()), request, 'date')
+        return stream_export(queryset, self.export_columns, request.accepted_renderer.format, 'inventory-transactions')
+
+
+class ReportViewSet(viewsets.GenericViewSet):
+    """
+        Purchasing reports, aggregated in SQL.
+
+        The suppliers and volume reports are cached for a few minutes per parameter set. Both take
+        ?supplier=, ?status= and ?created_at_after= / ?created_at_before= filters and return
+        {"generated_at": ..., "results": [...]}; each row has PO counts (all, open, completed),
+        ordered/received/open quantities, fill_rate (received / ordered) and avg_lead_time_days
+        (creation to last receipt of completed POs).
+
+        Methods:
+            suppliers(request):
+                One row per supplier, with its name.
+
+            volume(request):
+                One row per period of creation, bucketed by ?bucket=day|week|month|quarter|year
+                (default month); with ?group_by=supplier, one row per period and supplier.
+
+            receipts(request):
+                Goods received per period (?bucket=, default day) and product (?product=1,2,3)
+                or supplier (?supplier=1,2, the default), with ?day_after= / ?day_before=.
+                Read from the daily receipt rollups, not the ledger, and not cached.
+        """
+    queryset = PurchaseOrder.objects.all()
+    pagination_class = None
+    filter_backends = [DjangoFilterBackend]
+    filterset_fields = ['supplier', 'status']
+
+    def report(self, request, name, group_by, bucket='month'):
+        purchase_orders = filter_date_range(self.filter_queryset(self.get_queryset()), request, 'created_at')
+        params = {key: request.query_params.getlist(key) for key in sorted(request.query_params)}
+        return Response(cached_report(name, params, lambda: purchase_order_report(purchase_orders, group_by, bucket)))
+
+    @action(detail=False, methods=['get'])
+    def suppliers(self, request):
+        return self.report(request, 'suppliers', ['supplier'])
+
+    @action(detail=False, methods=['get'])
+    def volume(self, request):
+        bucket = request.query_params.get('bucket', 'month')
+        if bucket not in REPORT_BUCKETS:
+            return Response({"detail": f"bucket must be one of {', '.join(REPORT_BUCKETS)}."}, status=400)
+        group_by = request.query_params.get('group_by')
+        if group_by not in (None, 'supplier'):
+            return Response({"detail": "group_by must be supplier."}, status=400)
+        return self.report(request, 'volume', ['period', 'supplier'] if group_by else ['period'], bucket)
+
+    @action(detail=False, methods=['get'])
+    def receipts(self, request):
+        bucket = request.query_params.get('bucket', 'day')
+        if bucket not in REPORT_BUCKETS:
+            return Response({"detail": f"bucket must be one of {', '.join(REPORT_BUCKETS)}."}, status=400)
+        if 'product' in request.query_params and 'supplier' in request.query_params:
+            return Response({"detail": "Filter by product or by supplier, not both."}, status=400)
+        key_field, rollups = (
+            ('product', DailyProductReceipts.objects.all()) if 'product' in request.query_params
+            else ('supplier', DailySupplierReceipts.objects.all())
+        )
+        try:
+            ids = [int(pk) for pk in request.query_params.get(key_field, '').split(',') if pk]
+        except ValueError:
+            return Response({"detail": f"{key_field} must be a comma separated list of ids."}, status=400)
+        if ids:
+            rollups = rollups.filter(**{f'{key_field}__in': ids})
+        rollups = filter_date_range(rollups, request, 'day')
+        return Response({"results": receipt_series(rollups, key_field, bucket)})
+
+
+class PurchaseOrderListView(View):
+    """
+    Purchase order dashboard.
+
+    Shows the cached per-status counts and one keyset page of open POs
+    (``?after=<last id>`` moves to the next page). The page is sent as a
+    streaming response: rows are rendered as they are read from a single
+    query instead of building the whole table in memory. Completed POs are
+    loaded on demand by the page itself from the purchase API.
+    """
     template_name = 'dashboard.html'
-    model = PurchaseOrder
-    context_object_name = 'pending_pos'
+    row_template_name = 'dashboard_row.html'
+    paginate_by = 100
+    chunk_size = 500
+    rows_marker = '<!--po-rows-->'
+    next_page_marker = '<!--po-next-page-->'
 
-    def get_queryset(self):
-        return PurchaseOrder.objects.exclude(status='completed')
+    def get(self, request, *args, **kwargs):
+        try:
+            after = max(int(request.GET.get('after', 0)), 0)
+        except ValueError:
+            after = 0
+        open_pos = (
+            PurchaseOrder.objects.exclude(status='completed').filter(id__gt=after)
+            .select_related('supplier').only('id', 'status', 'supplier__name').order_by('id')
+        )[:self.paginate_by + 1]
+
+        page = render_to_string(self.template_name, {
+            'status_summary': get_status_summary(),
+            'po_rows': mark_safe(self.rows_marker),
+            'next_page': mark_safe(self.next_page_marker),
+        }, request=request)
+        head, tail = page.split(self.rows_marker)
+        response = StreamingHttpResponse(self.stream(head, tail, open_pos), content_type='text/html')
+        response['Cache-Control'] = 'no-cache'
+        return response
 
-    def get_context_data(self, **kwargs):
-        context = super().get_context_data(**kwargs)
-        context['completed_pos'] = PurchaseOrder.objects.filter(status='completed')
-        return context
\ No newline at end of file
+    def stream(self, head, tail, open_pos):
+        yield head
+        row_template = get_template(self.row_template_name)
+        last_id, has_next = None, False
+        for count, po in enumerate(open_pos.iterator(chunk_size=self.chunk_size)):
+            if count == self.paginate_by:
+                has_next = True
+                break
+            last_id = po.id
+            yield row_template.render({'po': po})
+        next_page = ''
+        if has_next:
+            next_page = format_html('<a class="btn btn-outline-secondary" href="?after={}">Next page</a>', last_id)
+        yield tail.replace(self.next_page_marker, next_page)
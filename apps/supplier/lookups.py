@@ -0,0 +1,5 @@
+from ..helpers.lookups import LookupCache
+from .models import Supplier
+
+
+supplier_lookup = LookupCache(Supplier, ['name'])
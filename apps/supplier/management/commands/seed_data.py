@@ -1,22 +1,164 @@
+import random
+import time
+import zlib
+from array import array
+from datetime import timedelta
+
 from django.core.management.base import BaseCommand
 from django.contrib.auth.models import User, Group
+from django.db import transaction
+from django.db.models import Case, DateTimeField, Value, When
+from django.utils import timezone
 from faker import Faker
-import random
 
+from apps.helpers.parallel import ordered_map
 from apps.product.models import Product
+from apps.purchase.ledger import reconcile_stock, take_snapshots
+from apps.purchase.models import PurchaseOrder, PurchaseOrderItem, InventoryTransaction
+from apps.purchase.rollups import rebuild_rollups
+from apps.purchase.services import invalidate_status_summary
 from apps.supplier.models import Supplier
 
 
+STATUS_WEIGHTS = {'pending': 15, 'approved': 15, 'partially_delivered': 20, 'completed': 50}
+# rows whose preset timestamps are written back per UPDATE (two parameters per row and field)
+RESTAMP_BATCH_SIZE = 1000
+
+
+def _rng(seed, stream, chunk):
+    """Random and Faker instances for one chunk, seeded so output does not depend on the worker count."""
+    chunk_seed = zlib.crc32(f"{seed}:{stream}:{chunk}".encode())
+    fake = Faker()
+    fake.seed_instance(chunk_seed)
+    return random.Random(chunk_seed), fake
+
+
+def supplier_rows(seed, chunk, count):
+    _, fake = _rng(seed, 'supplier', chunk)
+    return [(fake.company(), fake.company_email(), fake.phone_number()[:20]) for _ in range(count)]
+
+
+def product_rows(seed, chunk, start, count, supplier_count):
+    rng, fake = _rng(seed, 'product', chunk)
+    return [
+        (
+            f"{fake.word().capitalize()} {fake.word().capitalize()}",
+            # the running index keeps SKUs unique across chunks without a shared Faker.unique
+            f"{fake.lexify('???').upper()}-{start + i:08d}",
+            rng.randint(0, 100),
+            rng.randint(5, 20),
+            rng.randrange(supplier_count) if supplier_count and rng.random() < 0.8 else None,
+        )
+        for i in range(count)
+    ]
+
+
+def po_rows(seed, chunk, start, count, total, supplier_count, product_count, lines, first_day, span):
+    """
+    ``count`` POs as ``(supplier_index, status, created_at, items)`` with
+    items as ``(product_index, ordered, received, received_at)``. Creation
+    dates rise with the PO index, so ids keep following ``created_at``.
+    """
+    rng, _ = _rng(seed, 'po', chunk)
+    statuses, weights = zip(*STATUS_WEIGHTS.items())
+    rows = []
+    for index in range(start, start + count):
+        status = rng.choices(statuses, weights)[0]
+        created_at = first_day + span * (index + rng.random()) / total
+        line_count = min(rng.randint(1, 2 * lines - 1), product_count)
+        items = []
+        for product_index in rng.sample(range(product_count), line_count):
+            ordered = rng.randint(1, 100)
+            if status == 'completed':
+                received = ordered
+            elif status == 'partially_delivered' and not items:
+                # the first line is always part-received, so the status matches the quantities
+                ordered = max(ordered, 2)
+                received = rng.randint(1, ordered - 1)
+            elif status == 'partially_delivered':
+                received = rng.choice((0, rng.randint(0, ordered), ordered))
+            else:
+                received = 0
+            received_at = created_at + timedelta(hours=rng.randint(24, 24 * 14))
+            items.append((product_index, ordered, received, received_at))
+        rows.append((rng.randrange(supplier_count), status, created_at, items))
+    return rows
+
+
+def _chunks(total, size):
+    for chunk, start in enumerate(range(0, total, size)):
+        yield chunk, start, min(size, total - start)
+
+
+def bulk_create_dated(model, objs, *fields):
+    """
+    ``bulk_create`` ``objs``, then write back the preset values of the
+    ``auto_now``/``auto_now_add`` ``fields`` that the insert stamped with
+    now, with one UPDATE (a CASE per field) per ``RESTAMP_BATCH_SIZE`` rows.
+    The field definitions are left alone, so other threads' saves are not
+    affected.
+    """
+    dated = [(obj, [getattr(obj, field) for field in fields]) for obj in objs]
+    model.objects.bulk_create(objs)
+    for start in range(0, len(dated), RESTAMP_BATCH_SIZE):
+        batch = dated[start:start + RESTAMP_BATCH_SIZE]
+        model.objects.filter(pk__in=[obj.pk for obj, _ in batch]).update(**{
+            field: Case(*[When(pk=obj.pk, then=Value(values[index], output_field=DateTimeField()))
+                          for obj, values in batch], output_field=DateTimeField())
+            for index, field in enumerate(fields)
+        })
+    for obj, values in dated:
+        for field, value in zip(fields, values):
+            setattr(obj, field, value)
+    return objs
+
+
 class Command(BaseCommand):
-    help = 'Seed database with suppliers, products, and preset users/groups.'
+    help = 'Seed database with suppliers, products, purchase orders, stock ledger and preset users/groups.'
 
     def add_arguments(self, parser):
         parser.add_argument('--suppliers', type=int, default=10)
         parser.add_argument('--products', type=int, default=50)
+        parser.add_argument('--pos', type=int, default=100, help='Purchase orders to generate, in every status.')
+        parser.add_argument('--lines', type=int, default=5, help='Average number of lines per purchase order.')
+        parser.add_argument('--days', type=int, default=365, help='Spread PO dates over this many past days.')
+        parser.add_argument('--seed', type=int, default=0, help='Same seed, same data, whatever --workers is.')
+        parser.add_argument('--chunk-size', type=int, default=10000,
+                            help='Rows generated and inserted per batch; bounds memory use.')
+        parser.add_argument('--workers', type=int, default=0,
+                            help='Generate batches in this many worker processes.')
 
     def handle(self, *args, **kwargs):
-        fake = Faker()
+        self.seed, self.chunk_size, self.workers = kwargs['seed'], kwargs['chunk_size'], kwargs['workers']
+        self.now = timezone.now()
+        self.span = timedelta(days=kwargs['days'])
+        self.started = time.perf_counter()
+        self.rows = 0
+
+        self.seed_users()
+        self.seed_suppliers(kwargs['suppliers'])
+        self.seed_products(kwargs['products'])
+        self.seed_purchase_orders(kwargs['pos'], kwargs['lines'])
+
+        # bring the seeded counters and reorder flags in line with the generated ledger (products that
+        # were already there may hold stock that never went through it), and give stock_as_of a base
+        reconcile_stock(self.products)
+        take_snapshots()
+        # generated receipts bypass receive_items, so their daily rollups are built from the ledger
+        for _ in rebuild_rollups():
+            pass
+        invalidate_status_summary()
 
+        self.stdout.write(self.style.SUCCESS(f"Database seeding complete: {self.rows} rows in {self.elapsed():.1f}s."))
+
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    def progress(self, label, rows):
+        self.rows += rows
+        self.stdout.write(f"{label}: {self.rows} rows ({self.rows / max(self.elapsed(), 1e-9):,.0f} rows/s)")
+
+    def seed_users(self):
         # Create Groups
         manager_group, _ = Group.objects.get_or_create(name="Manager")
         employee_group, _ = Group.objects.get_or_create(name="Employee")
@@ -45,29 +187,67 @@ class Command(BaseCommand):
         else:
             self.stdout.write("Superuser 'demo' already exists — skipping.")
 
-        # Suppliers
-        suppliers_count = kwargs['suppliers']
-        suppliers = [
-            Supplier(
-                name=fake.company(),
-                email=fake.company_email(),
-                phone=fake.phone_number()
-            )
-            for _ in range(suppliers_count)
-        ]
-        Supplier.objects.bulk_create(suppliers)
-
-        # Products
-        products_count = kwargs['products']
-        products = [
-            Product(
-                name=fake.word().capitalize() + " " + fake.word().capitalize(),
-                sku=fake.unique.bothify(text='???-#####'),
-                stock_quantity=random.randint(0, 100),
-                reorder_threshold=random.randint(5, 20)
-            )
-            for _ in range(products_count)
-        ]
-        Product.objects.bulk_create(products)
+    def seed_suppliers(self, count):
+        tasks = ((self.seed, chunk, size) for chunk, _, size in _chunks(count, self.chunk_size))
+        for rows in ordered_map(supplier_rows, tasks, self.workers):
+            Supplier.objects.bulk_create([Supplier(name=name, email=email, phone=phone) for name, email, phone in rows])
+            self.progress("Suppliers", len(rows))
+        self.supplier_ids = array('q', Supplier.objects.order_by('id').values_list('id', flat=True).iterator())
+
+    def seed_products(self, count):
+        offset = Product.objects.count()
+        # generated POs only order seeded products, so the ledger rows written here are all theirs
+        last_pk = Product.objects.order_by('-pk').values_list('pk', flat=True).first()
+        self.products = Product.objects.filter(pk__gt=last_pk or 0)
+        tasks = (
+            (self.seed, chunk, offset + start, size, len(self.supplier_ids))
+            for chunk, start, size in _chunks(count, self.chunk_size)
+        )
+        for rows in ordered_map(product_rows, tasks, self.workers):
+            with transaction.atomic():
+                products = Product.objects.bulk_create([
+                    Product(name=name, sku=sku, stock_quantity=stock, reorder_threshold=threshold,
+                            preferred_supplier_id=None if supplier is None else self.supplier_ids[supplier])
+                    for name, sku, stock, threshold, supplier in rows
+                ])
+                # opening balances, so the ledger adds up to the stock levels
+                bulk_create_dated(InventoryTransaction, [
+                    InventoryTransaction(product_id=product.pk, quantity=product.stock_quantity,
+                                         transaction_type='ADJUSTMENT', date=self.now - self.span)
+                    for product in products if product.stock_quantity
+                ], 'date')
+            self.progress("Products", len(rows))
+        self.product_ids = array('q', self.products.order_by('id').values_list('id', flat=True).iterator())
 
-        self.stdout.write(self.style.SUCCESS("Database seeding complete."))
\ No newline at end of file
+    def seed_purchase_orders(self, count, lines):
+        if not count or not self.supplier_ids or not self.product_ids:
+            return
+        created_by = User.objects.filter(username="manager1").first()
+        po_chunk = max(self.chunk_size // max(lines, 1), 1)
+        tasks = (
+            (self.seed, chunk, start, size, count, len(self.supplier_ids), len(self.product_ids),
+             lines, self.now - self.span, self.span)
+            for chunk, start, size in _chunks(count, po_chunk)
+        )
+        for rows in ordered_map(po_rows, tasks, self.workers):
+            with transaction.atomic():
+                # generated POs and ledger rows carry their own (past) dates
+                pos = bulk_create_dated(PurchaseOrder, [
+                    PurchaseOrder(supplier_id=self.supplier_ids[supplier], status=status, created_by=created_by,
+                                  created_at=created_at, updated_at=created_at)
+                    for supplier, status, created_at, _ in rows
+                ], 'created_at', 'updated_at')
+                items, receipts = [], []
+                for po, (_, _, _, po_items) in zip(pos, rows):
+                    for product, ordered, received, received_at in po_items:
+                        product_id = self.product_ids[product]
+                        items.append(PurchaseOrderItem(po_id=po.pk, product_id=product_id,
+                                                       ordered_quantity=ordered, received_quantity=received))
+                        if received:
+                            receipts.append(InventoryTransaction(
+                                product_id=product_id, quantity=received, transaction_type='RECEIVED_PO',
+                                po_id=po.pk, date=min(received_at, self.now),
+                            ))
+                PurchaseOrderItem.objects.bulk_create(items)
+                bulk_create_dated(InventoryTransaction, receipts, 'date')
+            self.progress("Purchase orders", len(pos) + len(items) + len(receipts))
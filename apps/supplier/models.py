@@ -1,10 +1,10 @@
 from django.db import models
-from ..helpers.models import TimeStamp
+from ..helpers.models import LoadedValuesMixin, TimeStamp
 
 
 # Create your models here.
 
-class Supplier(TimeStamp):
+class Supplier(LoadedValuesMixin, TimeStamp):
     name = models.CharField(max_length=255)
     email = models.EmailField()
     phone = models.CharField(max_length=20)
\ No newline at end of file
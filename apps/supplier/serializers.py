@@ -6,3 +6,12 @@ class SupplierSerializer(serializers.ModelSerializer):
     class Meta:
         model = Supplier
         fields = ['id', 'name', 'email', 'phone']
+
+
+class SupplierImportSerializer(serializers.ModelSerializer):
+    """Row validation for ``import_catalog``; a row with an ``id`` updates that supplier."""
+    id = serializers.IntegerField(min_value=1, required=False)
+
+    class Meta:
+        model = Supplier
+        fields = ['id', 'name', 'email', 'phone']
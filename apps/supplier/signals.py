@@ -0,0 +1,23 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from ..helpers.changes import change_feed, record_change
+from ..helpers.models import Change
+from .lookups import supplier_lookup
+from .models import Supplier
+from .serializers import SupplierSerializer
+
+
+change_feed.register(Supplier, SupplierSerializer)
+
+
+@receiver(post_save, sender=Supplier)
+def supplier_saved(sender, instance, **kwargs):
+    supplier_lookup.invalidate(instance.pk)
+    record_change(instance)
+
+
+@receiver(post_delete, sender=Supplier)
+def supplier_deleted(sender, instance, **kwargs):
+    supplier_lookup.invalidate(instance.pk)
+    record_change(instance, Change.DELETE)
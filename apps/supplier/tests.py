@@ -1,3 +1,72 @@
-from django.test import TestCase
+from datetime import timedelta
+from io import StringIO
 
-# Create your tests here.
+from django.core.management import call_command
+from django.db.models import Count, F
+from django.test import TestCase, Client
+from django.utils import timezone
+from django.urls import reverse
+from django.contrib.auth.models import User
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from apps.helpers.testing import QueryBudgetMixin
+from apps.product.models import Product
+from apps.purchase.ledger import stock_drift
+from apps.purchase.models import PurchaseOrder, PurchaseOrderItem, InventoryTransaction
+from apps.supplier.models import Supplier
+
+
+class SupplierTests(QueryBudgetMixin, TestCase):
+
+    def setUp(self):
+        self.client = Client()
+        self.user = User.objects.create_user(username='employee', password='testpass')
+        self.client.defaults['HTTP_AUTHORIZATION'] = f'Bearer {RefreshToken.for_user(self.user).access_token}'
+
+    def test_list_query_budget(self):
+        def populate(count):
+            Supplier.objects.bulk_create([Supplier(name=f"Supplier {i}") for i in range(count)])
+
+        self.assertQueryBudget(reverse('supplier-list'), populate)
+
+    def _seed(self, **options):
+        call_command('seed_data', suppliers=4, products=30, pos=60, lines=3, chunk_size=25, stdout=StringIO(), **options)
+        return (
+            list(Supplier.objects.order_by('id').values_list('name', 'phone')),
+            list(PurchaseOrder.objects.order_by('id').values_list('status', flat=True)),
+            list(PurchaseOrderItem.objects.order_by('id').values_list('ordered_quantity', 'received_quantity')),
+        )
+
+    def test_seed_data_generates_consistent_purchase_history(self):
+        first = self._seed()
+
+        statuses = dict(PurchaseOrder.objects.values_list('status').annotate(count=Count('id')))
+        self.assertEqual(set(statuses), {'pending', 'approved', 'partially_delivered', 'completed'})
+        self.assertFalse(stock_drift().exists())
+        self.assertEqual(
+            InventoryTransaction.objects.filter(transaction_type='RECEIVED_PO').count(),
+            PurchaseOrderItem.objects.filter(received_quantity__gt=0).count(),
+        )
+        dates = list(PurchaseOrder.objects.order_by('id').values_list('created_at', flat=True))
+        self.assertEqual(dates, sorted(dates))
+        self.assertLess(dates[-1], timezone.now())
+        # generated rows keep their past dates
+        self.assertLess(dates[0], timezone.now() - timedelta(days=300))
+        self.assertFalse(PurchaseOrder.objects.exclude(updated_at=F('created_at')).exists())
+        self.assertEqual(InventoryTransaction.objects.filter(transaction_type='ADJUSTMENT')
+                         .values('date').distinct().count(), 1)
+
+        # the same seed gives the same data, however the work is spread over processes
+        for model in (PurchaseOrder, InventoryTransaction, Product, Supplier):
+            model.objects.all().delete()
+        self.assertEqual(self._seed(workers=2), first)
+
+    def test_seed_data_leaves_existing_stock_alone(self):
+        # stock that predates the ledger has no ledger rows behind it
+        existing = Product.objects.create(name="Legacy", sku="LEG-1", stock_quantity=40, reorder_threshold=5)
+        self._seed()
+
+        existing.refresh_from_db()
+        self.assertEqual(existing.stock_quantity, 40)
+        self.assertFalse(PurchaseOrderItem.objects.filter(product=existing).exists())
+        self.assertFalse(stock_drift(Product.objects.exclude(pk=existing.pk)).exists())
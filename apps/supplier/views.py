@@ -1,12 +1,14 @@
 from django.shortcuts import render
 from rest_framework import viewsets
+from ..helpers.conditional import ConditionalGetMixin
+from ..helpers.fastpath import FastListMixin
 from .models import Supplier
 from .serializers import SupplierSerializer
 
 
 # Create your views here.
 
-class SupplierViewSet(viewsets.ModelViewSet):
+class SupplierViewSet(ConditionalGetMixin, FastListMixin, viewsets.ModelViewSet):
     queryset = Supplier.objects.all().order_by('id')
     serializer_class = SupplierSerializer
 
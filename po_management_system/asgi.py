@@ -14,3 +14,12 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'po_management_system.settings')
 
 application = get_asgi_application()
+
+# Long-lived server-sent event streams are served next to Django rather than
+# through it, so idle dashboard connections do not each hold a request thread.
+from apps.helpers.events import route_event_streams  # noqa: E402
+from apps.purchase.events import purchase_order_events  # noqa: E402
+
+application = route_event_streams(application, {
+    '/api/purchase/events/': purchase_order_events,
+})
@@ -12,6 +12,7 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 
 import socket
 import dj_database_url
+from corsheaders.defaults import default_headers
 from decouple import config, Csv
 from datetime import timedelta
 from pathlib import Path
@@ -50,6 +51,7 @@ INSTALLED_APPS = [
     'corsheaders',
 
     # project apps
+    'apps.helpers',
     'apps.product',
     'apps.supplier',
     'apps.purchase',
@@ -58,6 +60,8 @@ if DEBUG:
     INSTALLED_APPS += ['debug_toolbar']
 
 MIDDLEWARE = [
+    # first, so its latency covers the whole stack (see apps.helpers.metrics)
+    'apps.helpers.metrics.RequestMetricsMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -100,6 +104,45 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# Local memory is per process; run several workers against a shared backend
+# (e.g. django.core.cache.backends.redis.RedisCache) so invalidations reach all of them.
+# 'local' is always in-process: the first tier of apps.helpers.lookups in front of 'default'.
+
+CACHES = {
+    'default': {
+        'BACKEND': config('CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('CACHE_LOCATION', default=''),
+    },
+    'local': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'lookups',
+        'OPTIONS': {'MAX_ENTRIES': 100000},
+    },
+}
+
+# Server-sent events (apps.helpers.events) reach the dashboards connected to the
+# publishing process; with several ASGI workers, point this at a cross-process broker.
+EVENT_BROKER = config('EVENT_BROKER', default='apps.helpers.events.InProcessBroker')
+
+# Request metrics (apps.helpers.metrics) are served to staff users at /api/metrics/.
+# Requests slower than this are logged; empty disables the log.
+METRICS_SLOW_REQUEST_SECONDS = config('METRICS_SLOW_REQUEST_SECONDS', default='1.0',
+                                      cast=lambda value: float(value) if value else None)
+# Share of requests whose SQL is kept, so a slow one is logged with its slowest statements.
+METRICS_SQL_SAMPLE_RATE = config('METRICS_SQL_SAMPLE_RATE', default=0.0, cast=float)
+
+# Responses to requests sent with an Idempotency-Key header (apps.helpers.idempotency) are
+# replayed to retries for this long; run prune_idempotency_keys to delete the expired ones.
+IDEMPOTENCY_KEY_TTL_HOURS = config('IDEMPOTENCY_KEY_TTL_HOURS', default=24, cast=int)
+
+AUTHENTICATION_BACKENDS = [
+    # model permissions and groups are served from the cache, see apps.helpers.permissions
+    'apps.helpers.backends.CachedModelBackend',
+]
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -158,6 +201,7 @@ else:
 CORS_ALLOWED_ORIGINS = [
     'http://localhost:8000',
 ]
+CORS_ALLOW_HEADERS = (*default_headers, 'idempotency-key')
 
 CSRF_TRUSTED_ORIGINS = [
     'http://localhost:8000',
@@ -165,7 +209,8 @@ CSRF_TRUSTED_ORIGINS = [
 
 # DRF settings
 DEFAULT_RENDERER_CLASSES = (
-    'rest_framework.renderers.JSONRenderer',
+    # byte-for-byte the output of rest_framework.renderers.JSONRenderer, encoded faster
+    'apps.helpers.renderers.FastJSONRenderer',
 )
 if DEBUG:
     DEFAULT_RENDERER_CLASSES = DEFAULT_RENDERER_CLASSES + (
@@ -185,7 +230,8 @@ REST_FRAMEWORK = {
     ),
     'DEFAULT_RENDERER_CLASSES': DEFAULT_RENDERER_CLASSES,
     'DEFAULT_FILTER_BACKENDS': ['django_filters.rest_framework.DjangoFilterBackend'],
-    'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
+    # page numbers by default; ?pagination=cursor for keyset pages, ?count=approximate for estimated counts
+    'DEFAULT_PAGINATION_CLASS': 'apps.helpers.pagination.SelectablePagination',
     'PAGE_SIZE': 20
 }
 
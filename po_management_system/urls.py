@@ -24,8 +24,10 @@ from dj_rest_auth.views import LoginView, LogoutView
 from rest_framework_simplejwt.views import TokenVerifyView
 from dj_rest_auth.jwt_auth import get_refresh_view
 
+from apps.helpers.async_views import AsyncReadView
+from apps.helpers.views import ChangeFeedViewSet, MetricsView
 from apps.product.views import ProductViewSet
-from apps.purchase.views import PurchaseOrderViewSet, PurchaseOrderListView
+from apps.purchase.views import PurchaseOrderViewSet, PurchaseOrderListView, InventoryTransactionViewSet, ReportViewSet
 from apps.supplier.views import SupplierViewSet
 
 router = DefaultRouter()
@@ -33,10 +35,24 @@ router = DefaultRouter()
 router.register(r'supplier', SupplierViewSet)
 router.register(r'product', ProductViewSet)
 router.register(r'purchase', PurchaseOrderViewSet)
+router.register(r'inventory', InventoryTransactionViewSet)
+router.register(r'changes', ChangeFeedViewSet)
+router.register(r'reports', ReportViewSet, basename='report')
+
+# async list/retrieve of the read-heavy endpoints, for ASGI deployments (see apps.helpers.async_views)
+async_read_urls = []
+for prefix, viewset in (('supplier', SupplierViewSet), ('product', ProductViewSet), ('purchase', PurchaseOrderViewSet)):
+    basename = viewset.queryset.model._meta.model_name
+    async_read_urls += [
+        path(f'async/{prefix}/', AsyncReadView.as_view(viewset_class=viewset), name=f'{basename}-async-list'),
+        path(f'async/{prefix}/<int:pk>/', AsyncReadView.as_view(viewset_class=viewset), name=f'{basename}-async-detail'),
+    ]
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', include(router.urls)),
+    path('api/', include(async_read_urls)),
+    path('api/metrics/', MetricsView.as_view(), name='metrics'),
     path('api/login/', LoginView.as_view(), name='rest_login'),
     path('api/logout/', LogoutView.as_view(), name='rest_logout'),
     path('api/token/refresh/', get_refresh_view().as_view(), name='token_refresh'),